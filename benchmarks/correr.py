@@ -0,0 +1,192 @@
+# benchmarks/correr.py
+#
+# Mide las rutas calientes de la app sobre datos sintéticos y guarda el resultado en
+# JSON. Con --base compara contra una corrida anterior y termina con código 1 si algún
+# caso se volvió más lento que la tolerancia, para detectarlo antes del deploy.
+#
+# Uso (desde la raíz del repo, donde están la plantilla y las fuentes):
+#   python -m benchmarks.correr
+#   python -m benchmarks.correr --tamanos 1000 10000 100000 1000000 --repeticiones 5
+#   python -m benchmarks.correr --base benchmarks/resultados/base.json
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.generador import (
+    DATOS_COTIZACION, NOTAS_COTIZACION, despacho_xlsx, filas_cotizacion, generar_rutas, generar_traficos,
+)
+from utils.costeo import VALORES_POR_DEFECTO, costear_rutas
+from utils.cotizacion_pdf import generar_cotizacion
+from utils.despacho import leer_despacho
+from utils.sugerencias import sugerencias_regreso
+from utils.traficos import resumen_viajes_redondos
+from utils.ubicaciones import internar_ubicaciones
+
+TAMANOS = [1_000, 10_000, 100_000]
+REPETICIONES = 3
+TOLERANCIA = 0.20  # una mediana 20% arriba de la base cuenta como regresión
+MINIMO_MS = 5.0    # diferencias menores son ruido, aunque sean más del 20%
+MAX_FILAS_DESPACHO = 50_000  # el Excel se escribe y se lee fila por fila
+RUTAS_POR_COTIZACION = 1_000  # una ruta cotizada por cada mil del catálogo...
+LIMITES_COTIZACION = (5, 200)  # ...entre una hoja y unas 150
+DIRECTORIO_RESULTADOS = os.path.join("benchmarks", "resultados")
+
+
+def _casos(n: int, semilla: int, casos: list = None) -> dict:
+    # Caso -> (filas de entrada, función sin argumentos a medir); solo se generan
+    # los datos de los casos pedidos
+    def pedido(caso):
+        return not casos or caso in casos
+
+    rutas = generar_rutas(n, semilla)
+    preparados = {}
+    if pedido("costeo.rutas"):
+        preparados["costeo.rutas"] = (len(rutas), lambda: costear_rutas(rutas, VALORES_POR_DEFECTO))
+    if pedido("simulador.sugerencias"):
+        catalogo = internar_ubicaciones(rutas)
+        ruta_1 = catalogo[catalogo["Tipo"] == "IMPORTACION"].iloc[0]
+        preparados["simulador.sugerencias"] = (len(catalogo), lambda: sugerencias_regreso(ruta_1, catalogo))
+    if pedido("concluidos.resumen"):
+        traficos = generar_traficos(rutas, n, semilla)
+        # Viajes Concluidos trabaja con las fechas ya convertidas al leer la tabla
+        for col in ["Fecha", "Fecha_Cierre"]:
+            traficos[col] = pd.to_datetime(traficos[col], errors="coerce")
+        preparados["concluidos.resumen"] = (len(traficos), lambda: resumen_viajes_redondos(traficos))
+    if pedido("despacho.leer"):
+        n_despacho = min(n, MAX_FILAS_DESPACHO)
+        despacho = despacho_xlsx(rutas, n_despacho, semilla)
+        preparados["despacho.leer"] = (n_despacho, lambda: leer_despacho(io.BytesIO(despacho)))
+    if pedido("cotizacion.pdf"):
+        n_cotizacion = max(LIMITES_COTIZACION[0], min(n // RUTAS_POR_COTIZACION, LIMITES_COTIZACION[1]))
+        filas = filas_cotizacion(rutas, n_cotizacion, semilla)
+        preparados["cotizacion.pdf"] = (
+            len(filas), lambda: generar_cotizacion(DATOS_COTIZACION, filas, "MXP", NOTAS_COTIZACION)
+        )
+    return preparados
+
+
+def _medir(fn, repeticiones: int) -> list:
+    fn()  # calentamiento: caché de plantilla, imports perezosos
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def correr(tamanos: list, repeticiones: int, semilla: int = 0, casos: list = None) -> dict:
+    """
+    Runs every case at every size and returns the JSON-ready report.
+    """
+    resultados = []
+    for n in tamanos:
+        inicio = time.perf_counter()
+        preparados = _casos(n, semilla, casos)
+        print(f"[{n:,} rutas] datos generados en {time.perf_counter() - inicio:.1f} s", flush=True)
+        for caso, (filas, fn) in preparados.items():
+            tiempos = _medir(fn, repeticiones)
+            resultados.append({
+                "caso": caso,
+                "tamano": n,
+                "filas": filas,
+                "min_ms": round(min(tiempos), 3),
+                "mediana_ms": round(statistics.median(tiempos), 3),
+                "max_ms": round(max(tiempos), 3),
+                "corridas_ms": [round(t, 3) for t in tiempos],
+            })
+            print(f"  {caso:<24} {filas:>10,} filas  mediana {statistics.median(tiempos):>10.1f} ms", flush=True)
+        del preparados
+        gc.collect()
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "semilla": semilla,
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+def comparar(actual: dict, base: dict, tolerancia: float = TOLERANCIA) -> list:
+    """
+    Cases (same caso and tamano in both runs) whose median got slower than
+    the base by more than `tolerancia` and by at least MINIMO_MS.
+    """
+    previos = {(r["caso"], r["tamano"]): r for r in base["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        previo = previos.get((r["caso"], r["tamano"]))
+        if previo is None:
+            continue
+        antes, ahora = previo["mediana_ms"], r["mediana_ms"]
+        if ahora > antes * (1 + tolerancia) and ahora - antes >= MINIMO_MS:
+            regresiones.append({"caso": r["caso"], "tamano": r["tamano"], "base_ms": antes, "actual_ms": ahora,
+                                "cambio": round(ahora / antes - 1, 3) if antes else None})
+    return regresiones
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de rutas calientes con datos sintéticos.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="rutas sintéticas por corrida")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--casos", nargs="+", help="solo estos casos (p. ej. costeo.rutas cotizacion.pdf)")
+    parser.add_argument("--salida", help="archivo JSON (por omisión benchmarks/resultados/<fecha>-<commit>.json)")
+    parser.add_argument("--base", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+
+    # Fuera de `streamlit run` los cachés avisan en cada llamada que no hay runtime
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    reporte = correr(args.tamanos, args.repeticiones, args.semilla, args.casos)
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}-{reporte['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+
+    if not args.base:
+        return 0
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    regresiones = comparar(reporte, base, args.tolerancia)
+    if not regresiones:
+        print(f"Sin regresiones contra {args.base} (commit {base.get('commit')}).")
+        return 0
+    print(f"⚠️ {len(regresiones)} regresión(es) contra {args.base} (commit {base.get('commit')}):")
+    for r in regresiones:
+        cambio = f" ({r['cambio']:+.0%})" if r["cambio"] is not None else ""
+        print(f"  {r['caso']:<24} {r['tamano']:>10,}  {r['base_ms']:.1f} → {r['actual_ms']:.1f} ms{cambio}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
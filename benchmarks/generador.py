@@ -0,0 +1,388 @@
+# benchmarks/generador.py
+#
+# Datos sintéticos con la forma de Rutas_Picus y Traficos_Picus para medir las rutas
+# calientes sin tocar Supabase: ciudades reales de la frontera y del interior, mezcla
+# IMPO/EXPO/VACIO, Tramo vs Ruta Larga, ingresos en USD y MXP y cruces. Todo sale de
+# una semilla, así dos corridas con el mismo tamaño comparan exactamente los mismos datos.
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from utils.costeo import CONCEPTOS_EXTRA, costear_rutas
+from utils.cotizacion_pdf import fila_concepto, fila_titulo
+from utils.despacho import MAPEO_COLUMNAS
+
+# Nombre -> (latitud, longitud); los nombres van ya en su forma canónica: normalizar_ubicacion
+# los deja igual, así internar_ubicaciones no reescribe ninguno (sin alias a propósito)
+CIUDADES_US = {
+    "LAREDO TX": (27.51, -99.51),
+    "MCALLEN TX": (26.20, -98.23),
+    "EL PASO TX": (31.76, -106.49),
+    "EAGLE PASS TX": (28.71, -100.50),
+    "DEL RIO TX": (29.36, -100.90),
+    "BROWNSVILLE TX": (25.90, -97.50),
+    "NOGALES AZ": (31.34, -110.93),
+    "CALEXICO CA": (32.68, -115.50),
+    "SAN DIEGO CA": (32.72, -117.16),
+    "SAN ANTONIO TX": (29.42, -98.49),
+    "AUSTIN TX": (30.27, -97.74),
+    "DALLAS TX": (32.78, -96.80),
+    "FORT WORTH TX": (32.76, -97.33),
+    "HOUSTON TX": (29.76, -95.37),
+    "OKLAHOMA CITY OK": (35.47, -97.52),
+    "KANSAS CITY MO": (39.10, -94.58),
+    "MEMPHIS TN": (35.15, -90.05),
+    "ATLANTA GA": (33.75, -84.39),
+    "CHICAGO IL": (41.88, -87.63),
+    "DETROIT MI": (42.33, -83.05),
+    "PHOENIX AZ": (33.45, -112.07),
+    "LOS ANGELES CA": (34.05, -118.24),
+}
+CIUDADES_FRONTERA = {
+    "NUEVO LAREDO": (27.48, -99.52),
+    "REYNOSA": (26.08, -98.29),
+    "CIUDAD JUAREZ": (31.69, -106.42),
+    "PIEDRAS NEGRAS": (28.70, -100.52),
+    "CIUDAD ACUNA": (29.32, -100.93),
+    "MATAMOROS": (25.87, -97.50),
+    "NOGALES": (31.31, -110.94),
+    "MEXICALI": (32.62, -115.45),
+    "TIJUANA": (32.51, -117.04),
+}
+CIUDADES_INTERIOR = {
+    "MONTERREY": (25.69, -100.32),
+    "APODACA": (25.78, -100.19),
+    "SANTA CATARINA": (25.67, -100.46),
+    "ESCOBEDO": (25.80, -100.32),
+    "SALTILLO": (25.42, -101.00),
+    "RAMOS ARIZPE": (25.54, -100.95),
+    "MONCLOVA": (26.91, -101.42),
+    "CHIHUAHUA": (28.63, -106.09),
+    "HERMOSILLO": (29.07, -110.96),
+    "CULIACAN": (24.81, -107.39),
+    "TORREON": (25.54, -103.41),
+    "DURANGO": (24.02, -104.66),
+    "ZACATECAS": (22.77, -102.58),
+    "TAMPICO": (22.23, -97.86),
+    "ALTAMIRA": (22.39, -97.94),
+    "SAN LUIS POTOSI": (22.16, -100.98),
+    "VILLA DE REYES": (21.80, -100.93),
+    "AGUASCALIENTES": (21.88, -102.29),
+    "LAGOS DE MORENO": (21.36, -101.93),
+    "LEON": (21.12, -101.68),
+    "SILAO": (20.94, -101.43),
+    "IRAPUATO": (20.68, -101.35),
+    "CELAYA": (20.52, -100.81),
+    "QUERETARO": (20.59, -100.39),
+    "SAN JUAN DEL RIO": (20.39, -99.99),
+    "GUADALAJARA": (20.67, -103.35),
+    "MANZANILLO": (19.05, -104.32),
+    "MORELIA": (19.70, -101.19),
+    "LAZARO CARDENAS": (17.96, -102.20),
+    "TOLUCA": (19.28, -99.66),
+    "LERMA": (19.28, -99.51),
+    "CUAUTITLAN": (19.67, -99.18),
+    "TULTITLAN": (19.65, -99.17),
+    "HUEHUETOCA": (19.83, -99.20),
+    "CIUDAD DE MEXICO": (19.43, -99.13),
+    "PACHUCA": (20.10, -98.76),
+    "TLAXCALA": (19.32, -98.24),
+    "PUEBLA": (19.04, -98.21),
+    "CUERNAVACA": (18.92, -99.22),
+    "VERACRUZ": (19.17, -96.13),
+    "COATZACOALCOS": (18.13, -94.46),
+    "OAXACA": (17.07, -96.73),
+    "MERIDA": (20.97, -89.62),
+}
+# Ciudades gemelas de la frontera: un Tramo es el cruce de una a la otra
+CRUCES = {
+    "LAREDO TX": "NUEVO LAREDO",
+    "MCALLEN TX": "REYNOSA",
+    "EL PASO TX": "CIUDAD JUAREZ",
+    "EAGLE PASS TX": "PIEDRAS NEGRAS",
+    "DEL RIO TX": "CIUDAD ACUNA",
+    "BROWNSVILLE TX": "MATAMOROS",
+    "NOGALES AZ": "NOGALES",
+    "CALEXICO CA": "MEXICALI",
+    "SAN DIEGO CA": "TIJUANA",
+}
+
+MEZCLA_TIPO = {"IMPORTACION": 0.40, "EXPORTACION": 0.35, "VACIO": 0.25}
+PROPORCION_TRAMO = 0.30
+PROPORCION_USD = 0.45
+PROPORCION_TEAM = 0.10
+PROPORCION_VACIO_EN_VUELTA = 0.30
+FACTOR_CARRETERA = 1.25  # distancia en línea recta -> km de carretera
+FECHA_FINAL = date(2025, 12, 31)  # fija, para que los datos no cambien con el día de la corrida
+DIAS_HISTORIA = 730
+
+COLUMNAS_RUTAS = [
+    "ID_Ruta", "Fecha", "Tipo", "Ruta_Tipo", "Cliente", "Origen", "Destino", "Modo de Viaje", "KM",
+    "Moneda", "Ingreso_Original", "Tipo de cambio", "Ingreso Flete",
+    "Moneda_Cruce", "Cruce_Original", "Tipo cambio Cruce", "Ingreso Cruce",
+    "Moneda Costo Cruce", "Costo Cruce", "Costo Cruce Convertido",
+    "Ingreso Total", "Pago por KM", "Sueldo_Operador", "Bono", "Casetas",
+    *CONCEPTOS_EXTRA,
+    "Costo_Diesel_Camion", "Costo_Extras", "Costo_Total_Ruta", "Costo Diesel", "Rendimiento Camion",
+    "Ingresos_Extras", "Extras_Cobrados",
+]
+
+DATOS_COTIZACION = {
+    "cliente_nombre": "CLIENTE DE PRUEBA SA DE CV", "cliente_direccion": "Av. Industrial 100, Monterrey, N.L.",
+    "cliente_mail": "compras@cliente.example", "cliente_telefono": "81 5555 0000", "cliente_ext": "101",
+    "empresa_nombre": "PICUS TRANSPORTES", "empresa_direccion": "Carretera Nacional km 5, Nuevo Laredo, Tamps.",
+    "empresa_mail": "ventas@picus.example", "empresa_telefono": "867 555 0000", "empresa_ext": "200",
+    "fecha": "01/01/2025",
+}
+NOTAS_COTIZACION = (
+    "Esta cotización es válida por 15 días. "
+    "No aplica IVA y Retenciones en el caso de las importaciones y exportaciones. "
+    "Las exportaciones aplican tasa 0."
+)
+
+
+def _clientes(rng: np.random.Generator, n: int, total: int = 150) -> np.ndarray:
+    # Pocos clientes concentran la mayoría de los viajes (pesos tipo Zipf)
+    nombres = np.array([f"CLIENTE {i:03d}" for i in range(1, total + 1)], dtype=object)
+    pesos = 1.0 / np.arange(1, total + 1)
+    return rng.choice(nombres, size=n, p=pesos / pesos.sum())
+
+
+def _km(origen: np.ndarray, destino: np.ndarray) -> np.ndarray:
+    coordenadas = {**CIUDADES_US, **CIUDADES_FRONTERA, **CIUDADES_INTERIOR}
+    lat1, lon1 = np.radians(np.array([coordenadas[c] for c in origen]).reshape(-1, 2)).T
+    lat2, lon2 = np.radians(np.array([coordenadas[c] for c in destino]).reshape(-1, 2)).T
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    km = 2 * 6371 * np.arcsin(np.sqrt(a)) * FACTOR_CARRETERA
+    return np.maximum(np.round(km), 15.0)
+
+
+def _montos(rng: np.random.Generator, n: int, bajo: float, alto: float) -> np.ndarray:
+    return np.round(rng.uniform(bajo, alto, n), 2)
+
+
+def _lugares(rng: np.random.Generator, tipo: np.ndarray, tramo: np.ndarray):
+    n = len(tipo)
+    us = np.array(list(CIUDADES_US), dtype=object)
+    frontera = np.array(list(CIUDADES_FRONTERA), dtype=object)
+    interior = np.array(list(CIUDADES_INTERIOR), dtype=object)
+    mexico = np.concatenate([frontera, interior])
+    gemelas = np.array(list(CRUCES), dtype=object)
+    cruce = np.vectorize(CRUCES.get, otypes=[object])
+
+    # Lado americano y lado mexicano de cada viaje; la dirección la da el tipo
+    lado_us = np.where(tramo, rng.choice(gemelas, n), rng.choice(us, n))
+    lado_mx = np.where(
+        tramo,
+        cruce(lado_us),
+        np.where(rng.random(n) < 0.35, rng.choice(frontera, n), rng.choice(interior, n)),
+    )
+    # Rutas largas que no cruzan: de la frontera mexicana al interior
+    nacional = ~tramo & (rng.random(n) < 0.40)
+    lado_us = np.where(nacional, rng.choice(frontera, n), lado_us)
+    lado_mx = np.where(nacional, rng.choice(interior, n), lado_mx)
+
+    origen = np.where(tipo == "EXPORTACION", lado_mx, lado_us)
+    destino = np.where(tipo == "EXPORTACION", lado_us, lado_mx)
+
+    # Vacíos de ruta larga: reposicionamientos entre dos ciudades mexicanas
+    reposiciona = (tipo == "VACIO") & ~tramo
+    a, b = rng.choice(mexico, n), rng.choice(mexico, n)
+    b = np.where(a == b, np.where(a == "MONTERREY", "SALTILLO", "MONTERREY"), b)
+    origen = np.where(reposiciona, a, origen)
+    destino = np.where(reposiciona, b, destino)
+    cruza = np.isin(origen, us) | np.isin(destino, us)
+    return origen, destino, cruza
+
+
+def generar_rutas(n: int, semilla: int = 0, valores: dict = None) -> pd.DataFrame:
+    """
+    `n` synthetic Rutas_Picus rows with consistent derived columns (costed
+    with utils.costeo, same rules as Captura de Rutas). Deterministic for a
+    given (n, semilla).
+    """
+    rng = np.random.default_rng(semilla)
+    tipo = rng.choice(list(MEZCLA_TIPO), size=n, p=list(MEZCLA_TIPO.values()))
+    tramo = rng.random(n) < PROPORCION_TRAMO
+    origen, destino, cruza = _lugares(rng, tipo, tramo)
+    km = _km(origen, destino)
+
+    cargado = tipo != "VACIO"
+    usd = cargado & (rng.random(n) < PROPORCION_USD)
+    # Tarifa por km en la moneda del flete; los tramos cobran una tarifa fija
+    tarifa_km = np.where(usd, rng.uniform(1.6, 2.6, n), rng.uniform(28.0, 45.0, n))
+    fijo = np.where(usd, rng.uniform(150.0, 450.0, n), rng.uniform(2500.0, 8000.0, n))
+    ingreso = np.where(tramo, fijo, km * tarifa_km)
+    # Solo algunos vacíos se cobran, a tarifa reducida
+    ingreso = np.where(cargado, ingreso, np.where(rng.random(n) < 0.20, km * rng.uniform(8.0, 15.0, n), 0.0))
+
+    extras = {
+        c: np.where(rng.random(n) < 0.10, _montos(rng, n, 100.0, 1500.0), 0.0)
+        for c in CONCEPTOS_EXTRA
+    }
+    inicio = FECHA_FINAL - timedelta(days=DIAS_HISTORIA)
+    fechas = pd.to_datetime(inicio) + pd.to_timedelta(rng.integers(0, DIAS_HISTORIA, n), unit="D")
+
+    rutas = pd.DataFrame({
+        "ID_Ruta": [f"PIC{i:06d}" for i in range(1, n + 1)],
+        "Fecha": fechas.strftime("%Y-%m-%d"),
+        "Tipo": tipo,
+        "Ruta_Tipo": np.where(tramo, "Tramo", "Ruta Larga"),
+        "Cliente": np.where(cargado, _clientes(rng, n), None),
+        "Origen": origen,
+        "Destino": destino,
+        "Modo de Viaje": np.where(rng.random(n) < PROPORCION_TEAM, "Team", "Operador"),
+        "KM": km,
+        "Moneda": np.where(usd, "USD", "MXP"),
+        "Ingreso_Original": np.round(ingreso, 2),
+        "Moneda_Cruce": np.where(cruza, "USD", "MXP"),
+        "Cruce_Original": np.where(cruza & cargado, _montos(rng, n, 80.0, 250.0), 0.0),
+        "Moneda Costo Cruce": np.where(cruza, "USD", "MXP"),
+        "Costo Cruce": np.where(cruza & (rng.random(n) < 0.70), _montos(rng, n, 60.0, 180.0), 0.0),
+        "Casetas": np.round(km * rng.uniform(0.8, 2.2, n)),
+        **extras,
+        "Extras_Cobrados": rng.random(n) < 0.30,
+    })
+    return costear_rutas(rutas, valores)[COLUMNAS_RUTAS]
+
+
+def _elegir_desde(rng: np.random.Generator, candidatos: pd.DataFrame, origenes: np.ndarray) -> np.ndarray:
+    # Por cada origen pedido, una posición al azar de `candidatos` que salga de ahí
+    # (o cualquiera si ninguna sale de ese origen)
+    codigos = candidatos["Origen"].to_numpy()
+    orden = np.argsort(codigos, kind="stable")
+    ordenados = codigos[orden]
+    izquierda = np.searchsorted(ordenados, origenes, side="left")
+    derecha = np.searchsorted(ordenados, origenes, side="right")
+    hay = derecha > izquierda
+    salto = (rng.random(len(origenes)) * np.maximum(derecha - izquierda, 1)).astype(int)
+    elegidos = np.where(hay, orden[np.minimum(izquierda + salto, len(orden) - 1)], rng.integers(0, len(orden), len(origenes)))
+    return candidatos.index.to_numpy()[elegidos]
+
+
+def generar_traficos(rutas: pd.DataFrame, n: int, semilla: int = 0) -> pd.DataFrame:
+    """
+    About `n` closed Traficos_Picus rows built from `rutas`: every tráfico is
+    an IMPO/EXPO IDA plus a VUELTA of the opposite type leaving from where
+    the IDA ended, sometimes preceded by a VACIO. Unidad, operador and
+    ID_Programacion are inherited by the VUELTA legs, as in filas_vuelta.
+    """
+    rng = np.random.default_rng(semilla + 1)
+    legs_por_trafico = 2 + PROPORCION_VACIO_EN_VUELTA
+    total = max(1, int(round(n / legs_por_trafico)))
+    rutas = rutas.reset_index(drop=True)
+
+    cargadas = rutas[rutas["Tipo"] != "VACIO"]
+    vacios = rutas[rutas["Tipo"] == "VACIO"]
+    ida = cargadas.index.to_numpy()[rng.integers(0, len(cargadas), total)]
+    tipo_ida = rutas["Tipo"].to_numpy()[ida]
+    destino_ida = rutas["Destino"].to_numpy()[ida]
+
+    con_vacio = (rng.random(total) < PROPORCION_VACIO_EN_VUELTA) & (len(vacios) > 0)
+    vacio = _elegir_desde(rng, vacios, destino_ida) if len(vacios) else np.zeros(total, dtype=int)
+    salida_regreso = np.where(con_vacio, rutas["Destino"].to_numpy()[vacio], destino_ida)
+    regreso = np.empty(total, dtype=int)
+    for tipo, opuesto in (("IMPORTACION", "EXPORTACION"), ("EXPORTACION", "IMPORTACION")):
+        mascara = tipo_ida == tipo
+        candidatos = cargadas[cargadas["Tipo"] == opuesto]
+        if len(candidatos) == 0:
+            candidatos = cargadas
+        regreso[mascara] = _elegir_desde(rng, candidatos, salida_regreso[mascara])
+
+    viaje = np.arange(1, total + 1)
+    fecha = pd.to_datetime(rutas["Fecha"].to_numpy()[ida])
+    cierre = (fecha + pd.to_timedelta(rng.integers(1, 7, total), unit="D")).strftime("%Y-%m-%d")
+    comunes = pd.DataFrame({
+        "Número_Trafico": viaje.astype(str),
+        "ID_Programacion": [f"{v}_{f}" for v, f in zip(viaje, fecha.strftime("%Y-%m-%d"))],
+        "Unidad": [f"U{u:03d}" for u in rng.integers(1, 400, total)],
+        "Operador": [f"OPERADOR {o:03d}" for o in rng.integers(1, 600, total)],
+        "Fecha_Cierre": cierre,
+    })
+
+    partes = []
+    for posiciones, tramo, mascara in (
+        (ida, "IDA", np.ones(total, dtype=bool)),
+        (vacio, "VUELTA", con_vacio),
+        (regreso, "VUELTA", np.ones(total, dtype=bool)),
+    ):
+        parte = rutas.iloc[posiciones[mascara]].reset_index(drop=True)
+        parte = pd.concat([parte, comunes[mascara].reset_index(drop=True)], axis=1)
+        parte["Tramo"] = tramo
+        parte["Modo_Viaje"] = parte.pop("Modo de Viaje")
+        parte["_orden"] = np.flatnonzero(mascara)
+        partes.append(parte)
+
+    traficos = pd.concat(partes, ignore_index=True)
+    # IDA y VUELTAs de cada tráfico juntas, como se leen de la tabla
+    traficos = traficos.sort_values("_orden", kind="stable").drop(columns=["_orden", "ID_Ruta"])
+    traficos.loc[traficos["Tramo"] == "VUELTA", "Fecha"] = traficos["Fecha_Cierre"]
+    return traficos.reset_index(drop=True)
+
+
+def despacho_xlsx(rutas: pd.DataFrame, n: int, semilla: int = 0, errores: float = 0.01) -> bytes:
+    """
+    Despacho workbook (same headers as the dispatch export) with `n` viajes
+    drawn from `rutas`. A fraction `errores` of rows come without a viaje
+    number or with an unreadable date, to exercise the validation path.
+    """
+    rng = np.random.default_rng(semilla + 2)
+    muestra = rutas.iloc[rng.integers(0, len(rutas), n)].reset_index(drop=True)
+    sin_viaje = rng.random(n) < errores / 2
+    sin_fecha = rng.random(n) < errores / 2
+    fechas = pd.to_datetime(muestra["Fecha"]).dt.to_pydatetime()
+    unidades = rng.integers(1, 400, n)
+    operadores = rng.integers(1, 600, n)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Despacho")
+    ws.append(list(MAPEO_COLUMNAS))
+    columnas = zip(
+        fechas, muestra["Sueldo_Operador"], muestra["Tipo"], muestra["Ingreso_Original"], muestra["Moneda"],
+        muestra["Ruta_Tipo"], muestra["Cliente"], muestra["Origen"], muestra["Destino"], muestra["KM"],
+    )
+    for i, (fecha, sueldo, tipo, tarifa, moneda, ruta_tipo, cliente, origen, destino, km) in enumerate(columnas):
+        ws.append([
+            "sin fecha" if sin_fecha[i] else fecha,
+            round(float(sueldo), 2),
+            None if sin_viaje[i] else 100000 + i,
+            tipo.title(),
+            float(tarifa),
+            moneda,
+            "PROPIA" if ruta_tipo == "Ruta Larga" else "TRAMO",
+            f"U{unidades[i]:03d}",
+            f"OPERADOR {operadores[i]:03d}",
+            cliente,
+            origen.title(),
+            destino.title(),
+            float(km),
+        ])
+    salida = io.BytesIO()
+    wb.save(salida)
+    return salida.getvalue()
+
+
+def filas_cotizacion(rutas: pd.DataFrame, n: int, semilla: int = 0) -> list:
+    """
+    Quote rows for `n` routes, like the Cotización page builds them: a title
+    per route, charged flete/cruce/casetas and informative diesel/sueldo.
+    """
+    rng = np.random.default_rng(semilla + 3)
+    muestra = rutas.iloc[rng.integers(0, len(rutas), n)]
+    conceptos = (
+        ("Ingreso Flete", "Ingreso Flete", True),
+        ("Ingreso Cruce", "Ingreso Cruce", True),
+        ("Casetas", "Casetas", True),
+        ("Costo Diesel", "Costo_Diesel_Camion", False),
+        ("Sueldo Operador", "Sueldo_Operador", False),
+    )
+    filas = []
+    for r in muestra.to_dict("records"):
+        filas.append(fila_titulo(r["Tipo"], f"{r['Origen']} - {r['Destino']}"))
+        for etiqueta, campo, cobrado in conceptos:
+            if r[campo]:
+                filas.append(fila_concepto(etiqueta, float(r[campo]), cobrado))
+    return filas
@@ -1,8 +1,11 @@
 import streamlit as st
 from supabase import create_client
 import hashlib
+from utils.medicion import medir, panel_rendimiento
+from utils.sesion import olvidar_usuario, restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -12,6 +15,8 @@ if rol != "admin":
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 # Conexión a Supabase
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
@@ -44,7 +49,10 @@ with st.form("form_registro"):
                 "Password_Hash": hash_password(password)  # Para login
             }
             try:
-                supabase.table("Usuarios_Pic").insert(datos).execute()
+                with medir("supabase.insertar.Usuarios_Pic", filas=1):
+                    supabase.table("Usuarios_Pic").insert(datos).execute()
+                # Un intento de login previo al alta no debe dejar el ID sin acceso
+                olvidar_usuario(supabase, id_usuario)
                 st.success(f"✅ Usuario {nombre} registrado correctamente.")
             except Exception as e:
                 st.error(f"❌ Error al registrar usuario: {e}")
@@ -3,8 +3,14 @@ import pandas as pd
 import os
 from datetime import datetime
 from supabase import create_client
+from utils.costeo import VALORES_POR_DEFECTO, costear_rutas
+from utils.ubicaciones import normalizar_cliente, normalizar_ubicacion
+from utils.versiones import registrar_cambio
+from utils.medicion import medir, panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -14,6 +20,8 @@ if rol not in ["admin", "gerente", "ejecutivo"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
 supabase = create_client(url, key)
@@ -24,19 +32,7 @@ if "revisar_ruta" not in st.session_state:
 
 # Valores por defecto
 RUTA_DATOS = "datos_generales.csv"
-valores_por_defecto = {
-    "Rendimiento Camion": 2.5,
-    "Costo Diesel": 24.0,
-    "Pago x KM (General)": 1.63,
-    "Bono ISR IMSS RL": 462.66,
-    "Bono ISR IMSS Tramo": 185.06,
-    "Pago Vacio": 100.0,
-    "Pago Tramo": 300.0,
-    "Bono Rendimiento": 250.0,
-    "Bono Modo Team": 650.0,
-    "Tipo de cambio USD": 17.5,
-    "Tipo de cambio MXP": 1.0
-}
+valores_por_defecto = dict(VALORES_POR_DEFECTO)  # mismos valores que usa el costeo
 
 def cargar_datos_generales():
     if os.path.exists(RUTA_DATOS):
@@ -48,13 +44,26 @@ def guardar_datos_generales(valores):
     df = pd.DataFrame(valores.items(), columns=["Parametro", "Valor"])
     df.to_csv(RUTA_DATOS, index=False)
 
-def safe_number(x):
-    return 0 if (x is None or (isinstance(x, float) and pd.isna(x))) else x
+def ruta_costeada(d, valores):
+    # Campos capturados -> columnas de Rutas_Picus ya costeadas (utils.costeo es la única copia de las reglas)
+    capturada = pd.DataFrame([{
+        "Tipo": d["tipo"], "Ruta_Tipo": d["ruta_tipo"], "Modo de Viaje": d["Modo de Viaje"], "KM": d["km"],
+        "Moneda": d["moneda_ingreso"], "Ingreso_Original": d["ingreso_flete"],
+        "Moneda_Cruce": d["moneda_cruce"], "Cruce_Original": d["ingreso_cruce"],
+        "Moneda Costo Cruce": d["moneda_costo_cruce"], "Costo Cruce": d["costo_cruce"],
+        "Casetas": d["casetas"], "Movimiento_Local": d["movimiento_local"], "Puntualidad": d["puntualidad"],
+        "Pension": d["pension"], "Estancia": d["estancia"], "Fianza": d["fianza"],
+        "Pistas_Extra": d["pistas_extra"], "Stop": d["stop"], "Falso": d["falso"],
+        "Gatas": d["gatas"], "Accesorios": d["accesorios"], "Guias": d["guias"],
+        "Extras_Cobrados": d["extras_cobrados"],
+    }])
+    return costear_rutas(capturada, valores).to_dict(orient="records")[0]
 
 # Generador de ID tipo PIC000001
 def generar_nuevo_id():
     try:
-        respuesta = supabase.table("Rutas_Picus").select("ID_Ruta").order("ID_Ruta", desc=True).limit(1).execute()
+        with medir("supabase.ultimo_id.Rutas_Picus"):
+            respuesta = supabase.table("Rutas_Picus").select("ID_Ruta").order("ID_Ruta", desc=True).limit(1).execute()
         if respuesta.data and respuesta.data[0].get("ID_Ruta"):
             ultimo = respuesta.data[0]["ID_Ruta"]
             numero = int(ultimo[3:]) + 1  # Asumiendo formato 'PIC000001'
@@ -140,47 +149,9 @@ with st.form("captura_ruta"):
             "gatas": gatas, "accesorios": accesorios, "guias": guias
         }
         
-        costo_cruce_convertido = costo_cruce * (valores["Tipo de cambio USD"] if moneda_costo_cruce == "USD" else 1)
-
-        costo_diesel_camion = (km / valores["Rendimiento Camion"]) * valores["Costo Diesel"]
-
-        # Pago por KM general
-        pago_km = valores.get("Pago x KM (General)", 1.63)
-        bono = 0.0
-
-        # 🧩 Cálculo condicional por tipo de ruta (larga vs tramo)
-        if ruta_tipo == "Tramo":
-            sueldo = valores.get("Pago Tramo", 300.0)
-            bono = valores.get("Bono ISR IMSS Tramo", 185.06)
-            Modo_de_Viaje = "Operador"  # Forzar
-        elif tipo in ["IMPORTACION", "EXPORTACION"]:
-            sueldo = km * pago_km
-            bono_isr = valores.get("Bono ISR IMSS RL", 0)
-            bono_rendimiento = valores.get("Bono Rendimiento", 0)
-            bono = bono_isr + bono_rendimiento
-        elif tipo == "VACIO":
-            if km <= 100:
-                sueldo = valores.get("Pago Vacio", 100.0)
-            else:
-                sueldo = km * pago_km
-            bono = 0.0
-
-        # Bono Team (solo si no es Tramo)
-        if ruta_tipo != "Tramo" and Modo_de_Viaje == "Team":
-            bono_team = valores.get("Bono Modo Team", 650)
-            sueldo += bono_team
-
-        extras = sum(map(safe_number, [movimiento_local, puntualidad, pension, estancia, fianza, pistas_extra, stop, falso, gatas, accesorios, guias]))
-
-        costo_total = costo_diesel_camion + sueldo + bono + casetas + extras + costo_cruce_convertido
-        
-        tipo_cambio_flete = valores["Tipo de cambio USD"] if moneda_ingreso == "USD" else valores["Tipo de cambio MXP"]
-        tipo_cambio_cruce = valores["Tipo de cambio USD"] if moneda_cruce == "USD" else valores["Tipo de cambio MXP"]
-
-        ingreso_flete_convertido = ingreso_flete * tipo_cambio_flete
-        ingreso_cruce_convertido = ingreso_cruce * tipo_cambio_cruce
-        ingresos_extras = extras if extras_cobrados else 0
-        ingreso_total = ingreso_flete_convertido + ingreso_cruce_convertido + ingresos_extras
+        ruta = ruta_costeada(st.session_state.datos_captura, valores)
+        ingreso_total = ruta["Ingreso Total"]
+        costo_total = ruta["Costo_Total_Ruta"]
 
         utilidad_bruta = ingreso_total - costo_total
         costos_indirectos = ingreso_total * 0.35
@@ -206,100 +177,27 @@ with st.form("captura_ruta"):
 if st.session_state.revisar_ruta and st.button("💾 Guardar Ruta"):
     d = st.session_state.datos_captura
 
-    tipo_cambio_flete = valores["Tipo de cambio USD"] if d["moneda_ingreso"] == "USD" else valores["Tipo de cambio MXP"]
-    tipo_cambio_cruce = valores["Tipo de cambio USD"] if d["moneda_cruce"] == "USD" else valores["Tipo de cambio MXP"]
-    tipo_cambio_costo_cruce = valores["Tipo de cambio USD"] if d["moneda_costo_cruce"] == "USD" else valores["Tipo de cambio MXP"]
-
-    ingreso_flete_convertido = d["ingreso_flete"] * tipo_cambio_flete
-    ingreso_cruce_convertido = d["ingreso_cruce"] * tipo_cambio_cruce
-    costo_cruce_convertido = d["costo_cruce"] * tipo_cambio_costo_cruce
-
-    extras = sum([
-        safe_number(d["movimiento_local"]), safe_number(d["puntualidad"]),
-        safe_number(d["pension"]), safe_number(d["estancia"]),
-        safe_number(d["fianza"]),
-        safe_number(d["pistas_extra"]), safe_number(d["stop"]), safe_number(d["falso"]),
-        safe_number(d["gatas"]), safe_number(d["accesorios"]), safe_number(d["guias"])
-    ])
-    ingresos_extras = extras if d["extras_cobrados"] else 0
-    ingreso_total = ingreso_flete_convertido + ingreso_cruce_convertido + ingresos_extras
-
-    costo_diesel_camion = (d["km"] / valores["Rendimiento Camion"]) * valores["Costo Diesel"]
-
-    pago_km = valores.get("Pago x KM (General)", 1.63)
-    if d["ruta_tipo"] == "Tramo":
-        sueldo = valores.get("Pago Tramo", 300.0)
-        bono = valores.get("Bono ISR IMSS Tramo", 185.06)
-        modo_viaje = "Operador"
-    elif d["tipo"] in ["IMPORTACION", "EXPORTACION"]:
-        sueldo = d["km"] * pago_km
-        bono = valores.get("Bono ISR IMSS RL", 0) + valores.get("Bono Rendimiento", 0)
-        modo_viaje = d["Modo de Viaje"]
-    elif d["tipo"] == "VACIO":
-        sueldo = valores.get("Pago Vacio", 100.0) if d["km"] <= 100 else d["km"] * pago_km
-        bono = 0
-        modo_viaje = d["Modo de Viaje"]
-
-    if d["ruta_tipo"] != "Tramo" and modo_viaje == "Team":
-        sueldo += valores.get("Bono Modo Team", 650)
-
-    costo_total = costo_diesel_camion + sueldo + bono + d["casetas"] + extras + costo_cruce_convertido
-
     nueva_ruta = {
         "ID_Ruta": generar_nuevo_id(),
         "Fecha": str(d["fecha"]),
-        "Tipo": d["tipo"],
-        "Ruta_Tipo": d["ruta_tipo"],
-        "Cliente": d["cliente"],
-        "Origen": d["origen"],
-        "Destino": d["destino"],
-        "Modo de Viaje": modo_viaje,
-        "KM": d["km"],
-        "Moneda": d["moneda_ingreso"],
-        "Ingreso_Original": d["ingreso_flete"],
-        "Tipo de cambio": tipo_cambio_flete,
-        "Ingreso Flete": ingreso_flete_convertido,
-        "Moneda_Cruce": d["moneda_cruce"],
-        "Cruce_Original": d["ingreso_cruce"],
-        "Tipo cambio Cruce": tipo_cambio_cruce,
-        "Ingreso Cruce": ingreso_cruce_convertido,
-        "Moneda Costo Cruce": d["moneda_costo_cruce"],
-        "Costo Cruce": d["costo_cruce"],
-        "Costo Cruce Convertido": costo_cruce_convertido,
-        "Ingreso Total": ingreso_total,
-        "Pago por KM": pago_km,
-        "Sueldo_Operador": sueldo,
-        "Bono": bono,
-        "Casetas": d["casetas"],
-        "Movimiento_Local": d["movimiento_local"],
-        "Puntualidad": d["puntualidad"],
-        "Pension": d["pension"],
-        "Estancia": d["estancia"],
-        "Fianza": d["fianza"],
-        "Pistas_Extra": d["pistas_extra"],
-        "Stop": d["stop"],
-        "Falso": d["falso"],
-        "Gatas": d["gatas"],
-        "Accesorios": d["accesorios"],
-        "Guias": d["guias"],
-        "Costo_Diesel_Camion": costo_diesel_camion,
-        "Costo_Extras": extras,
-        "Costo_Total_Ruta": costo_total,
-        "Costo Diesel": valores["Costo Diesel"],
-        "Rendimiento Camion": valores["Rendimiento Camion"],
-        "Ingresos_Extras": ingresos_extras,
-        "Extras_Cobrados": d["extras_cobrados"],
+        "Cliente": normalizar_cliente(d["cliente"]),
+        "Origen": normalizar_ubicacion(d["origen"]),
+        "Destino": normalizar_ubicacion(d["destino"]),
+        **ruta_costeada(d, valores),
     }
 
     nuevo_id = generar_nuevo_id()
-    existe = supabase.table("Rutas_Picus").select("ID_Ruta").eq("ID_Ruta", nuevo_id).execute()
+    with medir("supabase.existe.Rutas_Picus"):
+        existe = supabase.table("Rutas_Picus").select("ID_Ruta").eq("ID_Ruta", nuevo_id).execute()
 
     if existe.data:
         st.error("⚠️ Conflicto al generar ID. Intenta de nuevo.")
     else:
         nueva_ruta["ID_Ruta"] = nuevo_id
         try:
-            supabase.table("Rutas_Picus").insert(nueva_ruta).execute()
+            with medir("supabase.insertar.Rutas_Picus", filas=1):
+                supabase.table("Rutas_Picus").insert(nueva_ruta).execute()
+            registrar_cambio(supabase, "Rutas_Picus")
             st.success("✅ Ruta guardada exitosamente.")
             st.session_state.revisar_ruta = False
             del st.session_state["datos_captura"]
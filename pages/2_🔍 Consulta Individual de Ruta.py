@@ -2,11 +2,17 @@ import streamlit as st
 import pandas as pd
 from supabase import create_client
 import os
-import tempfile
-from fpdf import FPDF
-import base64
+from utils.busqueda import selector_rutas
+from utils.indice_rutas import indice_busqueda, indice_rutas, ids_por_seleccion, ruta_por_id, rutas_seleccionadas
+from utils.pdf_ruta import (
+    CAMPOS_RESULTADO, COLUMNAS_HOJA, exportar_zip, generar_pdf_ruta, huella_pdf, importes_en_cero, nombre_pdf,
+)
+from utils.ubicaciones import normalizar_cliente, normalizar_ubicacion
+from utils.medicion import panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -16,6 +22,8 @@ if rol not in ["admin", "gerente", "ejecutivo", "visitante"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 # ✅ Conexión a Supabase
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
@@ -37,15 +45,8 @@ if os.path.exists(RUTA_DATOS):
 else:
     valores = valores_por_defecto.copy()
 
-# ✅ Cargar rutas desde Supabase
-respuesta = supabase.table("Rutas_Picus").select("*").execute()
-df = pd.DataFrame(respuesta.data)
-
-# ✅ Asegurar formato correcto
-if not df.empty:
-    df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.strftime("%Y-%m-%d")
-    df["Ingreso Total"] = pd.to_numeric(df["Ingreso Total"], errors="coerce").fillna(0)
-    df["Costo_Total_Ruta"] = pd.to_numeric(df["Costo_Total_Ruta"], errors="coerce").fillna(0)
+# ✅ Índice de selectores (solo columnas de llave, en caché por versión de datos)
+indice = indice_rutas(supabase)
 
 st.title("🔍 Consulta Individual de Ruta")
 
@@ -68,39 +69,48 @@ def mostrar_resultados(ingreso_total, costo_total, utilidad_bruta, costos_indire
     st.markdown(colored_bold("Utilidad Neta", f"${utilidad_neta:,.2f}", utilidad_neta >= 0), unsafe_allow_html=True)
     st.markdown(colored_bold("% Utilidad Neta", f"{porcentaje_neta:.2f}%", porcentaje_neta >= 15), unsafe_allow_html=True)
     
-if df.empty:
+if not indice:
     st.warning("⚠️ No hay rutas guardadas todavía.")
     st.stop()
 
-st.subheader("📌 Selecciona Tipo de Ruta")
-tipo_ruta_especifica = st.selectbox("Ruta Larga o Tramo", df["Ruta_Tipo"].unique())
-df_ruta_tipo = df[df["Ruta_Tipo"] == tipo_ruta_especifica]
+st.subheader("🔎 Búsqueda Rápida")
+id_sel = selector_rutas(indice_busqueda(supabase), "Ruta encontrada", key="consulta_rapida", solo_con_consulta=True)
 
-tipo_sel = st.selectbox("Tipo (IMPORTACION / EXPORTACION / VACIO)", df_ruta_tipo["Tipo"].unique())
-df_tipo = df_ruta_tipo[df_ruta_tipo["Tipo"] == tipo_sel]
+# Sin búsqueda: selectores en cascada
+if id_sel is None:
+    st.subheader("📌 Selecciona Tipo de Ruta")
+    tipo_ruta_especifica = st.selectbox("Ruta Larga o Tramo", list(indice))
+    por_tipo = indice[tipo_ruta_especifica]
 
-rutas_unicas = df_tipo[["Origen", "Destino"]].drop_duplicates()
-opciones_ruta = list(rutas_unicas.itertuples(index=False, name=None))
+    tipo_sel = st.selectbox("Tipo (IMPORTACION / EXPORTACION / VACIO)", list(por_tipo))
+    por_ruta = por_tipo[tipo_sel]
 
-st.subheader("📌 Selecciona Ruta (Origen → Destino)")
-ruta_sel = st.selectbox("Ruta", opciones_ruta, format_func=lambda x: f"{x[0]} → {x[1]}")
-origen_sel, destino_sel = ruta_sel
+    st.subheader("📌 Selecciona Ruta (Origen → Destino)")
+    ruta_sel = st.selectbox("Ruta", list(por_ruta), format_func=lambda x: f"{x[0]} → {x[1]}")
+    origen_sel, destino_sel = ruta_sel
 
-df_filtrada = df_tipo[(df_tipo["Origen"] == origen_sel) & (df_tipo["Destino"] == destino_sel)]
+    clientes = dict(por_ruta[ruta_sel])
 
-if df_filtrada.empty:
-    st.warning("⚠️ No hay rutas con esa combinación.")
-    st.stop()
+    st.subheader("📌 Selecciona Cliente")
+    id_sel = st.selectbox(
+        "Cliente",
+        list(clientes),
+        format_func=lambda x: f"{clientes[x]} ({origen_sel} → {destino_sel})"
+    )
 
-st.subheader("📌 Selecciona Cliente")
-opciones = df_filtrada.index.tolist()
-index_sel = st.selectbox(
-    "Cliente",
-    opciones,
-    format_func=lambda x: f"{df.loc[x, 'Cliente']} ({df.loc[x, 'Origen']} → {df.loc[x, 'Destino']})"
-)
+# ✅ Solo se descarga la ruta elegida
+fila = ruta_por_id(supabase, id_sel)
+if fila is None:
+    st.warning("⚠️ La ruta seleccionada ya no existe.")
+    st.stop()
 
-ruta = df.loc[index_sel]
+# La fila llega cruda de PostgREST: un importe nulo viene como None, no como NaN
+ruta = pd.Series(importes_en_cero(fila))
+ruta["Cliente"] = normalizar_cliente(ruta.get("Cliente"))
+ruta["Origen"] = normalizar_ubicacion(ruta.get("Origen"))
+ruta["Destino"] = normalizar_ubicacion(ruta.get("Destino"))
+fecha_ruta = pd.to_datetime(ruta["Fecha"], errors="coerce")
+ruta["Fecha"] = fecha_ruta.strftime("%Y-%m-%d") if pd.notna(fecha_ruta) else ruta["Fecha"]
     
 # Campos simulables
 st.markdown("---")
@@ -204,130 +214,79 @@ with col3:
     st.markdown(f"- Accesorios: ${ruta['Accesorios']:,}")
     st.markdown(f"- Guías: ${ruta['Guias']:,}")
     
-def safe_text(texto):
-    return str(texto).encode("latin-1", "replace").decode("latin-1")
-    
 st.markdown("---")
 st.subheader("📥 Generar PDF de esta Ruta")
-# Extraer desde el diccionario
-id_ruta = ruta["ID_Ruta"]
-fecha = ruta["Fecha"]
-tipo = ruta["Tipo"]
-modo = ruta["Modo de Viaje"]
-cliente = ruta["Cliente"]
-origen = ruta["Origen"]
-destino = ruta["Destino"]
-km = ruta["KM"]
-
-rendimiento_camion = ruta["Rendimiento Camion"]
-moneda_ingreso = ruta["Moneda"]
-ingreso_original = ruta["Ingreso_Original"]
-tipo_cambio_flete = ruta["Tipo de cambio"]
-ingreso_flete = ruta["Ingreso Flete"]
-moneda_cruce = ruta["Moneda_Cruce"]
-ingreso_cruce = ruta["Ingreso Cruce"]
-tipo_cambio_cruce = ruta["Tipo cambio Cruce"]
-moneda_costo_cruce = ruta["Moneda Costo Cruce"]
-costo_cruce_original = ruta["Costo Cruce"]
-costo_cruce_convertido = ruta["Costo Cruce Convertido"]
-casetas = ruta["Casetas"]
-diesel_camion = ruta["Costo_Diesel_Camion"]
-sueldo = ruta["Sueldo_Operador"]
-bono = ruta["Bono"]
-
-movimiento_local = ruta["Movimiento_Local"]
-puntualidad = ruta["Puntualidad"]
-pension = ruta["Pension"]
-estancia = ruta["Estancia"]
-fianza_termo = ruta["Fianza"]
-pistas_extra = ruta["Pistas_Extra"]
-stop = ruta["Stop"]
-falso = ruta["Falso"]
-gatas = ruta["Gatas"]
-accesorios = ruta["Accesorios"]
-guias = ruta["Guias"]
-    
-pdf = FPDF()
-pdf.add_page()
-pdf.set_auto_page_break(auto=True, margin=15)
-
-# Encabezado
-pdf.set_font("Arial", "B", 16)
-pdf.cell(0, 10, "Consulta Individual de Ruta", ln=True)
-pdf.ln(5)
-
-# Datos principales
-pdf.set_font("Arial", "", 12)
-pdf.cell(0, 10, safe_text(f"ID de Ruta: {id_ruta}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Fecha: {fecha}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Tipo: {tipo}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Modo: {modo}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Cliente: {cliente}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Origen → Destino: {origen} - {destino}"), ln=True)
-pdf.cell(0, 10, safe_text(f"KM: {km:,.2f}"), ln=True)
-pdf.ln(5)
-
-# Resultados de utilidad
-pdf.set_font("Arial", "B", 12)
-pdf.cell(0, 10, "Resultados de Utilidad:", ln=True)
-pdf.set_font("Arial", "", 12)
-pdf.cell(0, 10, safe_text(f"Ingreso Total: ${ingreso_total:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Costo Total: ${costo_total:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Utilidad Bruta: ${utilidad_bruta:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"% Utilidad Bruta: {porcentaje_bruta:.2f}%"), ln=True)
-pdf.cell(0, 10, safe_text(f"Costos Indirectos (35%): ${costos_indirectos:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Utilidad Neta: ${utilidad_neta:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"% Utilidad Neta: {porcentaje_neta:.2f}%"), ln=True)
-pdf.ln(5)
-
-# Detalles completos de Costos e Ingresos
-pdf.set_font("Arial", "B", 12)
-pdf.cell(0, 10, "Detalles de Costos e Ingresos:", ln=True)
-pdf.set_font("Arial", "", 12)
-
-pdf.cell(0, 10, safe_text(f"Rendimiento Camión: {rendimiento_camion} km/L"), ln=True)
-pdf.cell(0, 10, safe_text(f"Moneda Flete: {moneda_ingreso}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Ingreso Flete Original: ${ingreso_original:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Tipo de cambio: {tipo_cambio_flete}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Ingreso Flete Convertido: ${ingreso_flete:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Moneda Cruce: {moneda_cruce}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Ingreso Cruce Original: ${ingreso_cruce:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Tipo cambio Cruce: {tipo_cambio_cruce}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Ingreso Cruce Convertido: ${ingreso_cruce:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Moneda Costo Cruce: {moneda_costo_cruce}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Costo Cruce Original: ${costo_cruce_original:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Costo Cruce Convertido: ${costo_cruce_convertido:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Casetas: ${casetas:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Diesel Camión: ${diesel_camion:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Sueldo Operador: ${sueldo:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Bono: ${bono:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Ingreso Total: ${ingreso_total:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Costo Total Ruta: ${costo_total:,.2f}"), ln=True)
-
-pdf.ln(5)
-pdf.set_font("Arial", "B", 12)
-pdf.cell(0, 10, "Extras:", ln=True)
-pdf.set_font("Arial", "", 12)
-
-pdf.cell(0, 10, safe_text(f"Movimiento Local: ${movimiento_local:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Puntualidad: ${puntualidad:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Pensión: ${pension:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Estancia: ${estancia:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Fianza: ${fianza_termo:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Pistas Extra: ${pistas_extra:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Stop: ${stop:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Falso: ${falso:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Gatas: ${gatas:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Accesorios: ${accesorios:,.2f}"), ln=True)
-pdf.cell(0, 10, safe_text(f"Guías: ${guias:,.2f}"), ln=True)
-
-temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-pdf.output(temp_file.name)
-
-with open(temp_file.name, "rb") as file:
-    st.download_button(
-        label=" 📄Descargar PDF",
-        data=file,
-        file_name=f"Consulta_{ruta['Cliente']}_{ruta['Origen']}_{ruta['Destino']}.pdf",
-        mime="application/pdf"
-    )
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def pdf_en_cache(huella, _ruta, _resultados):
+    # La llave es la huella del contenido: misma ruta y mismos resultados = mismo PDF
+    return generar_pdf_ruta(_ruta, _resultados)
+
+ruta_pdf = importes_en_cero(ruta.to_dict())
+resultados_pdf = dict(zip(CAMPOS_RESULTADO, (
+    ingreso_total, costo_total, utilidad_bruta, costos_indirectos,
+    utilidad_neta, porcentaje_bruta, porcentaje_neta,
+)))
+
+# El PDF se genera solo al hacer clic en descargar
+st.download_button(
+    label=" 📄Descargar PDF",
+    data=lambda: pdf_en_cache(huella_pdf(ruta_pdf, resultados_pdf), ruta_pdf, resultados_pdf),
+    file_name=nombre_pdf(ruta_pdf),
+    mime="application/pdf",
+    on_click="ignore",
+)
+
+# =====================
+# 📦 Exportación por lote
+# =====================
+st.markdown("---")
+with st.expander("📦 Exportar hojas de varias rutas (ZIP)"):
+    modo_lote = st.radio("Seleccionar rutas por", ["Filtro", "Lista de ID_Ruta"], horizontal=True)
+
+    if modo_lote == "Filtro":
+        clientes_idx = sorted({c for t in indice.values() for r in t.values() for rs in r.values() for _, c in rs if c})
+        carriles_idx = sorted({c for t in indice.values() for r in t.values() for c in r})
+        clientes_lote = st.multiselect("Clientes", clientes_idx)
+        carriles_lote = st.multiselect("Rutas (Origen → Destino)", carriles_idx, format_func=lambda x: f"{x[0]} → {x[1]}")
+        usar_fechas = st.checkbox("Filtrar por fecha de la ruta")
+        fechas_lote = st.date_input("Rango de fechas", value=[], disabled=not usar_fechas)
+
+        # Clientes y rutas se resuelven a ID_Ruta contra el índice (ya normalizado)
+        ids_lote = ids_por_seleccion(indice, clientes_lote, carriles_lote) if clientes_lote or carriles_lote else None
+        desde_lote, hasta_lote = fechas_lote if usar_fechas and len(fechas_lote) == 2 else (None, None)
+    else:
+        texto_ids = st.text_area("ID_Ruta (separados por coma, espacio o renglón)")
+        ids_lote = list(dict.fromkeys(i for i in texto_ids.replace(",", " ").split() if i))
+        desde_lote = hasta_lote = None
+
+    if ids_lote is not None and not ids_lote:
+        st.warning("⚠️ Ninguna ruta coincide con la selección." if modo_lote == "Filtro" else "⚠️ Escribe al menos un ID_Ruta.")
+    else:
+        if ids_lote is not None:
+            st.caption(f"{len(ids_lote)} rutas seleccionadas" + (" (antes del filtro de fecha)" if desde_lote else ""))
+
+        # El ZIP guardado solo vale para la selección con la que se generó
+        llave_lote = (modo_lote, tuple(ids_lote) if ids_lote is not None else None, desde_lote, hasta_lote)
+        if st.button("⚙️ Generar ZIP"):
+            filas_lote = rutas_seleccionadas(supabase, ids_lote, COLUMNAS_HOJA, desde_lote, hasta_lote)
+            if not filas_lote:
+                st.session_state.pop("zip_rutas", None)
+                st.warning("⚠️ Ninguna ruta coincide con la selección.")
+            else:
+                barra = st.progress(0.0, text=f"Generando 0 de {len(filas_lote)} hojas...")
+                st.session_state["zip_rutas"] = (llave_lote, exportar_zip(
+                    filas_lote,
+                    progreso=lambda hechos, total: barra.progress(hechos / total, text=f"Generando {hechos} de {total} hojas..."),
+                ))
+                st.success(f"✅ {len(filas_lote)} hojas de ruta generadas.")
+
+        llave_zip, zip_rutas = st.session_state.get("zip_rutas", (None, None))
+        if zip_rutas and llave_zip == llave_lote:
+            st.download_button(
+                "📥 Descargar ZIP de hojas de ruta",
+                data=zip_rutas,
+                file_name="hojas_de_ruta.zip",
+                mime="application/zip",
+                on_click="ignore",
+            )
@@ -4,8 +4,14 @@ from supabase import create_client
 import os
 from fpdf import FPDF
 import tempfile
+from utils.sugerencias import TOP_N, clientes_regreso, sugerencias_regreso
+from utils.traficos import leer_tabla
+from utils.ubicaciones import internar_ubicaciones
+from utils.medicion import panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -15,6 +21,8 @@ if rol not in ["admin", "gerente", "ejecutivo", "visitante"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
 supabase = create_client(url, key)
@@ -37,19 +45,18 @@ for k, v in defaults.items():
 
 st.title("🔁 Simulador de Vuelta Redonda")
 
+POR_PAGINA = 20
+
 def safe_number(x):
     return 0 if (x is None or (isinstance(x, float) and pd.isna(x))) else x
 
 # Cargar rutas desde Supabase
-respuesta = supabase.table("Rutas_Picus").select("*").execute()
-if not respuesta.data:
+filas_rutas = leer_tabla(supabase, "Rutas_Picus")
+if not filas_rutas:
     st.warning("⚠️ No hay rutas guardadas en Supabase.")
     st.stop()
 
-df = pd.DataFrame(respuesta.data)
-df["Origen"] = df["Origen"].astype(str).str.strip().str.upper()
-df["Destino"] = df["Destino"].astype(str).str.strip().str.upper()
-df["Cliente"] = df["Cliente"].astype(str).str.strip().str.upper()
+df = internar_ubicaciones(pd.DataFrame(filas_rutas))
 df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.strftime("%Y-%m-%d")
 df["Utilidad"] = df["Ingreso Total"] - df["Costo_Total_Ruta"]
 df["% Utilidad"] = (df["Utilidad"] / df["Ingreso Total"] * 100).round(2)
@@ -99,74 +106,39 @@ else:
 st.markdown("---")
 st.subheader("🔁 Rutas sugeridas (combinaciones con o sin vacío)")
 
-tipo_principal = ruta_1["Tipo"]
-tipo_regreso = "EXPORTACION" if tipo_principal == "IMPORTACION" else "IMPORTACION"
-destino_origen = str(ruta_1["Destino"]).strip().upper()
-
-sugerencias = []
-
-# ➤ Rutas directas desde el destino actual
-directas = df[(df["Tipo"] == tipo_regreso) & (df["Origen"] == destino_origen)].copy()
-for _, row in directas.iterrows():
-    ingreso_total = safe_number(ruta_1["Ingreso Total"]) + safe_number(row["Ingreso Total"])
-    costo_total = safe_number(ruta_1["Costo_Total_Ruta"]) + safe_number(row["Costo_Total_Ruta"])
-    utilidad = ingreso_total - costo_total
-    porcentaje = (utilidad / ingreso_total) * 100 if ingreso_total else 0
-    sugerencias.append({
-        "descripcion": f"{row['Fecha']} — {row['Cliente']} → {row['Origen']} → {row['Destino']} ({porcentaje:.2f}%)",
-        "tramos": [row],
-        "utilidad": utilidad
-    })
-
-# ➤ Rutas con VACÍO + cliente
-vacios = df[(df["Tipo"] == "VACIO") & (df["Origen"] == destino_origen)].copy()
-for _, vacio in vacios.iterrows():
-    origen_post = vacio["Destino"]
-    candidatos = df[(df["Tipo"] == tipo_regreso) & (df["Origen"] == origen_post)].copy()
-    for _, final in candidatos.iterrows():
-        ingreso_total = safe_number(ruta_1["Ingreso Total"]) + safe_number(final["Ingreso Total"])
-        costo_total = safe_number(ruta_1["Costo_Total_Ruta"]) + safe_number(vacio["Costo_Total_Ruta"]) + safe_number(final["Costo_Total_Ruta"])
-        utilidad = ingreso_total - costo_total
-        porcentaje = (utilidad / ingreso_total) * 100 if ingreso_total else 0
-        descripcion = f"{final['Fecha']} — {final['Cliente']} (Vacío → {vacio['Origen']} → {vacio['Destino']}) → {final['Destino']} ({porcentaje:.2f}%)"
-        sugerencias.append({
-            "descripcion": descripcion,
-            "tramos": [vacio, final],
-            "utilidad": utilidad
-        })
-
-# Si la ruta principal es VACÍO, solo buscar desde su destino
-if tipo_principal == "VACIO":
-    origen_vacio = ruta_1["Destino"]
-    candidatos = df[(df["Tipo"].isin(["IMPORTACION", "EXPORTACION"])) & (df["Origen"] == origen_vacio)].copy()
-    for _, final in candidatos.iterrows():
-        ingreso_total = safe_number(ruta_1["Ingreso Total"]) + safe_number(final["Ingreso Total"])
-        costo_total = safe_number(ruta_1["Costo_Total_Ruta"]) + safe_number(final["Costo_Total_Ruta"])
-        utilidad = ingreso_total - costo_total
-        porcentaje = (utilidad / ingreso_total) * 100 if ingreso_total else 0
-        descripcion = f"{final['Fecha']} — {final['Cliente']} {final['Origen']} → {final['Destino']} ({porcentaje:.2f}%)"
-        sugerencias.append({
-            "descripcion": descripcion,
-            "tramos": [final],
-            "utilidad": utilidad
-        })
-
-# Ordenar sugerencias por utilidad
-sugerencias = sorted(sugerencias, key=lambda x: (x["utilidad"] / (safe_number(ruta_1["Ingreso Total"]) + sum(safe_number(t.get("Ingreso Total", 0)) for t in x["tramos"]))), reverse=True)
+# Filtros antes de calcular: se aplican a todas las combinaciones, no solo a las mejores
+colF1, colF2 = st.columns(2)
+with colF1:
+    clientes_filtro = st.multiselect("Filtrar por cliente", clientes_regreso(ruta_1, df))
+with colF2:
+    # Vacío = sin mínimo: no se descarta ninguna combinación, como antes del filtro
+    margen_minimo = st.number_input("% Utilidad mínima", value=None, step=5.0, placeholder="Sin mínimo")
+
+sugerencias = sugerencias_regreso(ruta_1, df, clientes=clientes_filtro, margen_minimo=margen_minimo)
 
 # Inicializar rutas seleccionadas
 rutas_seleccionadas = []
 
-# Mostrar selectbox con todas las opciones
+# Mostrar sugerencias paginadas
 if sugerencias:
-    opciones_sugeridas = {s["descripcion"]: s for s in sugerencias}
-    descripcion_seleccionada = st.selectbox(
+    st.caption(f"{len(sugerencias)} opciones (mejores {TOP_N} por % de utilidad)")
+
+    paginas = (len(sugerencias) - 1) // POR_PAGINA + 1
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1) if paginas > 1 else 1
+    inicio = (pagina - 1) * POR_PAGINA
+    visibles = sugerencias[inicio:inicio + POR_PAGINA]
+
+    idx_sel = st.selectbox(
         "Selecciona una opción de regreso sugerida",
-        list(opciones_sugeridas.keys()),
+        range(len(visibles)),
+        format_func=lambda i: visibles[i]["descripcion"],
         key="selectbox_regreso"
     )
-    seleccion = opciones_sugeridas[descripcion_seleccionada]
+    seleccion = visibles[idx_sel]
     rutas_seleccionadas = [ruta_1] + seleccion.get("tramos", [])
+elif clientes_filtro or margen_minimo > -100:
+    st.warning("⚠️ Ninguna opción cumple con los filtros.")
+    rutas_seleccionadas = [ruta_1]
 else:
     st.warning("⚠️ No hay rutas de regreso disponibles.")
     rutas_seleccionadas = [ruta_1]
@@ -3,8 +3,15 @@ import pandas as pd
 import os
 from datetime import datetime
 from supabase import create_client
+from utils.ubicaciones import normalizar_cliente, normalizar_ubicacion
+from utils.busqueda import selector_rutas
+from utils.indice_rutas import COLUMNAS_GRILLA, filtros_rutas, indice_busqueda, pagina_rutas, ruta_por_id
+from utils.versiones import registrar_cambio
+from utils.medicion import medir, panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -14,6 +21,8 @@ if rol not in ["admin", "gerente", "ejecutivo"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
     
+panel_rendimiento()
+
 # Configuración de conexión a Supabase
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
@@ -32,8 +41,6 @@ def safe_number(x):
 
 st.title("🗂️ Gestión de Rutas Guardadas")
 
-# Cargar rutas desde Supabase
-respuesta = supabase.table("Rutas_Picus").select("*").execute()
 valores = cargar_datos_generales()
 valores_por_defecto = {
     "Rendimiento Camion": 2.5,
@@ -49,30 +56,75 @@ valores_por_defecto = {
     "Tipo de cambio MXP": 1.0
 }
 
-if respuesta.data:
-    df = pd.DataFrame(respuesta.data)
-    df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+def reiniciar_pagina():
+    st.session_state["gestion_pagina"] = 1
+
+busqueda = indice_busqueda(supabase)
 
+if len(busqueda):
     st.subheader("📋 Rutas Registradas")
-    st.dataframe(df, use_container_width=True)
-    st.markdown(f"**Total de rutas registradas:** {len(df)}")
+
+    # Filtros y orden se resuelven en la consulta; solo se trae la página visible
+    colF1, colF2, colF3 = st.columns(3)
+    with colF1:
+        filtro_cliente = st.text_input("Cliente", key="gestion_f_cliente", on_change=reiniciar_pagina)
+        filtro_tipo = st.selectbox("Tipo", ["Todos", "IMPORTACION", "EXPORTACION", "VACIO"], key="gestion_f_tipo", on_change=reiniciar_pagina)
+    with colF2:
+        filtro_origen = st.text_input("Origen", key="gestion_f_origen", on_change=reiniciar_pagina)
+        filtro_destino = st.text_input("Destino", key="gestion_f_destino", on_change=reiniciar_pagina)
+    with colF3:
+        filtro_fechas = st.date_input("Rango de fechas", value=(), format="DD/MM/YYYY", key="gestion_f_fechas", on_change=reiniciar_pagina)
+        colO1, colO2 = st.columns(2)
+        orden = colO1.selectbox("Ordenar por", COLUMNAS_GRILLA, index=COLUMNAS_GRILLA.index("Fecha"), key="gestion_orden", on_change=reiniciar_pagina)
+        tamano_pagina = colO2.selectbox("Filas por página", [25, 50, 100], index=1, key="gestion_tamano", on_change=reiniciar_pagina)
+    descendente = st.toggle("Orden descendente", value=True, key="gestion_desc", on_change=reiniciar_pagina)
+
+    filtros = filtros_rutas(
+        filtro_cliente, filtro_origen, filtro_destino,
+        None if filtro_tipo == "Todos" else filtro_tipo,
+        filtro_fechas[0] if len(filtro_fechas) > 0 else None,
+        filtro_fechas[1] if len(filtro_fechas) > 1 else None,
+    )
+    pagina = st.session_state.get("gestion_pagina", 1)
+    df, total = pagina_rutas(supabase, filtros, orden, descendente, pagina, tamano_pagina)
+    paginas = max(1, -(-total // tamano_pagina))
+    if pagina > paginas:
+        # Tras borrar rutas la página actual puede quedar fuera de rango
+        pagina = st.session_state["gestion_pagina"] = paginas
+        df, total = pagina_rutas(supabase, filtros, orden, descendente, pagina, tamano_pagina)
+
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    colP1, colP2 = st.columns([1, 3])
+    with colP1:
+        st.number_input("Página", min_value=1, max_value=paginas, step=1, key="gestion_pagina")
+    with colP2:
+        inicio = (pagina - 1) * tamano_pagina
+        st.markdown(
+            f"Mostrando **{min(inicio + 1, total)}–{inicio + len(df)}** de **{total}** rutas "
+            f"(total registradas: {len(busqueda)})"
+        )
     st.markdown("---")
 
     st.subheader("🗑️ Eliminar rutas")
-    ids_disponibles = df["ID_Ruta"].tolist()
-    ids_a_eliminar = st.multiselect("Selecciona los ID de ruta a eliminar", ids_disponibles)
+    ids_a_eliminar = selector_rutas(busqueda, "Selecciona los ID de ruta a eliminar", key="gestion_eliminar", multiple=True)
 
     if st.button("Eliminar rutas seleccionadas") and ids_a_eliminar:
-        for idr in ids_a_eliminar:
-            supabase.table("Rutas_Picus").delete().eq("ID_Ruta", idr).execute()
+        with medir("supabase.eliminar.Rutas_Picus", filas=len(ids_a_eliminar)):
+            for idr in ids_a_eliminar:
+                supabase.table("Rutas_Picus").delete().eq("ID_Ruta", idr).execute()
+        registrar_cambio(supabase, "Rutas_Picus")
         st.success("✅ Rutas eliminadas correctamente.")
         st.rerun()
 
     st.markdown("---")
     st.subheader("✏️ Editar Ruta Existente")
 
-    id_editar = st.selectbox("Selecciona el ID de Ruta a editar", ids_disponibles)
-    ruta = df[df["ID_Ruta"] == id_editar].iloc[0]
+    id_editar = selector_rutas(busqueda, "Selecciona el ID de Ruta a editar", key="gestion_editar")
+    ruta_fila = ruta_por_id(supabase, id_editar) if id_editar is not None else None
+    if ruta_fila is None:
+        st.stop()
+    ruta = pd.Series(ruta_fila)
+    ruta["Fecha"] = pd.to_datetime(ruta["Fecha"]).date()
 
     with st.expander("⚙️ Configurar Datos Generales", expanded=False):
         col1, col2 = st.columns(2)
@@ -196,9 +248,9 @@ if respuesta.data:
                  "Fecha": fecha.isoformat(),
                  "Tipo": tipo,
                  "Ruta_Tipo": ruta_tipo,
-                 "Cliente": cliente,
-                 "Origen": origen,
-                 "Destino": destino,
+                 "Cliente": normalizar_cliente(cliente),
+                 "Origen": normalizar_ubicacion(origen),
+                 "Destino": normalizar_ubicacion(destino),
                  "KM": km,
                  "Moneda": moneda_ingreso,
                  "Ingreso_Original": ingreso_original,
@@ -238,7 +290,9 @@ if respuesta.data:
              }
 
              try:
-                 supabase.table("Rutas_Picus").update(ruta_actualizada).eq("ID_Ruta", id_editar).execute()
+                 with medir("supabase.actualizar.Rutas_Picus", filas=1):
+                     supabase.table("Rutas_Picus").update(ruta_actualizada).eq("ID_Ruta", id_editar).execute()
+                 registrar_cambio(supabase, "Rutas_Picus")
                  st.success("✅ Ruta actualizada exitosamente.")
                  st.rerun()
              except Exception as e:
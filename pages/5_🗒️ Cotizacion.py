@@ -1,17 +1,18 @@
 import streamlit as st
 import pandas as pd
-from fpdf import FPDF
 from datetime import date
 from supabase import create_client
 import re, os
-from pathlib import Path
-
-# --------- Opcional: optimización de plantilla con Pillow ---------
-try:
-    from PIL import Image
-    HAS_PIL = True
-except Exception:
-    HAS_PIL = False
+from utils.busqueda import selector_rutas
+from utils.indice_rutas import indice_busqueda
+from utils.cotizacion_pdf import fila_concepto, fila_titulo, generar_cotizacion, total_cobrado
+from utils.historial_cotizaciones import (
+    buscar_por_huella, guardar_cotizacion, historial_cotizaciones, huella_cotizacion, leer_archivo,
+)
+from utils.plantilla_pdf import plantilla_cotizacion
+from utils.traficos import leer_tabla
+from utils.medicion import panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ---------------------------
 # CONEXIÓN A SUPABASE
@@ -23,6 +24,7 @@ supabase = create_client(url, key)
 # ---------------------------
 # VERIFICACIÓN DE SESIÓN Y ROL
 # ---------------------------
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -32,6 +34,8 @@ if rol not in ["admin", "gerente"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 # ---------------------------
 # TITULO
 # ---------------------------
@@ -40,13 +44,13 @@ st.title("📝 Generador de Cotización para Clientes")
 # ---------------------------
 # CARGAR RUTAS DE SUPABASE
 # ---------------------------
-respuesta = supabase.table("Rutas_Picus").select("*").execute()
+filas_rutas = leer_tabla(supabase, "Rutas_Picus")
 
-if not respuesta.data:
+if not filas_rutas:
     st.warning("⚠️ No hay rutas registradas en Supabase.")
     st.stop()
 
-df = pd.DataFrame(respuesta.data)
+df = pd.DataFrame(filas_rutas)
 df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
 # Acceso rápido por ID
 if "ID_Ruta" in df.columns:
@@ -77,10 +81,15 @@ with col2:
 # ---------------------------
 # SELECCIÓN DE RUTAS SIN FILTRO
 # ---------------------------
-ids_seleccionados = st.multiselect(
+etiquetas_rutas = df["ID_Ruta"] + " | " + df["Tipo"] + " | " + df["Origen"] + " → " + df["Destino"]
+ids_elegidos = selector_rutas(
+    indice_busqueda(supabase),
     "Elige las rutas que deseas incluir:",
-    df["ID_Ruta"] + " | " + df["Tipo"] + " | " + df["Origen"] + " → " + df["Destino"]
+    key="cotizacion_rutas",
+    multiple=True,
+    format_func=lambda x: etiquetas_rutas.get(x, x),
 )
+ids_seleccionados = [etiquetas_rutas[i] for i in ids_elegidos if i in etiquetas_rutas.index]
 
 # ---------------------------
 # MONEDA Y TIPO DE CAMBIO
@@ -153,46 +162,6 @@ for ruta_sel in ids_seleccionados:
     solo_visual = [c for c in solo_visual if c not in sumar]
     rutas_config[ruta_sel] = {"sumar": sumar, "visual": solo_visual}
 
-# ---------------------------
-# UTILIDADES PLANTILLA (antes de clase PDF)
-# ---------------------------
-PLANTILLA_CANDIDATAS = [
-    "ADT PGL GRAL NO TXT.png", "Cotización Picus.jpg", "Cotización Picus.png",
-    "/mnt/data/PICUS W.png", "/mnt/data/Picus BG.png",
-]
-def _find_template():
-    for p in PLANTILLA_CANDIDATAS:
-        if os.path.exists(p):
-            return p
-    return None
-
-def _optimize_to_jpg(path_png, max_kb=750, target_w=1275, target_h=1650, quality=85):
-    """Convierte PNG pesado a JPG optimizado (150–200 DPI aprox). Devuelve ruta final."""
-    if not HAS_PIL:
-        return path_png
-    try:
-        img = Image.open(path_png).convert("RGB")
-        img.thumbnail((target_w, target_h), Image.LANCZOS)
-        out = Path(path_png).with_suffix("")  # sin extensión
-        out = f"{out}-opt.jpg"
-        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
-        if os.path.getsize(out) > max_kb * 1024:
-            img.save(out, "JPEG", quality=75, optimize=True, progressive=True)
-        return out
-    except Exception:
-        return path_png
-
-PLANTILLA_PATH = _find_template()
-if PLANTILLA_PATH and PLANTILLA_PATH.lower().endswith(".png"):
-    try:
-        if os.path.getsize(PLANTILLA_PATH) > 900 * 1024:
-            PLANTILLA_PATH = _optimize_to_jpg(PLANTILLA_PATH)
-    except Exception:
-        pass
-
-def safe_text(text):
-    return str(text).encode('latin-1', 'ignore').decode('latin-1')
-
 # ---------------------------
 # NOTAS / CONDICIONES EDITABLES
 # ---------------------------
@@ -215,86 +184,28 @@ notas_cotizacion = st.text_area(
 # ---------------------------
 if st.button("Generar Cotización PDF"):
 
-    class PDF(FPDF):
-        def __init__(self, orientation='P', unit='in', format='Letter'):
-            super().__init__(orientation=orientation, unit=unit, format=format)
-            self.set_compression(True)
-            # Fuentes Montserrat con fallback a Helvetica
-            try:
-                self.add_font('Montserrat', '', 'Montserrat-Regular.ttf', uni=True)
-                self.add_font('Montserrat', 'B', 'Montserrat-Bold.ttf', uni=True)
-                self.add_font('Montserrat', 'I', 'Montserrat-Italic.ttf', uni=True)
-                self.has_montserrat = True
-            except Exception:
-                self.has_montserrat = False
-
-        def header(self):
-            if PLANTILLA_PATH and os.path.exists(PLANTILLA_PATH):
-                self.image(PLANTILLA_PATH, x=0, y=0, w=8.5, h=11)
-            else:
-                self.set_fill_color(245, 245, 245)
-                self.rect(0, 0, 8.5, 0.8, 'F')
-
-        def set_body_font(self, bold=False, italic=False, size=7):
-            if self.has_montserrat:
-                style = ("B" if bold else "") + ("I" if italic else "")
-                self.set_font("Montserrat", style, size)
-            else:
-                style = ("B" if bold else "") + ("I" if italic else "")
-                self.set_font("Helvetica", style, size)
-
-    pdf = PDF(orientation='P', unit='in', format='Letter')
-    pdf.set_auto_page_break(auto=False)
-    pdf.add_page()
-
     # ---------------------------
-    # DATOS EN PLANTILLA ALINEADOS
+    # DATOS EN PLANTILLA
     # ---------------------------
-    pdf.set_body_font(size=10)
-    # Cliente
-    pdf.set_xy(0.85, 2.29); pdf.multi_cell(2.89, 0.31, safe_text(cliente_nombre), align="L")
-    pdf.set_xy(0.85, 2.89); pdf.multi_cell(2.89, 0.31, safe_text(cliente_direccion), align="L")
-    pdf.set_xy(0.85, 3.48); pdf.multi_cell(2.89, 0.31, safe_text(cliente_mail), align="L")
-    pdf.set_xy(0.85, 3.85);  pdf.cell(1.35, 0.31, safe_text(cliente_telefono), align="L")
-    pdf.set_xy(2.39, 3.83); pdf.cell(0.76, 0.31, safe_text(cliente_ext), align="C")
-    # Empresa
-    pdf.set_xy(4.76, 2.29); pdf.multi_cell(2.89, 0.31, safe_text(empresa_nombre), align="R")
-    pdf.set_xy(4.76, 2.89); pdf.multi_cell(2.89, 0.31, safe_text(empresa_direccion), align="R")
-    pdf.set_xy(4.76, 3.48); pdf.multi_cell(2.89, 0.31, safe_text(empresa_mail), align="R")
-    pdf.set_xy(5.43, 3.85);  pdf.cell(1.35, 0.31, safe_text(empresa_telefono), align="R")
-    pdf.set_xy(7.03, 3.83);  pdf.cell(0.76, 0.31, safe_text(empresa_ext), align="C")
-    # Fecha
-    pdf.set_xy(0.85, 4.66)
-    pdf.multi_cell(1.78, 0.22, safe_text(f"{fecha.strftime('%d/%m/%Y')}"))
+    datos_pdf = {
+        "cliente_nombre": cliente_nombre, "cliente_direccion": cliente_direccion,
+        "cliente_mail": cliente_mail, "cliente_telefono": cliente_telefono, "cliente_ext": cliente_ext,
+        "empresa_nombre": empresa_nombre, "empresa_direccion": empresa_direccion,
+        "empresa_mail": empresa_mail, "empresa_telefono": empresa_telefono, "empresa_ext": empresa_ext,
+        "fecha": fecha.strftime('%d/%m/%Y'),
+    }
 
     # ---------------------------
-    # DETALLE DE CONCEPTOS
+    # DETALLE DE CONCEPTOS (la paginación la hace utils.cotizacion_pdf)
     # ---------------------------
-    pdf.set_body_font(size=7)
-    pdf.set_text_color(128, 128, 128)
-    y = 5.84
-    total_global = 0.0
-
+    filas_pdf = []
     for ruta_sel in ids_seleccionados:
         id_ruta = ruta_sel.split(" | ")[0]
         ruta_data = df.loc[id_ruta]
-        tipo_ruta = ruta_data['Tipo']
-        origen = ruta_data['Origen']
-        destino = ruta_data['Destino']
-        descripcion = f"{origen} - {destino}"
-
-        # Título de sección por ruta
-        pdf.set_body_font(bold=True, size=7)
-        pdf.set_text_color(128, 128, 128)
-        pdf.set_xy(0.85, y); pdf.multi_cell(7, 0.15, safe_text(tipo_ruta), align="L")
-        y = pdf.get_y()
-        pdf.set_xy(0.85, y); pdf.multi_cell(7, 0.15, safe_text(descripcion), align="L")
-        y = pdf.get_y() + 0.05
+        filas_pdf.append(fila_titulo(ruta_data['Tipo'], f"{ruta_data['Origen']} - {ruta_data['Destino']}"))
 
         cfg = rutas_config.get(ruta_sel, {"sumar": [], "visual": []})
-        conceptos_orden = cfg["sumar"] + cfg["visual"]
-
-        for campo in conceptos_orden:
+        for campo in cfg["sumar"] + cfg["visual"]:
             if campo not in ruta_data or pd.isna(ruta_data[campo]) or ruta_data[campo] == 0:
                 continue
 
@@ -306,58 +217,104 @@ if st.button("Generar Cotización PDF"):
             else:
                 moneda_original = "MXP"
             valor_convertido = convertir_moneda(valor, moneda_original, moneda_cotizacion, tipo_cambio)
-
-            if y > 9:
-                pdf.add_page()
-                y = 1
-
-            es_cobrado = campo in cfg["sumar"]
-
-            # Concepto: normal si suma, cursiva si informativo
-            pdf.set_body_font(italic=not es_cobrado, size=7)
-            pdf.set_xy(0.85, y); pdf.cell(3.55, 0.15, safe_text(label_de(campo)), align="L")
-
-            # Cantidad: "1" si se cobra, vacío si informativo
-            cantidad_texto = "1" if es_cobrado else ""
-            pdf.set_body_font(size=7)  # números en regular
-            pdf.set_xy(4.64, y); pdf.cell(0.79, 0.12, cantidad_texto, align="C")
-            pdf.set_xy(5.72, y); pdf.cell(0.79, 0.12, moneda_cotizacion, align="C")
-            pdf.set_xy(6.80, y); pdf.cell(0.79, 0.12, f"${valor_convertido:,.2f}", align="R")
-
-            if es_cobrado:
-                total_global += valor_convertido
-
-            pdf.set_body_font(size=7)
-            y += 0.18
-
-    # ---------------------------
-    # TOTAL
-    # ---------------------------
-    pdf.set_body_font(bold=True, size=7)
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_xy(5.65, 9.15); pdf.cell(0.92, 0.15, moneda_cotizacion, align="C")
-    pdf.set_xy(6.73, 9.15); pdf.cell(0.92, 0.15, f"${total_global:,.2f}", align="C")
-
-    pdf.set_body_font(size=7)
-    pdf.set_text_color(128, 128, 128)
-    pdf.set_xy(0.86, 9.69)
-    pdf.multi_cell(
-        3.55, 0.15,
-        safe_text(notas_cotizacion),
-        align="L"
-    )
+            filas_pdf.append(fila_concepto(label_de(campo), valor_convertido, campo in cfg["sumar"]))
 
     # ---------------------------
     # DESCARGA (sin escribir a disco)
     # ---------------------------
     nombre_archivo_cliente = re.sub(r'[^\w\-]', '_', cliente_nombre or "Cliente")
     file_name = f'Cotizacion-{nombre_archivo_cliente}-{fecha.strftime("%d-%m-%Y")}.pdf'
-    pdf_bytes = pdf.output(dest="S").encode("latin-1")
 
-    if PLANTILLA_PATH and os.path.exists(PLANTILLA_PATH):
-        peso_kb = os.path.getsize(PLANTILLA_PATH) / 1024
-        st.caption(f"Plantilla usada: {PLANTILLA_PATH} · {peso_kb:.0f} KB")
+    # Misma huella = misma cotización impresa: se sirve el PDF del historial
+    parametros = {
+        "fecha": fecha.isoformat(),
+        "datos": datos_pdf,
+        "rutas": [s.split(" | ")[0] for s in ids_seleccionados],
+        "conceptos": {s.split(" | ")[0]: rutas_config.get(s, {"sumar": [], "visual": []}) for s in ids_seleccionados},
+        "moneda": moneda_cotizacion,
+        "tipo_cambio": tipo_cambio,
+        "notas": notas_cotizacion,
+    }
+    huella = huella_cotizacion({**parametros, "filas": filas_pdf})
+    existente = buscar_por_huella(supabase, huella)
+    pdf_bytes = leer_archivo(supabase, existente["Archivo"]) if existente else None
+
+    if pdf_bytes is not None:
+        st.info(f"📚 Cotización idéntica a {existente['ID_Cotizacion']}; se usa el PDF guardado.")
+    else:
+        pdf_bytes = generar_cotizacion(datos_pdf, filas_pdf, moneda_cotizacion, notas_cotizacion)
+        try:
+            guardada = guardar_cotizacion(
+                supabase, parametros, huella, total_cobrado(filas_pdf), pdf_bytes,
+                usuario=st.session_state.usuario.get("Nombre"),
+            )
+            st.success(f"📚 Cotización guardada en el historial como {guardada['ID_Cotizacion']}.")
+        except Exception as e:
+            st.warning(f"⚠️ No se pudo guardar la cotización en el historial: {e}")
+
+    plantilla = plantilla_cotizacion()
+    if plantilla and os.path.exists(plantilla):
+        peso_kb = os.path.getsize(plantilla) / 1024
+        st.caption(f"Plantilla usada: {plantilla} · {peso_kb:.0f} KB")
     else:
         st.warning("No se encontró la imagen de plantilla; usando encabezado básico.")
 
     st.download_button("📄 Descargar Cotización en PDF", data=pdf_bytes, file_name=file_name, mime="application/pdf")
+
+# ---------------------------
+# HISTORIAL DE COTIZACIONES
+# ---------------------------
+st.markdown("---")
+st.subheader("📚 Historial de Cotizaciones")
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def pdf_guardado(_supabase, archivo):
+    # El archivo de una huella no cambia: se lee una vez por proceso. Si falta se
+    # lanza el error para no guardar el None en caché y reintentar en el siguiente clic
+    contenido = leer_archivo(_supabase, archivo)
+    if contenido is None:
+        raise FileNotFoundError(archivo)
+    return contenido
+
+colH1, colH2 = st.columns(2)
+with colH1:
+    filtro_cliente = st.text_input("Buscar por cliente", key="historial_cliente")
+with colH2:
+    rango_historial = st.date_input("Rango de fechas", value=(), format="DD/MM/YYYY", key="historial_fechas")
+desde_historial = rango_historial[0] if len(rango_historial) > 0 else None
+hasta_historial = rango_historial[1] if len(rango_historial) > 1 else None
+
+try:
+    historial = historial_cotizaciones(supabase, filtro_cliente, desde_historial, hasta_historial)
+except Exception as e:
+    st.warning(f"⚠️ No se pudo leer el historial: {e}")
+    historial = pd.DataFrame()
+
+if historial.empty:
+    st.info("No hay cotizaciones guardadas con esos filtros.")
+else:
+    vista = historial.drop(columns=["Archivo"]).copy()
+    vista["Rutas"] = vista["Rutas"].map(lambda r: ", ".join(r or []))
+    st.dataframe(vista, use_container_width=True, hide_index=True)
+
+    fila_historial = historial.set_index("ID_Cotizacion", drop=False)
+    id_cotizacion = st.selectbox(
+        "Cotización a descargar",
+        fila_historial.index,
+        format_func=lambda i: f"{i} | {fila_historial.at[i, 'Cliente'] or 'Sin cliente'} | {fila_historial.at[i, 'Fecha']}",
+        key="historial_sel",
+    )
+    archivo_historial = fila_historial.at[id_cotizacion, "Archivo"]
+    if not archivo_historial:
+        st.warning("⚠️ Esta cotización no tiene archivo guardado.")
+    else:
+        # El PDF se descarga del almacenamiento solo al hacer clic, no en cada rerun
+        st.download_button(
+            "📄 Descargar cotización guardada",
+            data=lambda: pdf_guardado(supabase, archivo_historial),
+            file_name=f"{id_cotizacion}.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            key="historial_descarga",
+        )
+        st.caption("Si el archivo ya no está disponible, la descarga avisará del error.")
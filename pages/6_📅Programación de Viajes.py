@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
+import hashlib
+import io
 from datetime import datetime, date
 from supabase import create_client
+from utils.exportar import botones_descarga
+from utils.despacho import leer_despacho, registros_nuevos
+from utils.asignacion import asignar_regresos, candidatos_regreso
+from utils.rollups import acumular_rollups, tramos_cerrados
+from utils.traficos import a_registros, abiertos, cerrados, cerrar_en_lote, upsert_en_lotes, invalidar_traficos, leer_tabla, traficos_del_rerun
+from utils.ubicaciones import EmparejadorTrigramas, internar_ubicaciones, normalizar_cliente, normalizar_ubicacion
+from utils.versiones import llave_cache, registrar_cambio
+from utils.medicion import medir, panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # Validación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -13,6 +25,8 @@ if rol not in ["admin", "gerente", "ejecutivo"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 # Validación de secretos
 if "SUPABASE_URL" not in st.secrets or "SUPABASE_KEY" not in st.secrets:
     st.error("❌ Faltan credenciales de Supabase en st.secrets.")
@@ -23,6 +37,9 @@ url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
 supabase = create_client(url, key)
 
+# Traficos_Picus se lee una sola vez por rerun (ver utils/traficos.py)
+invalidar_traficos()
+
 st.title("🛣️ Programación de Viajes Detallada")
 
 # Función auxiliar
@@ -36,10 +53,10 @@ def safe(x):
 st.success("✅ Conexión establecida correctamente con Supabase.")
 
 @st.cache_data
-def cargar_rutas():
+def cargar_rutas(version):
+    # `version` es el sello de Rutas_Picus: cualquier réplica que escriba invalida este caché
     try:
-        respuesta = supabase.table("Rutas_Picus").select("*").execute()
-        df = pd.DataFrame(respuesta.data)
+        df = internar_ubicaciones(pd.DataFrame(leer_tabla(supabase, "Rutas_Picus")))
         df["Ingreso Total"] = pd.to_numeric(df["Ingreso Total"], errors="coerce").fillna(0)
         df["Costo_Total_Ruta"] = pd.to_numeric(df["Costo_Total_Ruta"], errors="coerce").fillna(0)
         df["Utilidad"] = df["Ingreso Total"] - df["Costo_Total_Ruta"]
@@ -50,34 +67,35 @@ def cargar_rutas():
         st.error(f"❌ Error al cargar rutas: {e}")
         return pd.DataFrame()
 
-@st.cache_data
-def cargar_programaciones_pendientes():
-    try:
-        data = supabase.table("Traficos_Picus").select("*").is_("Fecha_Cierre", None).execute()
-        df = pd.DataFrame(data.data)
-        if not df.empty:
-            df["Fecha"] = pd.to_datetime(df.get("Fecha"), errors="coerce")
-            df["Fecha_Cierre"] = pd.to_datetime(df.get("Fecha_Cierre"), errors="coerce")
-        return df
-    except Exception as e:
-        st.error(f"❌ Error al cargar programaciones pendientes: {e}")
-        return pd.DataFrame()
-    
+@st.cache_resource(max_entries=2)
+def cargar_emparejadores(ubicaciones, clientes):
+    # Índices de trigramas sobre el catálogo de Rutas_Picus (se reconstruyen solo si cambia);
+    # solo se guardan el actual y el anterior, los de catálogos viejos se descartan
+    return EmparejadorTrigramas(ubicaciones), EmparejadorTrigramas(clientes, es_ubicacion=False)
+
+@st.cache_data(max_entries=8, show_spinner="Leyendo despacho...")
+def cargar_despacho(huella, _contenido):
+    # La llave es el hash del contenido: cambiar de widget no vuelve a parsear el XLSX
+    return leer_despacho(io.BytesIO(_contenido))
+
 def guardar_programacion(nuevo_registro):
     try:
-        columnas_base_data = supabase.table("Traficos_Picus").select("*").limit(1).execute().data
-        columnas_base = columnas_base_data[0].keys() if columnas_base_data else nuevo_registro.columns
+        df_traficos = traficos_del_rerun(supabase)
+        columnas_base = df_traficos.columns if not df_traficos.empty else nuevo_registro.columns
 
         nuevo_registro = nuevo_registro.reindex(columns=columnas_base, fill_value=None)
 
         registros = nuevo_registro.to_dict(orient="records")
         for fila in registros:
             id_programacion = fila.get("ID_Programacion")
-            existe = supabase.table("Traficos_Picus").select("ID_Programacion").eq("ID_Programacion", id_programacion).execute()
+            with medir("supabase.existe.Traficos_Picus"):
+                existe = supabase.table("Traficos_Picus").select("ID_Programacion").eq("ID_Programacion", id_programacion).execute()
             if not existe.data:
-                supabase.table("Traficos_Picus").insert(fila).execute()
+                with medir("supabase.insertar.Traficos_Picus", filas=1):
+                    supabase.table("Traficos_Picus").insert(fila).execute()
             else:
                 st.warning(f"⚠️ El tráfico con ID {id_programacion} ya fue registrado previamente.")
+        registrar_cambio(supabase, "Traficos_Picus")
     except Exception as e:
         st.error(f"❌ Error al guardar programación: {e}")
 
@@ -88,42 +106,69 @@ st.header("🚛 Carga de Tráfico Desde Reporte")
 
 archivo_excel = st.file_uploader("📤 Sube el archivo de despacho (Excel)", type=["xlsx"])
 
+mostrar_registro = False
 if archivo_excel is not None:
-    st.success("✅ Archivo de despacho cargado correctamente.")
-    mostrar_registro = True
+    # ✅ Cargar y limpiar datos (lectura por bloques, solo columnas mapeadas)
+    try:
+        contenido = archivo_excel.getvalue()
+        df_despacho, errores_despacho = cargar_despacho(hashlib.sha256(contenido).hexdigest(), contenido)
+    except Exception as e:
+        st.error(f"❌ Error al leer el despacho: {e}")
+    else:
+        if errores_despacho:
+            with st.expander(f"⚠️ {len(errores_despacho)} filas del despacho se omitieron"):
+                st.write("\n".join(f"- {e}" for e in errores_despacho[:200]))
+
+        if df_despacho.empty:
+            st.warning("⚠️ El archivo de despacho no contiene viajes válidos.")
+        else:
+            st.success("✅ Archivo de despacho cargado correctamente.")
+            mostrar_registro = True
 else:
-    mostrar_registro = False
     st.info("ℹ️ No se ha cargado un archivo. Solo se mostrará la gestión de tráficos existentes, puedes seguir gestionando los tráficos ya cargados, aunque no subas un nuevo archivo.")
 
 if mostrar_registro:
-    # ✅ Cargar y limpiar datos
-    df_despacho = pd.read_excel(archivo_excel)
-
-    df_despacho = df_despacho.rename(columns={
-        "Fecha Guía": "Fecha",
-        "Pago al operador": "Sueldo_Operador",
-        "Viaje": "Numero_Trafico",
-        "Operación": "Tipo",
-        "Tarifa": "Ingreso_Original",
-        "Moneda": "Moneda",
-        "Clasificación": "Ruta_Tipo",
-        "Unidad": "Unidad",
-        "Operador": "Operador"
-    })
-
-    df_despacho["Ruta_Tipo"] = df_despacho["Ruta_Tipo"].apply(lambda x: "Ruta Larga" if str(x).upper() == "PROPIA" else "Tramo")
-    df_despacho["Tipo"] = df_despacho["Tipo"].str.upper()
-    df_despacho["Fecha"] = pd.to_datetime(df_despacho["Fecha"]).dt.date
-    df_despacho["KM"] = pd.to_numeric(df_despacho["KM"], errors='coerce')
-    df_despacho["Ingreso_Original"] = pd.to_numeric(df_despacho["Ingreso_Original"], errors='coerce')
-    df_despacho["Sueldo_Operador"] = pd.to_numeric(df_despacho["Sueldo_Operador"], errors='coerce')
-
     # ✅ Selección del tráfico
-    rutas_df = cargar_rutas()
+    rutas_df = cargar_rutas(llave_cache(supabase, "Rutas_Picus"))
+    if not rutas_df.empty:
+        # Resolver texto libre del despacho contra la ortografía de Rutas_Picus
+        emparejador_ubicaciones, emparejador_clientes = cargar_emparejadores(
+            tuple(rutas_df["Origen"].cat.categories), tuple(rutas_df["Cliente"].cat.categories)
+        )
+        for col in ["Origen", "Destino"]:
+            df_despacho[col] = emparejador_ubicaciones.resolver_serie(df_despacho[col])
+        df_despacho["Cliente"] = emparejador_clientes.resolver_serie(df_despacho["Cliente"])
+
     st.header("📝 Registro de tráfico desde despacho")
 
-    registros_existentes = supabase.table("Traficos_Picus").select("ID_Programacion").execute().data
-    traficos_registrados = {r["ID_Programacion"] for r in registros_existentes}
+    df_registrados = traficos_del_rerun(supabase)
+    traficos_registrados = set(df_registrados["ID_Programacion"]) if not df_registrados.empty else set()
+
+    # 📦 Registro masivo: todos los viajes del despacho que aún no existen
+    with st.expander("📦 Registro masivo de viajes no registrados"):
+        colM1, colM2, colM3 = st.columns(3)
+        rendimiento_masivo = colM1.number_input("Rendimiento Camión", value=2.5, key="rendimiento_masivo")
+        diesel_masivo = colM2.number_input("Costo Diesel", value=24.0, key="diesel_masivo")
+        tc_masivo = colM3.number_input("Tipo de cambio USD", value=17.5, key="tc_masivo")
+
+        nuevos, omitidos = registros_nuevos(df_despacho, traficos_registrados, rendimiento_masivo, diesel_masivo, tc_masivo)
+        st.markdown(f"**Viajes nuevos:** {len(nuevos)} · **Ya registrados u omitidos:** {df_despacho['Numero_Trafico'].nunique() - len(nuevos)}")
+        if omitidos:
+            st.warning("\n".join(f"- {o}" for o in omitidos[:50]))
+
+        if not nuevos.empty:
+            st.dataframe(nuevos[["ID_Programacion", "Cliente", "Origen", "Destino", "Tipo", "Ingreso Total", "Costo_Total_Ruta"]], use_container_width=True)
+            if st.button(f"📥 Registrar {len(nuevos)} viajes"):
+                try:
+                    escritos = upsert_en_lotes(supabase, a_registros(nuevos))
+                    st.success(f"✅ {escritos} tráficos registrados desde despacho.")
+                    traficos_registrados.update(nuevos["ID_Programacion"])
+                except Exception as e:
+                    st.error(f"❌ Error al registrar tráficos (los lotes anteriores sí se guardaron; reintentar no los duplica): {e}")
+                finally:
+                    # Un lote fallido no deshace los anteriores: la versión cambia de todos modos
+                    registrar_cambio(supabase, "Traficos_Picus")
+                    invalidar_traficos()
 
     viajes_disponibles = df_despacho["Numero_Trafico"].dropna().unique()
     viaje_sel = st.selectbox("Selecciona un número de tráfico del despacho", viajes_disponibles)
@@ -189,16 +234,17 @@ if mostrar_registro:
                 id_programacion = f"{viaje_sel}_{fecha_str}"
 
                 # Verificar si ya existe
-                existe = supabase.table("Traficos_Picus").select("ID_Programacion").eq("ID_Programacion", id_programacion).execute()
+                with medir("supabase.existe.Traficos_Picus"):
+                    existe = supabase.table("Traficos_Picus").select("ID_Programacion").eq("ID_Programacion", id_programacion).execute()
                 if existe.data:
                     st.warning("⚠️ Este tráfico ya está registrado.")
                 else:
                     nuevo_registro = pd.DataFrame([{
                         "ID_Programacion": f"{viaje_sel}_{fecha_str}",
                         "Fecha": fecha_str,
-                        "Cliente": cliente,
-                        "Origen": origen,
-                        "Destino": destino,
+                        "Cliente": normalizar_cliente(cliente),
+                        "Origen": normalizar_ubicacion(origen),
+                        "Destino": normalizar_ubicacion(destino),
                         "Tipo": tipo,
                         "Moneda": moneda,
                         "Ingreso_Original": ingreso_original,
@@ -218,6 +264,7 @@ if mostrar_registro:
                         "Costo_Extras": 0.0
                     }])
                     guardar_programacion(nuevo_registro)
+                    invalidar_traficos()
                     st.success("✅ Tráfico registrado exitosamente desde despacho.")
 
 # =====================================
@@ -228,11 +275,7 @@ st.header("🛠️ Gestión de Tráficos Programados")
 
 def cargar_programaciones_abiertas():
     try:
-        data = supabase.table("Traficos_Picus").select("*").is_("Fecha_Cierre", None).execute()
-        df = pd.DataFrame(data.data)
-        if not df.empty:
-            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-        return df
+        return abiertos(traficos_del_rerun(supabase))
     except Exception as e:
         st.error(f"❌ Error al cargar programaciones abiertas: {e}")
         return pd.DataFrame()
@@ -261,7 +304,9 @@ else:
     st.dataframe(df_filtrado)
 
     if st.button("🗑️ Eliminar tráfico completo"):
-        supabase.table("Traficos_Picus").delete().eq("ID_Programacion", id_edit).execute()
+        with medir("supabase.eliminar.Traficos_Picus"):
+            supabase.table("Traficos_Picus").delete().eq("ID_Programacion", id_edit).execute()
+        registrar_cambio(supabase, "Traficos_Picus")
         st.success("Tráfico eliminado exitosamente.")
         st.rerun()
 
@@ -318,7 +363,10 @@ else:
                     "Costo_Total_Ruta": total
                 })
 
-                supabase.table("Traficos_Picus").update(columnas).eq("ID_Programacion", id_edit).eq("Tramo", "IDA").execute()
+                with medir("supabase.actualizar.Traficos_Picus", filas=1):
+                    supabase.table("Traficos_Picus").update(columnas).eq("ID_Programacion", id_edit).eq("Tramo", "IDA").execute()
+                registrar_cambio(supabase, "Traficos_Picus")
+                invalidar_traficos()
                 st.success("✅ Cambios guardados correctamente.")
     else:
         st.warning("⚠️ No se encontró tramo IDA para editar.")
@@ -330,14 +378,13 @@ st.markdown("---")
 st.header("🔁 Completar y Simular Tráfico Detallado")
 
 def cargar_programaciones_pendientes():
-    data = supabase.table("Traficos_Picus").select("*").is_("Fecha_Cierre", None).execute()
-    df = pd.DataFrame(data.data)
-    if not df.empty:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    return df
+    return abiertos(traficos_del_rerun(supabase))
 
 df_prog = cargar_programaciones_pendientes()
-df_rutas = cargar_rutas()
+df_rutas = cargar_rutas(llave_cache(supabase, "Rutas_Picus"))
+if not df_prog.empty and not df_rutas.empty:
+    # Catálogo compartido: Destino de la IDA vs Origen de las rutas se compara por código
+    df_prog, df_rutas = internar_ubicaciones(df_prog, df_rutas)
 
 # Validación de columnas numéricas
 for col in ["Ingreso Total", "Costo_Total_Ruta"]:
@@ -350,9 +397,117 @@ for col in ["Ingreso Total", "Costo_Total_Ruta", "% Utilidad"]:
         df_rutas[col] = 0.0
     df_rutas[col] = pd.to_numeric(df_rutas[col], errors="coerce").fillna(0.0)
 
+def cerrar_traficos(cierres):
+    # cierres: [(ida, [tramos de regreso])] -> {ID_Programacion: None | error}
+    df_traficos = traficos_del_rerun(supabase)
+    columnas = df_traficos.columns if not df_traficos.empty else None
+    fecha_cierre = date.today()
+    resultado = cerrar_en_lote(supabase, cierres, columnas, fecha_cierre=fecha_cierre)
+    registrar_cambio(supabase, "Traficos_Picus")
+    try:
+        # Acumulados de rentabilidad: solo los tráficos que sí se cerraron
+        acumular_rollups(supabase, tramos_cerrados(cierres, resultado, fecha_cierre))
+        registrar_cambio(supabase, "Rollups_Traficos")
+    except Exception as e:
+        st.warning(f"⚠️ Tráficos cerrados, pero no se actualizaron los acumulados de rentabilidad: {e}")
+    return resultado
+
+def mostrar_resultado_cierre(resultado):
+    cerrados_ok = [i for i, error in resultado.items() if error is None]
+    fallidos = {i: error for i, error in resultado.items() if error is not None}
+    if cerrados_ok:
+        st.success(f"✅ {len(cerrados_ok)} tráficos cerrados: {', '.join(cerrados_ok)}")
+    for id_prog, error in fallidos.items():
+        st.error(f"❌ {id_prog}: {error}")
+
+def mejor_regreso(ida):
+    # Misma regla que el cierre individual: directa con mejor % utilidad, si no VACÍO + carga con mejor utilidad
+    tipo_regreso = "EXPORTACION" if ida["Tipo"] == "IMPORTACION" else "IMPORTACION"
+    directas = df_rutas[(df_rutas["Tipo"] == tipo_regreso) & (df_rutas["Origen"] == ida["Destino"])]
+    if not directas.empty:
+        return [directas.loc[directas["% Utilidad"].idxmax()]]
+    vacios = df_rutas[(df_rutas["Tipo"] == "VACIO") & (df_rutas["Origen"] == ida["Destino"])]
+    mejor_combo, mejor_utilidad = None, None
+    for _, vacio in vacios.iterrows():
+        exportacion = df_rutas[(df_rutas["Tipo"] == tipo_regreso) & (df_rutas["Origen"] == vacio["Destino"])]
+        if exportacion.empty:
+            continue
+        exportacion = exportacion.loc[exportacion["% Utilidad"].idxmax()]
+        utilidad = (safe(ida["Ingreso Total"]) + safe(exportacion["Ingreso Total"])
+                    - safe(ida["Costo_Total_Ruta"]) - safe(vacio["Costo_Total_Ruta"]) - safe(exportacion["Costo_Total_Ruta"]))
+        if mejor_utilidad is None or utilidad > mejor_utilidad:
+            mejor_combo, mejor_utilidad = [vacio, exportacion], utilidad
+    return mejor_combo
+
 if df_prog.empty or "ID_Programacion" not in df_prog.columns:
     st.info("ℹ️ No hay tráficos pendientes por completar.")
 else:
+    # 🚚 Asignación conjunta: una carga de regreso no se puede asignar a dos unidades
+    with st.expander("🚚 Plan de regresos para toda la flotilla (optimizado por utilidad)"):
+        df_idas = df_prog[df_prog["Tramo"] == "IDA"].drop_duplicates("ID_Programacion")
+
+        if st.button("⚙️ Calcular plan de asignación"):
+            candidatos = candidatos_regreso(df_idas, df_rutas)
+            st.session_state.plan_regresos = asignar_regresos(candidatos)
+
+        plan = st.session_state.get("plan_regresos")
+        if plan is not None:
+            if plan.empty:
+                st.warning("❌ No se encontraron rutas de regreso para los tráficos abiertos.")
+            else:
+                st.dataframe(plan[[
+                    "ID_Programacion", "ID_Ruta_Vacio", "ID_Ruta_Regreso", "Cliente_Regreso",
+                    "Origen_Carga", "Destino_Carga", "Utilidad"
+                ]], use_container_width=True)
+                st.markdown(f"**Tráficos asignados:** {len(plan)} de {len(df_idas)} · **Utilidad total:** ${plan['Utilidad'].sum():,.2f}")
+
+                if st.button("✅ Confirmar plan y cerrar tráficos"):
+                    idas_por_id = df_idas.set_index("ID_Programacion", drop=False)
+                    rutas_por_id = df_rutas.set_index("ID_Ruta", drop=False)
+                    cierres = []
+                    for fila in plan.itertuples(index=False):
+                        tramos = [rutas_por_id.loc[fila.ID_Ruta_Regreso]]
+                        if fila.ID_Ruta_Vacio is not None and pd.notna(fila.ID_Ruta_Vacio):
+                            tramos.insert(0, rutas_por_id.loc[fila.ID_Ruta_Vacio])
+                        cierres.append((idas_por_id.loc[fila.ID_Programacion], tramos))
+                    mostrar_resultado_cierre(cerrar_traficos(cierres))
+                    invalidar_traficos()
+                    del st.session_state["plan_regresos"]
+
+    # 📦 Cierre por lote: varios tráficos, un formulario, pocas peticiones
+    with st.expander("📦 Cierre por lote de tráficos pendientes"):
+        df_idas = df_prog[df_prog["Tramo"] == "IDA"].drop_duplicates("ID_Programacion")
+        idas_por_id = df_idas.set_index("ID_Programacion", drop=False)
+        ids_lote = st.multiselect("Tráficos a cerrar", idas_por_id.index.tolist(), key="ids_cierre_lote")
+
+        if ids_lote:
+            with st.form("cierre_lote"):
+                cierres, sin_regreso = [], []
+                for id_prog in ids_lote:
+                    ida_lote = idas_por_id.loc[id_prog]
+                    tramos = mejor_regreso(ida_lote)
+                    if not tramos:
+                        sin_regreso.append(id_prog)
+                        continue
+                    utilidad = (safe(ida_lote["Ingreso Total"]) + sum(safe(t["Ingreso Total"]) for t in tramos)
+                                - safe(ida_lote["Costo_Total_Ruta"]) - sum(safe(t["Costo_Total_Ruta"]) for t in tramos))
+                    ruta = " → ".join([str(tramos[0]["Origen"])] + [str(t["Destino"]) for t in tramos])
+                    incluir = st.checkbox(
+                        f"{id_prog} | {tramos[-1]['Cliente']} | {ruta} | Utilidad ${utilidad:,.2f}",
+                        value=True, key=f"lote_{id_prog}"
+                    )
+                    if incluir:
+                        cierres.append((ida_lote, tramos))
+                for id_prog in sin_regreso:
+                    st.warning(f"❌ {id_prog}: sin rutas de regreso disponibles.")
+
+                if st.form_submit_button("💾 Cerrar tráficos seleccionados"):
+                    if cierres:
+                        mostrar_resultado_cierre(cerrar_traficos(cierres))
+                        invalidar_traficos()
+                    else:
+                        st.info("No hay tráficos seleccionados para cerrar.")
+
     ids_pendientes = df_prog["ID_Programacion"].unique()
 
     if len(ids_pendientes) > 0:
@@ -414,24 +569,12 @@ else:
         st.metric("Utilidad Neta", f"${utilidad_neta:,.2f} ({(utilidad_neta/ingreso*100):.2f}%)")
 
         if st.button("💾 Guardar y cerrar tráfico"):
-            fecha_cierre = date.today()
-            nuevos_tramos = []
-
-            for tramo in rutas[1:]:
-                datos = tramo.copy()
-                datos["Fecha"] = fecha_cierre
-                datos["Fecha_Cierre"] = fecha_cierre
-                datos["Número_Trafico"] = ida["Número_Trafico"]
-                datos["Unidad"] = ida["Unidad"]
-                datos["Operador"] = ida["Operador"]
-                datos["ID_Programacion"] = ida["ID_Programacion"]
-                datos["Tramo"] = "VUELTA"
-                nuevos_tramos.append(datos)
-
-            guardar_programacion(pd.DataFrame(nuevos_tramos))
-            supabase.table("Traficos_Picus").update({"Fecha_Cierre": fecha_cierre}).eq("ID_Programacion", ida["ID_Programacion"]).eq("Tramo", "IDA").execute()
-
-            st.success("✅ Tráfico cerrado exitosamente.")
+            resultado = cerrar_traficos([(ida, rutas[1:])])
+            invalidar_traficos()
+            if resultado[str(ida["ID_Programacion"])] is None:
+                st.success("✅ Tráfico cerrado exitosamente.")
+            else:
+                st.error(f"❌ Error al cerrar tráfico: {resultado[str(ida['ID_Programacion'])]}")
     else:
         st.info("ℹ️ No hay tráficos pendientes por completar.")
 # =====================================
@@ -442,12 +585,8 @@ st.header("✅ Tráficos Concluidos con Filtro de Fechas")
 
 def cargar_concluidos():
     try:
-        data = supabase.table("Traficos_Picus").select("*").execute()
-        df = pd.DataFrame(data.data)
-        df = df[df["Fecha_Cierre"].notna()]
+        df = cerrados(traficos_del_rerun(supabase))
         if not df.empty:
-            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-            df["Fecha_Cierre"] = pd.to_datetime(df["Fecha_Cierre"], errors="coerce")
             df["Ingreso Total"] = pd.to_numeric(df["Ingreso Total"], errors="coerce").fillna(0.0)
             df["Costo_Total_Ruta"] = pd.to_numeric(df["Costo_Total_Ruta"], errors="coerce").fillna(0.0)
         return df
@@ -486,10 +625,4 @@ else:
         st.subheader("📋 Resumen de Viajes Concluidos")
         st.dataframe(resumen, use_container_width=True)
 
-        csv = resumen.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "📥 Descargar Resumen en CSV",
-            data=csv,
-            file_name="resumen_traficos_concluidos.csv",
-            mime="text/csv"
-        )
+        botones_descarga(resumen, "Descargar Resumen", "resumen_traficos_concluidos", key="resumen_concluidos")
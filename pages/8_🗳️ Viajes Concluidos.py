@@ -6,8 +6,16 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from supabase import create_client
+from utils.exportar import botones_descarga
+from utils.particiones import invalidar_particiones, traficos_cerrados
+from utils.rollups import DIMENSIONES, leer_rollups, reconstruir_rollups, resumen_rollups
+from utils.traficos import resumen_viajes_redondos
+from utils.versiones import registrar_cambio
+from utils.medicion import panel_rendimiento
+from utils.sesion import restaurar_sesion
 
 # ✅ Verificación de sesión y rol
+restaurar_sesion()
 if "usuario" not in st.session_state:
     st.error("⚠️ No has iniciado sesión.")
     st.stop()
@@ -17,6 +25,8 @@ if rol not in ["admin", "gerente", "ejecutivo"]:
     st.error("🚫 No tienes permiso para acceder a este módulo.")
     st.stop()
 
+panel_rendimiento()
+
 # 🔧 Conexión a Supabase
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
@@ -25,8 +35,8 @@ supabase = create_client(url, key)
 st.title("✅ Tráficos Concluidos con Filtro de Fechas")
 
 def cargar_programaciones():
-    data = supabase.table("Traficos_Picus").select("*").execute()
-    df = pd.DataFrame(data.data)
+    # Meses cerrados desde la caché local; solo el mes en curso viene de Supabase
+    df = traficos_cerrados(supabase)
     if df.empty:
         return pd.DataFrame()
     df["Fecha_Cierre"] = pd.to_datetime(df["Fecha_Cierre"], errors="coerce")
@@ -57,56 +67,49 @@ else:
     if df_filtrado.empty:
         st.warning("No hay tráficos concluidos en ese rango de fechas.")
     else:
-        resumen = []
-        for trafico in df_filtrado["Número_Trafico"].unique():
-            tramos = df_filtrado[df_filtrado["Número_Trafico"] == trafico]
-            ida = tramos[tramos["ID_Programacion"].str.contains("_IDA")].iloc[0] if not tramos[tramos["ID_Programacion"].str.contains("_IDA")].empty else None
-            vuelta = tramos[~tramos["ID_Programacion"].str.contains("_IDA")]
-
-            ingreso_total = tramos["Ingreso Total"].sum()
-            costo_total = tramos["Costo_Total_Ruta"].sum()
-            utilidad_bruta = ingreso_total - costo_total
-            utilidad_pct = round(utilidad_bruta / ingreso_total * 100, 2) if ingreso_total else 0
-
-            cliente_ida = ida["Cliente"] if ida is not None else ""
-            ruta_ida = f"{ida['Origen']} → {ida['Destino']}" if ida is not None else ""
-
-            clientes_vuelta = " | ".join(vuelta["Cliente"].dropna().astype(str))
-            rutas_vuelta = " | ".join(f"{row['Origen']} → {row['Destino']}" for _, row in vuelta.iterrows())
-            fecha_cierre = vuelta["Fecha_Cierre"].max().date() if not vuelta.empty else ""
-
-            resumen.append({
-                "Número_Trafico": trafico,
-                "Fecha": fecha_cierre,
-                "Cliente IDA": cliente_ida,
-                "Ruta IDA": ruta_ida,
-                "Clientes VUELTA": clientes_vuelta,
-                "Rutas VUELTA": rutas_vuelta,
-                "Ingreso Total VR": ingreso_total,
-                "Costo Total VR": costo_total,
-                "Utilidad Total VR": utilidad_bruta,
-                "% Utilidad Total VR": utilidad_pct
-            })
-
-        resumen_df = pd.DataFrame(resumen)
+        resumen_df = resumen_viajes_redondos(df_filtrado)
         st.subheader("📋 Resumen de Viajes Redondos")
         st.dataframe(resumen_df, use_container_width=True)
 
-        # Botón para descargar resumen
-        csv = resumen_df.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "📥 Descargar Resumen en CSV",
-            data=csv,
-            file_name="resumen_viajes_redondos.csv",
-            mime="text/csv"
-        )
-        
-        # Botón para descargar detalle completo filtrado
-        detalle = df_filtrado.copy()
-        detalle_csv = detalle.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "📥 Descargar Detalle Completo en CSV",
-            data=detalle_csv,
-            file_name="detalle_completo_viajes_redondos.csv",
-            mime="text/csv"
-        )
+        # Descargas: los archivos se generan solo al hacer clic
+        botones_descarga(resumen_df, "Descargar Resumen", "resumen_viajes_redondos", key="resumen_vr")
+        botones_descarga(df_filtrado, "Descargar Detalle Completo", "detalle_completo_viajes_redondos", key="detalle_vr")
+
+# =====================================
+# 📈 RENTABILIDAD POR PERIODO (acumulados)
+# =====================================
+st.markdown("---")
+st.subheader("📈 Rentabilidad por Periodo")
+
+hoy = datetime.today().date()
+colR1, colR2, colR3, colR4 = st.columns(4)
+dimension = colR1.selectbox("Agrupar por", list(DIMENSIONES), index=1)
+periodo = colR2.selectbox("Periodo", ["Mes", "Año", "Día"])
+desde = colR3.date_input("Desde", value=hoy.replace(month=1, day=1), key="rollup_desde")
+hasta = colR4.date_input("Hasta", value=hoy, key="rollup_hasta")
+
+try:
+    df_rollups = leer_rollups(supabase, dimension, desde, hasta)
+except Exception as e:
+    st.error(f"❌ Error al cargar acumulados de rentabilidad: {e}")
+    df_rollups = pd.DataFrame()
+
+if df_rollups.empty:
+    st.info("ℹ️ No hay acumulados en ese rango de fechas.")
+else:
+    resumen_periodo = resumen_rollups(df_rollups, {"Mes": "M", "Año": "Y", "Día": "D"}[periodo])
+    st.dataframe(resumen_periodo.rename(columns={"Clave": dimension}), use_container_width=True)
+
+if rol == "admin":
+    if st.button("🔄 Reconstruir acumulados desde el historial"):
+        with st.spinner("Reconstruyendo acumulados..."):
+            try:
+                filas = reconstruir_rollups(supabase)
+                registrar_cambio(supabase, "Rollups_Traficos")
+                st.success(f"✅ {filas} filas de acumulados reconstruidas.")
+            except Exception as e:
+                st.error(f"❌ Error al reconstruir acumulados: {e}")
+
+    if st.button("🧹 Reiniciar caché local de tráficos cerrados"):
+        invalidar_particiones()
+        st.success("✅ Caché reiniciada; se descargará de nuevo en la próxima consulta.")
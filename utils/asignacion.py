@@ -0,0 +1,168 @@
+# utils/asignacion.py
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.medicion import medido
+
+# --------- Opcional: solver de SciPy si está instalado ---------
+try:
+    from scipy.optimize import linear_sum_assignment
+    HAS_SCIPY = True
+except Exception:
+    HAS_SCIPY = False
+
+
+def tipo_regreso(tipo: pd.Series) -> np.ndarray:
+    # Misma regla que la sección 3: IMPO regresa EXPO, todo lo demás regresa IMPO
+    return np.where(tipo == "IMPORTACION", "EXPORTACION", "IMPORTACION")
+
+
+@medido("pandas.candidatos_regreso")
+def candidatos_regreso(df_ida: pd.DataFrame, df_rutas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds every (open IDA, return load) option with merges instead of loops.
+
+    A return is either a direct load from the IDA destination or VACIO + load.
+    Only the best VACIO variant is kept per (tráfico, load) pair. Origen/Destino
+    should be interned with the same catalog (see utils.ubicaciones) so the
+    joins run on category codes.
+    """
+    ida = pd.DataFrame({
+        "ID_Programacion": df_ida["ID_Programacion"].values,
+        "Destino_IDA": df_ida["Destino"].values,
+        "Tipo_Regreso": tipo_regreso(df_ida["Tipo"]),
+        "Ingreso_IDA": pd.to_numeric(df_ida["Ingreso Total"], errors="coerce").fillna(0.0).values,
+        "Costo_IDA": pd.to_numeric(df_ida["Costo_Total_Ruta"], errors="coerce").fillna(0.0).values,
+    })
+
+    cargas = df_rutas[df_rutas["Tipo"] != "VACIO"]
+    cargas = pd.DataFrame({
+        "ID_Ruta_Regreso": cargas["ID_Ruta"].values,
+        "Tipo_Carga": cargas["Tipo"].values,
+        "Origen_Carga": cargas["Origen"].values,
+        "Destino_Carga": cargas["Destino"].values,
+        "Cliente_Regreso": cargas["Cliente"].values,
+        "Ingreso_Regreso": cargas["Ingreso Total"].values,
+        "Costo_Regreso": cargas["Costo_Total_Ruta"].values,
+    })
+    vacios = df_rutas[df_rutas["Tipo"] == "VACIO"]
+    vacios = pd.DataFrame({
+        "ID_Ruta_Vacio": vacios["ID_Ruta"].values,
+        "Origen_Vacio": vacios["Origen"].values,
+        "Destino_Vacio": vacios["Destino"].values,
+        "Costo_Vacio": vacios["Costo_Total_Ruta"].values,
+    })
+
+    directas = ida.merge(cargas, left_on=["Destino_IDA", "Tipo_Regreso"], right_on=["Origen_Carga", "Tipo_Carga"])
+    directas["ID_Ruta_Vacio"] = None
+    directas["Costo_Vacio"] = 0.0
+
+    con_vacio = (
+        ida.merge(vacios, left_on="Destino_IDA", right_on="Origen_Vacio")
+        .merge(cargas, left_on=["Destino_Vacio", "Tipo_Regreso"], right_on=["Origen_Carga", "Tipo_Carga"])
+    )
+
+    columnas = [
+        "ID_Programacion", "ID_Ruta_Vacio", "ID_Ruta_Regreso", "Cliente_Regreso",
+        "Origen_Carga", "Destino_Carga", "Ingreso_IDA", "Ingreso_Regreso",
+        "Costo_IDA", "Costo_Vacio", "Costo_Regreso",
+    ]
+    candidatos = pd.concat([directas[columnas], con_vacio[columnas]], ignore_index=True)
+    if candidatos.empty:
+        return candidatos.assign(Utilidad=pd.Series(dtype=float))
+
+    candidatos["Utilidad"] = (
+        candidatos["Ingreso_IDA"] + candidatos["Ingreso_Regreso"]
+        - candidatos["Costo_IDA"] - candidatos["Costo_Vacio"] - candidatos["Costo_Regreso"]
+    )
+    return (
+        candidatos.sort_values("Utilidad", ascending=False)
+        .drop_duplicates(["ID_Programacion", "ID_Ruta_Regreso"])
+        .reset_index(drop=True)
+    )
+
+
+def _hungaro(costo: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Algoritmo húngaro con potenciales (n <= m), O(n² m) con el ciclo interno vectorizado
+    n, m = costo.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            libres = ~used[1:]
+            cur = costo[i0 - 1] - u[i0] - v[1:]
+            mejora = libres & (cur < minv[1:])
+            minv[1:][mejora] = cur[mejora]
+            way[1:][mejora] = j0
+            candidatos = np.where(libres, minv[1:], np.inf)
+            j1 = int(np.argmin(candidatos)) + 1
+            delta = candidatos[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][libres] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    columnas = np.nonzero(p[1:])[0]
+    filas = p[1:][columnas] - 1
+    orden = np.argsort(filas)
+    return filas[orden], columnas[orden]
+
+
+def resolver_asignacion(costo: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum-cost assignment on a rectangular matrix (rows, cols) -> index arrays.
+    Uses SciPy when available, otherwise a NumPy Hungarian implementation.
+    """
+    if costo.size == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if HAS_SCIPY:
+        return linear_sum_assignment(costo)
+    if costo.shape[0] > costo.shape[1]:
+        columnas, filas = _hungaro(costo.T)
+        orden = np.argsort(filas)
+        return filas[orden], columnas[orden]
+    return _hungaro(costo)
+
+
+@medido("pandas.asignar_regresos")
+def asignar_regresos(candidatos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Jointly assigns return loads to open tráficos maximizing total Utilidad.
+    Each return load (ID_Ruta_Regreso) goes to at most one tráfico.
+    """
+    if candidatos.empty:
+        return candidatos
+
+    filas = pd.Index(candidatos["ID_Programacion"].unique())
+    cols = pd.Index(candidatos["ID_Ruta_Regreso"].unique())
+    i = filas.get_indexer(candidatos["ID_Programacion"])
+    j = cols.get_indexer(candidatos["ID_Ruta_Regreso"])
+
+    utilidad = candidatos["Utilidad"].to_numpy(dtype=float)
+    # Costo prohibitivo para pares sin ruta: domina cualquier suma de utilidades
+    prohibido = (np.abs(utilidad).max() + 1.0) * (len(filas) + 1)
+    costo = np.full((len(filas), len(cols)), prohibido)
+    costo[i, j] = -utilidad
+
+    r, c = resolver_asignacion(costo)
+    validos = costo[r, c] < prohibido
+    plan = pd.DataFrame({"ID_Programacion": filas[r[validos]], "ID_Ruta_Regreso": cols[c[validos]]})
+    plan = plan.merge(candidatos, on=["ID_Programacion", "ID_Ruta_Regreso"], how="left")
+    return plan.sort_values("Utilidad", ascending=False).reset_index(drop=True)
@@ -0,0 +1,137 @@
+# utils/busqueda.py
+import bisect
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import streamlit as st
+
+from utils.ubicaciones import normalizar_texto, trigramas
+
+LIMITE_RESULTADOS = 50
+
+# Peso por tipo de coincidencia de cada palabra buscada
+PESO_EXACTO = 3.0
+PESO_PREFIJO = 2.0
+UMBRAL_TRIGRAMAS = 0.5
+MAX_APROXIMADAS = 20
+
+
+class IndiceBusqueda:
+    """
+    In-memory search index over routes (ID, client, origin, destination).
+
+    Words are kept sorted with their postings laid out contiguously (CSR), so
+    the routes of every word sharing a prefix are one array slice (a flat
+    trie). Words with no prefix match fall back to trigram similarity against
+    the vocabulary. Every query word must match (AND); routes are ranked by
+    the summed match weights.
+    """
+
+    def __init__(self, ids: Iterable, textos: Iterable[Iterable], etiquetas: Optional[Iterable[str]] = None):
+        self.ids = list(ids)
+        self.etiquetas = dict(zip(self.ids, etiquetas)) if etiquetas is not None else {}
+        postings = {}
+        for pos, campos in enumerate(textos):
+            for palabra in {p for c in campos if c is not None for p in normalizar_texto(c).split()}:
+                postings.setdefault(palabra, []).append(pos)
+
+        self.palabras = sorted(postings)
+        conteos = np.fromiter((len(postings[p]) for p in self.palabras), dtype=np.int64, count=len(self.palabras))
+        self._inicios = np.concatenate([[0], np.cumsum(conteos)])
+        self._postings = (
+            np.concatenate([np.asarray(postings[p], dtype=np.int32) for p in self.palabras])
+            if self.palabras else np.empty(0, dtype=np.int32)
+        )
+
+        # Trigramas del vocabulario (no de las rutas) para la búsqueda aproximada
+        grams = {}
+        self._tamanos = np.empty(len(self.palabras), dtype=np.int32)
+        for i, palabra in enumerate(self.palabras):
+            g = trigramas(palabra)
+            self._tamanos[i] = len(g)
+            for t in g:
+                grams.setdefault(t, []).append(i)
+        self._trigramas = {t: np.asarray(v, dtype=np.int32) for t, v in grams.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def etiqueta(self, id_ruta) -> str:
+        return self.etiquetas.get(id_ruta, str(id_ruta))
+
+    def _rutas(self, desde: int, hasta: int) -> np.ndarray:
+        return self._postings[self._inicios[desde]:self._inicios[hasta]]
+
+    def _puntaje_palabra(self, palabra: str) -> np.ndarray:
+        puntaje = np.zeros(len(self.ids))
+        lo = bisect.bisect_left(self.palabras, palabra)
+        hi = bisect.bisect_left(self.palabras, palabra + "\uffff", lo)
+        if lo < hi:
+            puntaje[self._rutas(lo, hi)] = PESO_PREFIJO
+            if self.palabras[lo] == palabra:
+                puntaje[self._rutas(lo, lo + 1)] = PESO_EXACTO
+            return puntaje
+
+        g = trigramas(palabra)
+        listas = [self._trigramas[t] for t in g if t in self._trigramas]
+        if not listas:
+            return puntaje
+        candidatas, compartidos = np.unique(np.concatenate(listas), return_counts=True)
+        dice = 2.0 * compartidos / (len(g) + self._tamanos[candidatas])
+        mejores = np.argsort(-dice)[:MAX_APROXIMADAS]
+        for i in mejores[dice[mejores] >= UMBRAL_TRIGRAMAS]:
+            rutas = self._rutas(candidatas[i], candidatas[i] + 1)
+            puntaje[rutas] = np.maximum(puntaje[rutas], dice[i])
+        return puntaje
+
+    def buscar(self, consulta: str, limite: int = LIMITE_RESULTADOS) -> List:
+        """
+        Returns up to `limite` route IDs matching every word of `consulta`,
+        best first (ties keep table order).
+        """
+        palabras = normalizar_texto(consulta or "").split()
+        if not palabras or not self.ids:
+            return self.ids[:limite]
+
+        total = None
+        for palabra in palabras:
+            puntaje = self._puntaje_palabra(palabra)
+            total = puntaje if total is None else np.where((total > 0) & (puntaje > 0), total + puntaje, 0.0)
+
+        candidatos = np.flatnonzero(total)
+        if len(candidatos) > limite:
+            candidatos = candidatos[np.argpartition(-total[candidatos], limite - 1)[:limite]]
+        orden = np.lexsort((candidatos, -total[candidatos]))
+        return [self.ids[i] for i in candidatos[orden]]
+
+
+def selector_rutas(
+    indice: IndiceBusqueda,
+    etiqueta: str,
+    key: str,
+    multiple: bool = False,
+    format_func: Optional[Callable] = None,
+    limite: int = LIMITE_RESULTADOS,
+    solo_con_consulta: bool = False,
+):
+    """
+    Type-ahead route picker: a search box feeding a selectbox (or multiselect)
+    with the top matches only. In the multiselect, chosen IDs stay available
+    across searches.
+    Returns the chosen ID (or list of IDs); with `solo_con_consulta`, returns
+    None and shows no list until something is typed.
+    """
+    consulta = st.text_input("🔎 Buscar ruta", key=f"{key}_buscar", placeholder="ID, cliente, origen o destino")
+    if solo_con_consulta and not consulta:
+        return None
+    resultados = indice.buscar(consulta, limite)
+    formato = format_func or indice.etiqueta
+
+    if multiple:
+        elegidos = st.session_state.get(key, [])
+        opciones = list(dict.fromkeys(list(elegidos) + resultados))
+        return st.multiselect(etiqueta, opciones, format_func=formato, key=key)
+
+    if consulta and not resultados:
+        st.caption("Sin coincidencias.")
+    return st.selectbox(etiqueta, resultados, format_func=formato, key=key)
@@ -0,0 +1,101 @@
+# utils/costeo.py
+#
+# Costeo de rutas sobre un DataFrame completo (tipo de cambio por moneda, diesel por
+# rendimiento, sueldo según Tramo / IMPO-EXPO / VACIO, bono Team y extras), con
+# operaciones por columna en vez de un cálculo por ruta. Es la única copia de estas
+# reglas: Captura de Rutas costea cada ruta nueva como un DataFrame de una fila, y el
+# benchmark mide este mismo código sobre el catálogo sintético.
+import numpy as np
+import pandas as pd
+
+from utils.medicion import medido
+
+VALORES_POR_DEFECTO = {
+    "Rendimiento Camion": 2.5,
+    "Costo Diesel": 24.0,
+    "Pago x KM (General)": 1.63,
+    "Bono ISR IMSS RL": 462.66,
+    "Bono ISR IMSS Tramo": 185.06,
+    "Pago Vacio": 100.0,
+    "Pago Tramo": 300.0,
+    "Bono Rendimiento": 250.0,
+    "Bono Modo Team": 650.0,
+    "Tipo de cambio USD": 17.5,
+    "Tipo de cambio MXP": 1.0,
+}
+
+CONCEPTOS_EXTRA = [
+    "Movimiento_Local", "Puntualidad", "Pension", "Estancia", "Fianza",
+    "Pistas_Extra", "Stop", "Falso", "Gatas", "Accesorios", "Guias",
+]
+
+
+def _numero(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _tipo_cambio(moneda: pd.Series, valores: dict) -> np.ndarray:
+    return np.where(moneda.to_numpy() == "USD", valores["Tipo de cambio USD"], valores["Tipo de cambio MXP"])
+
+
+@medido("pandas.costear_rutas")
+def costear_rutas(df: pd.DataFrame, valores: dict = None) -> pd.DataFrame:
+    """
+    Copy of `df` (Rutas_Picus captured fields) with every derived column
+    recomputed: converted incomes, crossing cost, diesel, salary, bonus,
+    extras and Costo_Total_Ruta. `valores` are the Datos Generales.
+    """
+    valores = {**VALORES_POR_DEFECTO, **(valores or {})}
+    df = df.copy()
+    km = _numero(df, "KM")
+    tramo = (df["Ruta_Tipo"] == "Tramo").to_numpy()
+    impo_expo = df["Tipo"].isin(["IMPORTACION", "EXPORTACION"]).to_numpy()
+    vacio = (df["Tipo"] == "VACIO").to_numpy()
+
+    tipo_cambio_flete = _tipo_cambio(df["Moneda"], valores)
+    tipo_cambio_cruce = _tipo_cambio(df["Moneda_Cruce"], valores)
+    tipo_cambio_costo_cruce = _tipo_cambio(df["Moneda Costo Cruce"], valores)
+    ingreso_flete = _numero(df, "Ingreso_Original") * tipo_cambio_flete
+    ingreso_cruce = _numero(df, "Cruce_Original") * tipo_cambio_cruce
+    costo_cruce = _numero(df, "Costo Cruce") * tipo_cambio_costo_cruce
+
+    extras = sum(_numero(df, c) for c in CONCEPTOS_EXTRA)
+    cobrados = df["Extras_Cobrados"].fillna(False).astype(bool).to_numpy()
+    ingresos_extras = np.where(cobrados, extras, 0.0)
+
+    diesel = km / valores["Rendimiento Camion"] * valores["Costo Diesel"]
+
+    # Tramo manda sobre el tipo de operación y siempre va con un operador
+    pago_km = valores["Pago x KM (General)"]
+    sueldo = np.select(
+        [tramo, impo_expo, vacio & (km <= 100)],
+        [valores["Pago Tramo"], km * pago_km, valores["Pago Vacio"]],
+        km * pago_km,
+    )
+    bono = np.select(
+        [tramo, impo_expo],
+        [valores["Bono ISR IMSS Tramo"], valores["Bono ISR IMSS RL"] + valores["Bono Rendimiento"]],
+        0.0,
+    )
+    modo = df["Modo de Viaje"].where(~tramo, "Operador")
+    sueldo = sueldo + np.where((modo == "Team").to_numpy(), valores["Bono Modo Team"], 0.0)
+
+    df["Modo de Viaje"] = modo
+    df["Tipo de cambio"] = tipo_cambio_flete
+    df["Ingreso Flete"] = ingreso_flete
+    df["Tipo cambio Cruce"] = tipo_cambio_cruce
+    df["Ingreso Cruce"] = ingreso_cruce
+    df["Costo Cruce Convertido"] = costo_cruce
+    df["Ingresos_Extras"] = ingresos_extras
+    df["Ingreso Total"] = ingreso_flete + ingreso_cruce + ingresos_extras
+    df["Pago por KM"] = pago_km
+    df["Sueldo_Operador"] = sueldo
+    df["Bono"] = bono
+    df["Costo_Diesel_Camion"] = diesel
+    df["Costo_Extras"] = extras
+    df["Costo_Total_Ruta"] = diesel + sueldo + bono + _numero(df, "Casetas") + extras + costo_cruce
+    df["Costo Diesel"] = valores["Costo Diesel"]
+    df["Rendimiento Camion"] = valores["Rendimiento Camion"]
+    return df
@@ -0,0 +1,189 @@
+# utils/cotizacion_pdf.py
+#
+# Maquetado de la cotización sobre la plantilla. Las filas se miden primero y luego
+# se reparten en la región de la tabla de cada hoja; el subtotal cobrado se arrastra
+# de una hoja a la siguiente ("Van" / "Vienen") y el total solo va en la última.
+import math
+from typing import List
+
+from utils.medicion import medido
+from utils.plantilla_pdf import PDFCotizacion
+
+# Región de la tabla en la plantilla (pulgadas); debajo está el total fijo (9.15)
+TABLA_INICIO = 5.84
+TABLA_FIN = 9.0
+ALTO_CONCEPTO = 0.18
+ALTO_LINEA_TITULO = 0.15
+SEPARACION_TITULO = 0.05
+ANCHO_TITULO = 7
+
+
+def safe_text(text):
+    return str(text).encode('latin-1', 'ignore').decode('latin-1')
+
+
+def fila_titulo(tipo_ruta: str, descripcion: str) -> dict:
+    return {"tipo": "titulo", "textos": (safe_text(tipo_ruta), safe_text(descripcion))}
+
+
+def fila_concepto(etiqueta: str, importe: float, cobrado: bool) -> dict:
+    return {"tipo": "concepto", "etiqueta": safe_text(etiqueta), "importe": importe, "cobrado": cobrado}
+
+
+def total_cobrado(filas: List[dict]) -> float:
+    return sum(f["importe"] for f in filas if f["tipo"] == "concepto" and f["cobrado"])
+
+
+def _lineas(pdf, texto: str, ancho: float) -> int:
+    # Mismo corte por palabras que multi_cell (texto vacío ocupa una línea)
+    util = ancho - 2 * pdf.c_margin
+    lineas = 0
+    for parrafo in texto.split("\n"):
+        lineas += 1
+        actual = 0.0
+        for palabra in parrafo.split(" "):
+            w = pdf.get_string_width(palabra)
+            if w > util:
+                # Palabra más ancha que la celda: multi_cell la parte por caracteres
+                extra = math.ceil((actual + w) / util) - 1
+                lineas += extra
+                actual = (actual + w) - extra * util
+            elif actual and actual + pdf.get_string_width(" ") + w > util:
+                lineas += 1
+                actual = w
+            else:
+                actual += (pdf.get_string_width(" ") if actual else 0) + w
+    return lineas
+
+
+def medir(pdf, filas: List[dict]) -> List[dict]:
+    """
+    Sets the rendered height ("alto") of every row. Titles are measured with
+    the bold body font, the one they are drawn with.
+    """
+    pdf.set_body_font(bold=True, size=7)
+    for fila in filas:
+        if fila["tipo"] == "titulo":
+            fila["alto"] = sum(
+                _lineas(pdf, t, ANCHO_TITULO) for t in fila["textos"]
+            ) * ALTO_LINEA_TITULO + SEPARACION_TITULO
+        else:
+            fila["alto"] = ALTO_CONCEPTO
+    return filas
+
+
+def paginar(filas: List[dict], inicio: float = TABLA_INICIO, fin: float = TABLA_FIN) -> List[List[dict]]:
+    """
+    Splits measured rows into pages that fit the table region. Every page
+    that is followed by another keeps room for the carried-subtotal row, and
+    a route title never ends a page without its first concept.
+    """
+    disponible = fin - inicio
+    hojas = [[]]
+    usado = 0.0
+    for i, fila in enumerate(filas):
+        necesario = fila["alto"]
+        siguiente = filas[i + 1] if i + 1 < len(filas) else None
+        if fila["tipo"] == "titulo" and siguiente is not None and siguiente["tipo"] == "concepto":
+            necesario += siguiente["alto"]
+        reserva = ALTO_CONCEPTO if siguiente is not None else 0.0
+        if hojas[-1] and usado + necesario + reserva > disponible:
+            hojas.append([])
+            usado = ALTO_CONCEPTO  # fila "Vienen"
+        hojas[-1].append(fila)
+        usado += fila["alto"]
+    return hojas
+
+
+def _datos(pdf, datos: dict):
+    # Cliente, empresa y fecha en los recuadros de la plantilla (se repiten en cada hoja)
+    pdf.set_body_font(size=10)
+    pdf.set_text_color(0, 0, 0)
+    # Cliente
+    pdf.set_xy(0.85, 2.29); pdf.multi_cell(2.89, 0.31, safe_text(datos["cliente_nombre"]), align="L")
+    pdf.set_xy(0.85, 2.89); pdf.multi_cell(2.89, 0.31, safe_text(datos["cliente_direccion"]), align="L")
+    pdf.set_xy(0.85, 3.48); pdf.multi_cell(2.89, 0.31, safe_text(datos["cliente_mail"]), align="L")
+    pdf.set_xy(0.85, 3.85); pdf.cell(1.35, 0.31, safe_text(datos["cliente_telefono"]), align="L")
+    pdf.set_xy(2.39, 3.83); pdf.cell(0.76, 0.31, safe_text(datos["cliente_ext"]), align="C")
+    # Empresa
+    pdf.set_xy(4.76, 2.29); pdf.multi_cell(2.89, 0.31, safe_text(datos["empresa_nombre"]), align="R")
+    pdf.set_xy(4.76, 2.89); pdf.multi_cell(2.89, 0.31, safe_text(datos["empresa_direccion"]), align="R")
+    pdf.set_xy(4.76, 3.48); pdf.multi_cell(2.89, 0.31, safe_text(datos["empresa_mail"]), align="R")
+    pdf.set_xy(5.43, 3.85); pdf.cell(1.35, 0.31, safe_text(datos["empresa_telefono"]), align="R")
+    pdf.set_xy(7.03, 3.83); pdf.cell(0.76, 0.31, safe_text(datos["empresa_ext"]), align="C")
+    # Fecha
+    pdf.set_xy(0.85, 4.66)
+    pdf.multi_cell(1.78, 0.22, safe_text(datos["fecha"]))
+
+
+def _importe(pdf, y: float, cantidad: str, moneda: str, importe: float):
+    pdf.set_body_font(size=7)  # números en regular
+    pdf.set_xy(4.64, y); pdf.cell(0.79, 0.12, cantidad, align="C")
+    pdf.set_xy(5.72, y); pdf.cell(0.79, 0.12, moneda, align="C")
+    pdf.set_xy(6.80, y); pdf.cell(0.79, 0.12, f"${importe:,.2f}", align="R")
+
+
+def _arrastre(pdf, y: float, etiqueta: str, moneda: str, subtotal: float) -> float:
+    pdf.set_body_font(bold=True, size=7)
+    pdf.set_xy(0.85, y); pdf.cell(3.55, 0.15, etiqueta, align="L")
+    _importe(pdf, y, "", moneda, subtotal)
+    return y + ALTO_CONCEPTO
+
+
+@medido("pdf.cotizacion")
+def generar_cotizacion(datos: dict, filas: List[dict], moneda: str, notas: str) -> bytes:
+    """
+    Renders the quote in one pass and returns the PDF bytes. `datos` holds the
+    client/company fields and the formatted date; `filas` comes from
+    fila_titulo / fila_concepto, in print order. Charged concepts add up to
+    the total, informative ones are printed in italics.
+    """
+    pdf = PDFCotizacion(orientation='P', unit='in', format='Letter')
+    pdf.set_auto_page_break(auto=False)
+    hojas = paginar(medir(pdf, filas))
+
+    subtotal = 0.0
+    for n, hoja in enumerate(hojas, start=1):
+        pdf.add_page()
+        _datos(pdf, datos)
+        pdf.set_text_color(128, 128, 128)
+        y = TABLA_INICIO
+        if n > 1:
+            y = _arrastre(pdf, y, "Vienen de la hoja anterior", moneda, subtotal)
+
+        for fila in hoja:
+            if fila["tipo"] == "titulo":
+                # Título de sección por ruta
+                pdf.set_body_font(bold=True, size=7)
+                pdf.set_xy(0.85, y)
+                for texto in fila["textos"]:
+                    pdf.set_x(0.85); pdf.multi_cell(ANCHO_TITULO, ALTO_LINEA_TITULO, texto, align="L")
+            else:
+                # Concepto: normal si suma, cursiva si informativo
+                pdf.set_body_font(italic=not fila["cobrado"], size=7)
+                pdf.set_xy(0.85, y); pdf.cell(3.55, 0.15, fila["etiqueta"], align="L")
+                _importe(pdf, y, "1" if fila["cobrado"] else "", moneda, fila["importe"])
+                if fila["cobrado"]:
+                    subtotal += fila["importe"]
+            y += fila["alto"]
+
+        if n < len(hojas):
+            _arrastre(pdf, y, "Van a la hoja siguiente", moneda, subtotal)
+        if len(hojas) > 1:
+            pdf.set_body_font(size=7)
+            pdf.set_xy(4.76, 9.69); pdf.cell(2.89, 0.15, f"Hoja {n} de {len(hojas)}", align="R")
+
+    # ---------------------------
+    # TOTAL
+    # ---------------------------
+    pdf.set_body_font(bold=True, size=7)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_xy(5.65, 9.15); pdf.cell(0.92, 0.15, moneda, align="C")
+    pdf.set_xy(6.73, 9.15); pdf.cell(0.92, 0.15, f"${subtotal:,.2f}", align="C")
+
+    pdf.set_body_font(size=7)
+    pdf.set_text_color(128, 128, 128)
+    pdf.set_xy(0.86, 9.69)
+    pdf.multi_cell(3.55, 0.15, safe_text(notas), align="L")
+
+    return pdf.output(dest="S").encode("latin-1")
@@ -0,0 +1,177 @@
+# utils/despacho.py
+from typing import List, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.medicion import medido
+from utils.traficos import id_tramo
+from utils.ubicaciones import normalizar_columnas
+
+# Encabezado del Excel de despacho -> columna interna
+MAPEO_COLUMNAS = {
+    "Fecha Guía": "Fecha",
+    "Pago al operador": "Sueldo_Operador",
+    "Viaje": "Numero_Trafico",
+    "Operación": "Tipo",
+    "Tarifa": "Ingreso_Original",
+    "Moneda": "Moneda",
+    "Clasificación": "Ruta_Tipo",
+    "Unidad": "Unidad",
+    "Operador": "Operador",
+    "Cliente": "Cliente",
+    "Origen": "Origen",
+    "Destino": "Destino",
+    "KM": "KM",
+}
+
+COLUMNAS_OBLIGATORIAS = ["Fecha", "Numero_Trafico", "Tipo", "Cliente", "Origen", "Destino"]
+TAMANO_BLOQUE = 5000
+
+
+def _limpiar_bloque(filas: List[tuple], columnas: List[str], fila_inicial: int, errores: List[str]) -> pd.DataFrame:
+    df = pd.DataFrame(filas, columns=columnas, dtype=object)
+    df = df.dropna(how="all")
+    if df.empty:
+        return df
+
+    # Número de fila en Excel (encabezado = fila 1) para reportar errores
+    df.index = df.index + fila_inicial
+
+    df["Ruta_Tipo"] = df["Ruta_Tipo"].apply(lambda x: "Ruta Larga" if str(x).upper() == "PROPIA" else "Tramo")
+    df["Tipo"] = df["Tipo"].map(lambda x: str(x).strip().upper() if pd.notna(x) else None)
+    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce").dt.date
+    for col in ["KM", "Ingreso_Original", "Sueldo_Operador"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # Validación al vuelo: filas sin viaje o con fecha ilegible no se registran
+    sin_viaje = df["Numero_Trafico"].isna()
+    sin_fecha = df["Fecha"].isna()
+    for fila in df.index[sin_viaje]:
+        errores.append(f"Fila {fila}: sin número de viaje")
+    for fila in df.index[sin_fecha & ~sin_viaje]:
+        errores.append(f"Fila {fila}: fecha inválida")
+
+    return normalizar_columnas(df[~(sin_viaje | sin_fecha)])
+
+
+@medido("excel.leer_despacho")
+def leer_despacho(archivo, tamano_bloque: int = TAMANO_BLOQUE) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Streams the despacho workbook in openpyxl read-only mode.
+
+    Only the mapped columns are kept; rows are cleaned and validated in
+    blocks of `tamano_bloque`, so memory stays proportional to the used
+    columns instead of the whole sheet. Returns (df, errores).
+    Raises ValueError when a required column is missing.
+    """
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # Algunos exportadores guardan dimensiones incorrectas
+        ws.reset_dimensions()
+        filas = ws.iter_rows(values_only=True)
+
+        encabezado = next(filas, None) or ()
+        posiciones = {}
+        for i, nombre in enumerate(encabezado):
+            destino = MAPEO_COLUMNAS.get(str(nombre).strip()) if nombre is not None else None
+            if destino and destino not in posiciones:
+                posiciones[destino] = i
+
+        faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in posiciones]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en el despacho: {', '.join(faltantes)}")
+
+        columnas = list(dict.fromkeys(MAPEO_COLUMNAS.values()))
+        indices = [posiciones.get(c) for c in columnas]
+
+        bloques, errores, buffer = [], [], []
+        fila_inicial = 2
+        for fila in filas:
+            buffer.append(tuple(
+                fila[i] if i is not None and i < len(fila) else None for i in indices
+            ))
+            if len(buffer) >= tamano_bloque:
+                bloques.append(_limpiar_bloque(buffer, columnas, fila_inicial, errores))
+                fila_inicial += len(buffer)
+                buffer = []
+        if buffer:
+            bloques.append(_limpiar_bloque(buffer, columnas, fila_inicial, errores))
+    finally:
+        wb.close()
+
+    bloques = [b for b in bloques if not b.empty]
+    if not bloques:
+        return pd.DataFrame(columns=columnas), errores
+    return pd.concat(bloques), errores
+
+
+def ids_programacion(df: pd.DataFrame) -> pd.Series:
+    # Mismo formato que el registro individual: {viaje}_{AAAA-MM-DD}
+    fechas = pd.to_datetime(df["Fecha"]).dt.strftime("%Y-%m-%d")
+    return df["Numero_Trafico"].astype(str) + "_" + fechas
+
+
+@medido("pandas.registros_nuevos")
+def registros_nuevos(
+    df_despacho: pd.DataFrame,
+    registrados: set,
+    rendimiento: float,
+    costo_diesel: float,
+    tipo_cambio: float,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Diffs the whole despacho against the registered IDs in one vectorized pass
+    and prices diesel/ingreso for every new viaje.
+
+    Returns (registros, omitidos): IDA rows ready to insert in Traficos_Picus
+    and a message per viaje that could not be registered.
+    """
+    df = df_despacho.copy()
+    df["ID_Programacion"] = ids_programacion(df)
+    df = df.drop_duplicates("ID_Programacion")
+    df = df[~df["ID_Programacion"].isin(registrados)]
+
+    omitidos = []
+    sin_datos = df["Operador"].isna() | df["Unidad"].isna()
+    for id_prog in df.loc[sin_datos, "ID_Programacion"]:
+        omitidos.append(f"{id_prog}: Operador y Unidad son obligatorios")
+    df = df[~sin_datos]
+
+    tipo = df["Tipo"].where(df["Tipo"].isin(["IMPORTACION", "EXPORTACION", "VACIO"]), "IMPORTACION")
+    moneda = df["Moneda"].astype(str).str.strip().str.upper()
+    moneda = moneda.where(moneda.isin(["MXP", "USD"]), "MXP")
+    km = df["KM"].fillna(0.0)
+    ingreso_original = df["Ingreso_Original"].fillna(0.0)
+    sueldo = df["Sueldo_Operador"].fillna(0.0)
+
+    ingreso_total = ingreso_original * moneda.map({"USD": tipo_cambio, "MXP": 1.0})
+    diesel = (km / rendimiento) * costo_diesel if rendimiento > 0 else km * 0.0
+
+    registros = pd.DataFrame({
+        "ID_Programacion": df["ID_Programacion"],
+        "Fecha": pd.to_datetime(df["Fecha"]).dt.strftime("%Y-%m-%d"),
+        "Cliente": df["Cliente"],
+        "Origen": df["Origen"],
+        "Destino": df["Destino"],
+        "Tipo": tipo,
+        "Moneda": moneda,
+        "Ingreso_Original": ingreso_original,
+        "Ingreso Total": ingreso_total,
+        "KM": km,
+        "Costo Diesel": costo_diesel,
+        "Rendimiento Camion": rendimiento,
+        "Costo_Diesel_Camion": diesel,
+        "Sueldo_Operador": sueldo,
+        "Unidad": df["Unidad"].astype(str),
+        "Operador": df["Operador"].astype(str),
+        "Modo_Viaje": "Operador",
+        "Ruta_Tipo": df["Ruta_Tipo"],
+        "Tramo": "IDA",
+        "ID_Tramo": df["ID_Programacion"].map(lambda i: id_tramo(i, "IDA")),
+        "Número_Trafico": df["Numero_Trafico"],
+        "Costo_Total_Ruta": diesel + sueldo,
+        "Costo_Extras": 0.0,
+    })
+    return registros.reset_index(drop=True), omitidos
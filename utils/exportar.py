@@ -0,0 +1,76 @@
+# utils/exportar.py
+import io
+
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+
+from utils.medicion import medido
+
+TAMANO_BLOQUE = 20000
+
+
+def _celda(valor):
+    # openpyxl no acepta NaN/NaT ni tipos de numpy
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor.item() if hasattr(valor, "item") else valor
+
+
+@medido("exportar.csv")
+def csv_en_bloques(df: pd.DataFrame, tamano_bloque: int = TAMANO_BLOQUE) -> bytes:
+    """
+    Writes df as UTF-8 CSV in blocks of rows and returns the file bytes.
+    """
+    buffer = io.BytesIO()
+    texto = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    for inicio in range(0, max(len(df), 1), tamano_bloque):
+        df.iloc[inicio:inicio + tamano_bloque].to_csv(texto, index=False, header=(inicio == 0))
+    texto.flush()
+    texto.detach()
+    return buffer.getvalue()
+
+
+@medido("exportar.xlsx")
+def xlsx_en_bloques(df: pd.DataFrame, hoja: str = "Datos", tamano_bloque: int = TAMANO_BLOQUE) -> bytes:
+    """
+    Writes df as XLSX with openpyxl in write-only mode (rows are streamed to
+    the file instead of kept as cell objects) and returns the file bytes.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(hoja)
+    ws.append([str(c) for c in df.columns])
+    for inicio in range(0, len(df), tamano_bloque):
+        bloque = df.iloc[inicio:inicio + tamano_bloque].astype(object)
+        for fila in bloque.itertuples(index=False, name=None):
+            ws.append([_celda(v) for v in fila])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def botones_descarga(df: pd.DataFrame, etiqueta: str, nombre_archivo: str, key: str):
+    """
+    CSV and XLSX download buttons whose files are generated only when the
+    button is clicked (Streamlit deferred download), not on every rerun.
+    """
+    col_csv, col_xlsx = st.columns(2)
+    col_csv.download_button(
+        f"📥 {etiqueta} en CSV",
+        data=lambda: csv_en_bloques(df),
+        file_name=f"{nombre_archivo}.csv",
+        mime="text/csv",
+        on_click="ignore",
+        key=f"{key}_csv",
+    )
+    col_xlsx.download_button(
+        f"📥 {etiqueta} en Excel",
+        data=lambda: xlsx_en_bloques(df),
+        file_name=f"{nombre_archivo}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click="ignore",
+        key=f"{key}_xlsx",
+    )
@@ -0,0 +1,152 @@
+# utils/historial_cotizaciones.py
+#
+# Historial de cotizaciones: cada PDF generado se guarda con sus parámetros (datos,
+# rutas, conceptos, moneda) y su total; el archivo va a un bucket de Supabase Storage
+# o, si no hay bucket configurado, a un directorio local. La huella de los parámetros
+# evita volver a dibujar una cotización idéntica: se sirve el archivo guardado.
+#
+# Tabla requerida en Supabase:
+#   create table "Cotizaciones_Picus" (
+#       "ID_Cotizacion" text primary key,
+#       "Huella" text not null unique,
+#       "Fecha" date not null,
+#       "Cliente" text,
+#       "Moneda" text,
+#       "Tipo_Cambio" numeric,
+#       "Total" numeric,
+#       "Rutas" jsonb,      -- IDs de ruta en orden de impresión
+#       "Conceptos" jsonb,  -- {ID_Ruta: {"sumar": [...], "visual": [...]}}
+#       "Datos" jsonb,      -- campos de cliente y empresa
+#       "Notas" text,
+#       "Archivo" text,     -- "bucket:<ruta>" o "local:<ruta>"
+#       "Usuario" text,
+#       "Creado" timestamptz not null default now()
+#   );
+#   create index on "Cotizaciones_Picus" ("Fecha");
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils.medicion import medido
+from utils.retry import retry_with_backoff
+from utils.versiones import llave_cache, registrar_cambio
+
+TABLA_COTIZACIONES = "Cotizaciones_Picus"
+BUCKET_COTIZACIONES = os.environ.get("PICUS_BUCKET_COTIZACIONES")
+DIRECTORIO_COTIZACIONES = os.environ.get("PICUS_COTIZACIONES_DIR", os.path.join(".cache", "cotizaciones"))
+LIMITE_HISTORIAL = 200
+COLUMNAS_HISTORIAL = "ID_Cotizacion,Fecha,Cliente,Moneda,Total,Rutas,Usuario,Creado,Archivo"
+
+
+def huella_cotizacion(parametros: dict) -> str:
+    """
+    Content hash of everything that ends up printed in a quote.
+    """
+    contenido = json.dumps(parametros, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _guardar_archivo(supabase, nombre: str, contenido: bytes) -> str:
+    if BUCKET_COTIZACIONES:
+        supabase.storage.from_(BUCKET_COTIZACIONES).upload(
+            nombre, contenido, {"content-type": "application/pdf", "upsert": "true"}
+        )
+        return f"bucket:{nombre}"
+    os.makedirs(DIRECTORIO_COTIZACIONES, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_COTIZACIONES, nombre)
+    # Las sesiones son hilos del mismo proceso: un temporal único por escritura
+    descriptor, temporal = tempfile.mkstemp(dir=DIRECTORIO_COTIZACIONES, prefix=nombre + ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return f"local:{ruta}"
+
+
+def leer_archivo(supabase, archivo: Optional[str]) -> Optional[bytes]:
+    """
+    Stored PDF bytes of a quote, or None if the artifact is gone (e.g. a
+    local stand-in on another replica).
+    """
+    if not archivo:
+        return None
+    origen, _, ruta = archivo.partition(":")
+    try:
+        if origen == "bucket":
+            return supabase.storage.from_(BUCKET_COTIZACIONES).download(ruta)
+        with open(ruta, "rb") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def buscar_por_huella(supabase, huella: str) -> Optional[dict]:
+    try:
+        res = supabase.table(TABLA_COTIZACIONES).select("*").eq("Huella", huella).limit(1).execute()
+    except Exception:
+        return None
+    return res.data[0] if res.data else None
+
+
+def guardar_cotizacion(supabase, parametros: dict, huella: str, total: float, pdf_bytes: bytes, usuario: str = None) -> dict:
+    """
+    Stores the PDF artifact and its history row. Re-saving the same
+    parameters (same huella) overwrites the artifact and updates the row.
+    """
+    fecha = pd.Timestamp(parametros["fecha"]).date()
+    id_cotizacion = f"COT-{fecha:%Y%m%d}-{huella[:8].upper()}"
+    archivo = _guardar_archivo(supabase, f"{id_cotizacion}.pdf", pdf_bytes)
+    fila = {
+        "ID_Cotizacion": id_cotizacion,
+        "Huella": huella,
+        "Fecha": fecha.isoformat(),
+        "Cliente": parametros["datos"].get("cliente_nombre") or None,
+        "Moneda": parametros["moneda"],
+        "Tipo_Cambio": parametros["tipo_cambio"],
+        "Total": round(float(total), 2),
+        "Rutas": parametros["rutas"],
+        "Conceptos": parametros["conceptos"],
+        "Datos": parametros["datos"],
+        "Notas": parametros["notas"],
+        "Archivo": archivo,
+        "Usuario": usuario,
+    }
+    retry_with_backoff(
+        lambda: supabase.table(TABLA_COTIZACIONES).upsert(fila, on_conflict="Huella").execute()
+    )
+    registrar_cambio(supabase, TABLA_COTIZACIONES)
+    return fila
+
+
+@st.cache_data(show_spinner=False)
+def _historial(_supabase, cliente: str, desde: Optional[date], hasta: Optional[date], version) -> pd.DataFrame:
+    q = _supabase.table(TABLA_COTIZACIONES).select(COLUMNAS_HISTORIAL)
+    if cliente:
+        q = q.ilike("Cliente", f"%{cliente}%")
+    if desde:
+        q = q.gte("Fecha", desde.isoformat())
+    if hasta:
+        q = q.lte("Fecha", hasta.isoformat())
+    res = q.order("Creado", desc=True).limit(LIMITE_HISTORIAL).execute()
+    return pd.DataFrame(res.data or [], columns=COLUMNAS_HISTORIAL.split(","))
+
+
+@medido("supabase.historial_cotizaciones")
+def historial_cotizaciones(
+    supabase, cliente: str = "", desde: Optional[date] = None, hasta: Optional[date] = None
+) -> pd.DataFrame:
+    """
+    Latest stored quotes (newest first), filtered by client substring and
+    quote date range in the query itself; cached per data version.
+    """
+    return _historial(supabase, (cliente or "").strip(), desde, hasta, llave_cache(supabase, TABLA_COTIZACIONES))
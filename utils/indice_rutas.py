@@ -0,0 +1,198 @@
+# utils/indice_rutas.py
+from datetime import date
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from utils.busqueda import IndiceBusqueda
+from utils.medicion import medido
+from utils.traficos import leer_tabla
+from utils.ubicaciones import normalizar_cliente, normalizar_ubicacion
+from utils.versiones import llave_cache
+
+TABLA_RUTAS = "Rutas_Picus"
+COLUMNAS_INDICE = "ID_Ruta,Ruta_Tipo,Tipo,Origen,Destino,Cliente"
+COLUMNAS_BUSQUEDA = "ID_Ruta,Tipo,Cliente,Origen,Destino"
+COLUMNAS_GRILLA = (
+    "ID_Ruta", "Fecha", "Tipo", "Ruta_Tipo", "Cliente", "Origen", "Destino",
+    "KM", "Moneda", "Ingreso_Original", "Costo_Total_Ruta",
+)
+LOTE_IDS = 200  # IDs por consulta in_(): la lista viaja en la URL
+
+
+def construir_indice(filas: list) -> dict:
+    """
+    Nested index Ruta_Tipo -> Tipo -> (Origen, Destino) -> [(ID_Ruta, Cliente)].
+    Keys keep the order in which they first appear in the table.
+    """
+    indice = {}
+    for fila in filas:
+        ruta = (normalizar_ubicacion(fila.get("Origen")), normalizar_ubicacion(fila.get("Destino")))
+        (
+            indice.setdefault(fila.get("Ruta_Tipo"), {})
+            .setdefault(fila.get("Tipo"), {})
+            .setdefault(ruta, [])
+            .append((fila["ID_Ruta"], normalizar_cliente(fila.get("Cliente"))))
+        )
+    return indice
+
+
+@st.cache_data(show_spinner=False)
+def _indice(_supabase, version) -> dict:
+    return construir_indice(leer_tabla(_supabase, TABLA_RUTAS, COLUMNAS_INDICE))
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _busqueda(_supabase, version) -> IndiceBusqueda:
+    # cache_resource: los arreglos del índice se comparten sin copiarse en cada rerun
+    filas = leer_tabla(_supabase, TABLA_RUTAS, COLUMNAS_BUSQUEDA)
+    return IndiceBusqueda(
+        (f["ID_Ruta"] for f in filas),
+        ((f["ID_Ruta"], f.get("Cliente"), f.get("Origen"), f.get("Destino")) for f in filas),
+        (
+            f"{f['ID_Ruta']} | {f.get('Tipo')} | {normalizar_ubicacion(f.get('Origen'))} → "
+            f"{normalizar_ubicacion(f.get('Destino'))} | {normalizar_cliente(f.get('Cliente'))}"
+            for f in filas
+        ),
+    )
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _ruta(_supabase, id_ruta: str, version) -> Optional[dict]:
+    res = _supabase.table(TABLA_RUTAS).select("*").eq("ID_Ruta", id_ruta).limit(1).execute()
+    return res.data[0] if res.data else None
+
+
+@medido("rutas.indice")
+def indice_rutas(supabase) -> dict:
+    """
+    Selector index for Rutas_Picus, built from six columns only and cached
+    per data version (see utils.versiones).
+    """
+    return _indice(supabase, llave_cache(supabase, TABLA_RUTAS))
+
+
+@medido("rutas.indice_busqueda")
+def indice_busqueda(supabase) -> IndiceBusqueda:
+    """
+    Type-ahead search index over ID, client, origin and destination, rebuilt
+    once per data version.
+    """
+    return _busqueda(supabase, llave_cache(supabase, TABLA_RUTAS))
+
+
+@medido("supabase.ruta_por_id")
+def ruta_por_id(supabase, id_ruta: str) -> Optional[dict]:
+    """
+    Full row of a single route, fetched by ID_Ruta and cached per data version.
+    """
+    return _ruta(supabase, id_ruta, llave_cache(supabase, TABLA_RUTAS))
+
+
+def filtros_rutas(
+    cliente: str = "",
+    origen: str = "",
+    destino: str = "",
+    tipo: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+) -> Tuple:
+    """
+    Grid filters as hashable (column, operator, value) triples, applied as
+    PostgREST filters: substrings for client and lane, exact type, and an
+    inclusive date range.
+    """
+    filtros = []
+    for columna, texto in (("Cliente", cliente), ("Origen", origen), ("Destino", destino)):
+        if texto and texto.strip():
+            filtros.append((columna, "ilike", f"%{texto.strip()}%"))
+    if tipo:
+        filtros.append(("Tipo", "eq", tipo))
+    if desde:
+        filtros.append(("Fecha", "gte", desde.isoformat()))
+    if hasta:
+        filtros.append(("Fecha", "lte", hasta.isoformat()))
+    return tuple(filtros)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _pagina(_supabase, filtros: Tuple, orden: str, descendente: bool, desde: int, hasta: int, version) -> Tuple[List[dict], int]:
+    q = _supabase.table(TABLA_RUTAS).select(",".join(COLUMNAS_GRILLA), count="exact")
+    for columna, operador, valor in filtros:
+        q = getattr(q, operador)(columna, valor)
+    # ID_Ruta desempata: sin él las páginas pueden repetir u omitir filas
+    res = q.order(orden, desc=descendente).order("ID_Ruta").range(desde, hasta).execute()
+    return res.data or [], res.count or 0
+
+
+@medido("supabase.pagina_rutas")
+def pagina_rutas(
+    supabase,
+    filtros: Tuple = (),
+    orden: str = "Fecha",
+    descendente: bool = True,
+    pagina: int = 1,
+    tamano: int = 50,
+) -> Tuple[pd.DataFrame, int]:
+    """
+    One page of the route grid (grid columns only) plus the total number of
+    matching routes. Filtering, sorting and paging run in the query; pages
+    are cached per data version.
+    """
+    desde = (max(pagina, 1) - 1) * tamano
+    filas, total = _pagina(
+        supabase, filtros, orden, descendente, desde, desde + tamano - 1, llave_cache(supabase, TABLA_RUTAS)
+    )
+    df = pd.DataFrame(filas, columns=list(COLUMNAS_GRILLA))
+    df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+    return df, total
+
+
+def ids_por_seleccion(indice: dict, clientes=(), carriles=()) -> List[str]:
+    """
+    ID_Ruta of every route whose normalized client and (Origen, Destino)
+    are in the selection; an empty selection does not restrict. Resolving
+    against the index keeps the alias/spelling matching exact while the
+    query itself only filters by ID.
+    """
+    clientes, carriles = set(clientes), set(carriles)
+    return [
+        id_ruta
+        for por_tipo in indice.values()
+        for por_ruta in por_tipo.values()
+        for carril, rutas in por_ruta.items() if not carriles or carril in carriles
+        for id_ruta, cliente in rutas if not clientes or cliente in clientes
+    ]
+
+
+@medido("supabase.rutas_seleccionadas")
+def rutas_seleccionadas(
+    supabase,
+    ids: Optional[List[str]] = None,
+    columnas: str = "*",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+) -> List[dict]:
+    """
+    Routes by ID (None = all) within an optional date range, reading only
+    `columnas`. IDs go to the query in batches of LOTE_IDS to keep each
+    request URL short.
+    """
+    def filtro(ids_lote):
+        def aplicar(q):
+            if ids_lote is not None:
+                q = q.in_("ID_Ruta", ids_lote)
+            if desde:
+                q = q.gte("Fecha", desde.isoformat())
+            if hasta:
+                q = q.lte("Fecha", hasta.isoformat())
+            return q
+        return aplicar
+
+    if ids is None:
+        return leer_tabla(supabase, TABLA_RUTAS, columnas, filtro=filtro(None))
+    filas = []
+    for inicio in range(0, len(ids), LOTE_IDS):
+        filas.extend(leer_tabla(supabase, TABLA_RUTAS, columnas, filtro=filtro(ids[inicio:inicio + LOTE_IDS])))
+    return filas
@@ -0,0 +1,176 @@
+# utils/medicion.py
+#
+# Tiempos por operación (lecturas de Supabase, transformaciones de pandas, PDFs,
+# Excel) con filas y bytes cuando se conocen. Cada rerun guarda su desglose en la
+# sesión y el proceso lleva una ventana por operación para p50/p95. Un panel en la
+# barra lateral, solo para admin, muestra el rerun anterior y los percentiles.
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+VENTANA = 200  # últimas mediciones por (página, operación)
+_EN_CURSO = "_medicion_rerun"
+_ANTERIOR = "_medicion_anterior"
+_nivel = threading.local()
+
+
+class _Historico:
+    """
+    Rolling window of latencies per (page, operation), shared by every
+    session of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ventanas = {}
+
+    def agregar(self, pagina: str, operacion: str, ms: float):
+        with self._lock:
+            self._ventanas.setdefault((pagina, operacion), deque(maxlen=VENTANA)).append(ms)
+
+    def limpiar(self):
+        with self._lock:
+            self._ventanas.clear()
+
+    def percentiles(self, pagina: str = None) -> pd.DataFrame:
+        with self._lock:
+            ventanas = {k: np.fromiter(v, dtype=float) for k, v in self._ventanas.items()}
+        filas = [
+            {
+                "Página": p, "Operación": op, "N": len(ms),
+                "p50 ms": np.percentile(ms, 50), "p95 ms": np.percentile(ms, 95), "Máx ms": ms.max(),
+            }
+            for (p, op), ms in ventanas.items() if pagina is None or p == pagina
+        ]
+        if not filas:
+            return pd.DataFrame()
+        return pd.DataFrame(filas).sort_values("p95 ms", ascending=False).reset_index(drop=True)
+
+
+@st.cache_resource(show_spinner=False)
+def _historico() -> _Historico:
+    return _Historico()
+
+
+def _tamano(valor):
+    # (filas, bytes) de un resultado, si se pueden saber sin recorrerlo
+    if isinstance(valor, tuple) and valor:
+        valor = valor[0]
+    if isinstance(valor, (bytes, bytearray)):
+        return None, len(valor)
+    if isinstance(valor, pd.DataFrame):
+        return len(valor), int(valor.memory_usage(deep=False).sum())
+    if hasattr(valor, "seek") and hasattr(valor, "tell"):
+        # Buffers ya rebobinados (exportaciones): tamaño sin leerlos
+        valor.seek(0, os.SEEK_END)
+        tamano = valor.tell()
+        valor.seek(0)
+        return None, tamano
+    if hasattr(valor, "__len__") and not isinstance(valor, str):
+        return len(valor), None
+    return None, None
+
+
+def _rerun_actual():
+    # Fuera de un rerun (procesos del pool, scripts sueltos) no hay a dónde reportar
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st.session_state.get(_EN_CURSO)
+
+
+@contextmanager
+def medir(operacion: str, filas: int = None, bytes_: int = None):
+    """
+    Times the enclosed block as `operacion`. The yielded dict accepts
+    "filas" and "bytes" once they are known. Nested measurements are kept
+    (in start order) with their depth, so the rerun total only adds
+    top-level ones.
+    """
+    nivel = getattr(_nivel, "valor", 0)
+    registro = {"operacion": operacion, "nivel": nivel, "filas": filas, "bytes": bytes_, "ms": 0.0}
+    rerun = _rerun_actual()
+    if rerun is not None:
+        rerun["registros"].append(registro)
+    _nivel.valor = nivel + 1
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["ms"] = (time.perf_counter() - inicio) * 1000
+        _nivel.valor = nivel
+        if rerun is not None:
+            _historico().agregar(rerun["pagina"], operacion, registro["ms"])
+
+
+def medido(operacion: str):
+    """
+    Decorator form of medir(); rows and bytes are taken from the result.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            with medir(operacion) as registro:
+                resultado = fn(*args, **kwargs)
+                registro["filas"], registro["bytes"] = _tamano(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def _desglose(rerun: dict) -> pd.DataFrame:
+    df = pd.DataFrame([
+        {
+            "Operación": "  " * r["nivel"] + ("↳ " if r["nivel"] else "") + r["operacion"],
+            "ms": round(r["ms"], 1),
+            "Filas": r["filas"],
+            "KB": None if r["bytes"] is None else round(r["bytes"] / 1024, 1),
+        }
+        for r in rerun["registros"]
+    ])
+    df["Filas"] = df["Filas"].astype("Int64")
+    return df
+
+
+def panel_rendimiento():
+    """
+    Call once per page, right after the session checks: starts this
+    rerun's measurements and, for admins, shows in the sidebar the
+    breakdown of the previous rerun plus rolling p50/p95 per operation.
+    """
+    pagina = os.path.splitext(os.path.basename(sys._getframe(1).f_code.co_filename))[0]
+    anterior = st.session_state.get(_EN_CURSO)
+    if anterior and anterior["registros"]:
+        st.session_state[_ANTERIOR] = anterior
+    st.session_state[_EN_CURSO] = {"pagina": pagina, "registros": []}
+
+    if st.session_state.get("usuario", {}).get("Rol", "").lower() != "admin":
+        return
+
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=False):
+        previo = st.session_state.get(_ANTERIOR)
+        if previo:
+            total = sum(r["ms"] for r in previo["registros"] if r["nivel"] == 0)
+            st.caption(f"Rerun anterior · {previo['pagina']} · {total:,.0f} ms medidos")
+            st.dataframe(_desglose(previo), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Aún no hay mediciones en esta sesión.")
+
+        todas = st.toggle("Todas las páginas", value=False, key="rendimiento_todas")
+        percentiles = _historico().percentiles(None if todas else pagina)
+        st.caption(f"p50 / p95 de las últimas {VENTANA} mediciones por operación (este proceso)")
+        if percentiles.empty:
+            st.caption("Sin datos todavía.")
+        else:
+            st.dataframe(percentiles.round(1), use_container_width=True, hide_index=True)
+        if st.button("Reiniciar estadísticas", key="rendimiento_reiniciar"):
+            _historico().limpiar()
+            st.session_state.pop(_ANTERIOR, None)
@@ -0,0 +1,167 @@
+# utils/particiones.py
+#
+# Caché local de tráficos cerrados, una partición Arrow (Feather v2) por mes de cierre.
+# Un mes ya terminado no vuelve a cambiar: se descarga una vez, se escribe a disco
+# y después se lee con memory map. Solo el mes en curso se consulta en Supabase.
+import json
+import os
+import tempfile
+from datetime import date
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils.medicion import medido
+from utils.traficos import TABLA_TRAFICOS, leer_tabla
+
+DIRECTORIO_CACHE = os.environ.get("PICUS_CACHE_DIR", os.path.join(".cache", "traficos_cerrados"))
+MANIFIESTO = "manifiesto.json"
+
+
+def _ruta(nombre: str) -> str:
+    return os.path.join(DIRECTORIO_CACHE, nombre)
+
+
+def _ruta_mes(mes: str) -> str:
+    return _ruta(f"cierre={mes}.arrow")
+
+
+def _leer_manifiesto() -> set:
+    try:
+        with open(_ruta(MANIFIESTO), encoding="utf-8") as f:
+            return set(json.load(f).get("meses", []))
+    except (OSError, ValueError):
+        return set()
+
+
+def _escribir_atomico(ruta: str, escribir):
+    # Escribe en un temporal y lo renombra: otra sesión nunca ve un archivo a medias.
+    # Las sesiones son hilos del mismo proceso: el temporal debe ser único por escritura
+    descriptor, temporal = tempfile.mkstemp(
+        dir=os.path.dirname(ruta) or ".", prefix=os.path.basename(ruta) + ".", suffix=".tmp"
+    )
+    os.close(descriptor)
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _guardar_manifiesto(meses: set):
+    def escribir(ruta):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"meses": sorted(meses)}, f)
+    _escribir_atomico(_ruta(MANIFIESTO), escribir)
+
+
+def _compatible_con_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    # Columnas con tipos mezclados (p. ej. Unidad numérica y texto) se guardan como texto
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty", "boolean"):
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return df.reset_index(drop=True)
+
+
+def _meses(desde: str, hasta: str) -> List[str]:
+    # Meses "AAAA-MM" de desde a hasta, ambos incluidos
+    return [str(p) for p in pd.period_range(desde, hasta, freq="M")]
+
+
+def _rango_mes(mes: str):
+    inicio = pd.Period(mes, freq="M")
+    return inicio.start_time.strftime("%Y-%m-%d"), (inicio + 1).start_time.strftime("%Y-%m-%d")
+
+
+def _descargar(supabase, desde: str, hasta: Optional[str] = None) -> pd.DataFrame:
+    def filtro(q):
+        q = q.gte("Fecha_Cierre", desde)
+        return q.lt("Fecha_Cierre", hasta) if hasta else q
+    return pd.DataFrame(leer_tabla(supabase, TABLA_TRAFICOS, filtro=filtro))
+
+
+def _primer_mes(supabase) -> Optional[str]:
+    res = (
+        supabase.table(TABLA_TRAFICOS).select("Fecha_Cierre")
+        .not_.is_("Fecha_Cierre", "null").order("Fecha_Cierre").limit(1).execute()
+    )
+    if not res.data:
+        return None
+    return pd.Timestamp(res.data[0]["Fecha_Cierre"]).strftime("%Y-%m")
+
+
+def sellar_meses(supabase, hoy: Optional[date] = None) -> List[str]:
+    """
+    Downloads and writes a partition for every finished close month that is
+    not cached yet. Returns the months sealed in this call.
+    """
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    mes_actual = (hoy or date.today()).strftime("%Y-%m")
+    sellados = _leer_manifiesto()
+
+    primero = _primer_mes(supabase) if not sellados else min(sellados)
+    if primero is None or primero >= mes_actual:
+        return []
+
+    nuevos = []
+    for mes in _meses(primero, mes_actual)[:-1]:
+        if mes in sellados:
+            continue
+        df = _descargar(supabase, *_rango_mes(mes))
+        if not df.empty:
+            _escribir_atomico(_ruta_mes(mes), lambda r: feather.write_feather(
+                _compatible_con_arrow(df), r, compression="uncompressed"
+            ))
+        sellados.add(mes)
+        nuevos.append(mes)
+
+    if nuevos:
+        _guardar_manifiesto(sellados)
+    return nuevos
+
+
+@medido("arrow.leer_particiones")
+def leer_particiones(desde: Optional[str] = None, hasta: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads the cached months between desde and hasta ("AAAA-MM", inclusive)
+    with memory-mapped files; no network involved. The months are joined as
+    Arrow tables (no copy) and converted to pandas once.
+    """
+    tablas = []
+    for mes in sorted(_leer_manifiesto()):
+        if (desde and mes < desde) or (hasta and mes > hasta):
+            continue
+        if os.path.exists(_ruta_mes(mes)):
+            tablas.append(feather.read_table(_ruta_mes(mes), memory_map=True))
+    if not tablas:
+        return pd.DataFrame()
+    try:
+        tabla = pa.concat_tables(tablas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Una columna con tipos que Arrow no puede unificar entre meses: se une en pandas
+        return pd.concat([t.to_pandas() for t in tablas], ignore_index=True)
+    return tabla.to_pandas(self_destruct=True)
+
+
+@medido("traficos.cerrados")
+def traficos_cerrados(supabase, hoy: Optional[date] = None) -> pd.DataFrame:
+    """
+    Every closed leg of Traficos_Picus (same columns as a full table read).
+    Past months come from the local partitions; only the current month, where
+    new closes land, is fetched from Supabase.
+    """
+    hoy = hoy or date.today()
+    sellar_meses(supabase, hoy)
+    inicio_mes = hoy.replace(day=1).isoformat()
+    partes = [p for p in (leer_particiones(), _descargar(supabase, inicio_mes)) if not p.empty]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def invalidar_particiones():
+    # Para corregir un tráfico ya cerrado: la próxima lectura vuelve a descargar todo
+    for nombre in os.listdir(DIRECTORIO_CACHE) if os.path.isdir(DIRECTORIO_CACHE) else []:
+        os.remove(_ruta(nombre))
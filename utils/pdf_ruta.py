@@ -0,0 +1,218 @@
+# utils/pdf_ruta.py
+import hashlib
+import io
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from fpdf import FPDF
+
+from utils.medicion import medido
+
+MIN_PARALELO = 100  # debajo de esto el arranque del pool cuesta más que las hojas
+
+# Resultados que se imprimen en la hoja (reales o simulados)
+CAMPOS_RESULTADO = (
+    "ingreso_total", "costo_total", "utilidad_bruta", "costos_indirectos",
+    "utilidad_neta", "porcentaje_bruta", "porcentaje_neta",
+)
+
+# Columnas numéricas que la hoja y Consulta formatean como importe
+CAMPOS_IMPORTE = (
+    "KM", "Ingreso_Original", "Ingreso Flete", "Cruce_Original", "Ingreso Cruce", "Costo Cruce",
+    "Costo Cruce Convertido", "Casetas", "Costo_Diesel_Camion", "Sueldo_Operador", "Bono",
+    "Movimiento_Local", "Puntualidad", "Pension", "Estancia", "Fianza", "Pistas_Extra",
+    "Stop", "Falso", "Gatas", "Accesorios", "Guias", "Costo_Extras", "Ingreso Total", "Costo_Total_Ruta",
+)
+
+# Columnas que la hoja imprime; las que llevan espacios van entre comillas para PostgREST
+COLUMNAS_HOJA = ",".join(
+    f'"{c}"' if " " in c else c
+    for c in (
+        "ID_Ruta", "Fecha", "Tipo", "Modo de Viaje", "Cliente", "Origen", "Destino",
+        "Rendimiento Camion", "Moneda", "Tipo de cambio", "Moneda_Cruce", "Tipo cambio Cruce",
+        "Moneda Costo Cruce", *CAMPOS_IMPORTE,
+    )
+)
+
+
+def safe_text(texto):
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
+
+
+def huella_pdf(ruta: dict, resultados: dict) -> str:
+    """
+    Content hash of a route sheet: the route row plus the printed results
+    (which already reflect the simulation parameters).
+    """
+    contenido = json.dumps({"ruta": ruta, "resultados": resultados}, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _importe(valor):
+    if valor is None or valor != valor:  # None o NaN
+        return 0.0
+    if isinstance(valor, str):
+        try:
+            return float(valor)
+        except ValueError:
+            return 0.0
+    return valor
+
+
+def importes_en_cero(ruta: dict) -> dict:
+    """
+    Copy of a route row with every amount column (CAMPOS_IMPORTE) numeric:
+    nulls, NaN and unreadable text become 0, as the sheet prints them.
+    """
+    return {**ruta, **{campo: _importe(ruta.get(campo)) for campo in CAMPOS_IMPORTE}}
+
+
+def nombre_pdf(ruta: dict) -> str:
+    return f"Consulta_{ruta['Cliente']}_{ruta['Origen']}_{ruta['Destino']}.pdf"
+
+
+@medido("pdf.consulta")
+def generar_pdf_ruta(ruta: dict, resultados: dict) -> bytes:
+    """
+    Renders the Consulta route sheet in memory and returns the PDF bytes.
+    Plain dict arguments keep it usable from a process pool.
+    """
+    ruta = importes_en_cero(ruta)
+    ingreso_total = resultados["ingreso_total"]
+    costo_total = resultados["costo_total"]
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # Encabezado
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Consulta Individual de Ruta", ln=True)
+    pdf.ln(5)
+
+    # Datos principales
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(0, 10, safe_text(f"ID de Ruta: {ruta['ID_Ruta']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Fecha: {ruta['Fecha']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Tipo: {ruta['Tipo']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Modo: {ruta['Modo de Viaje']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Cliente: {ruta['Cliente']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Origen → Destino: {ruta['Origen']} - {ruta['Destino']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"KM: {ruta['KM']:,.2f}"), ln=True)
+    pdf.ln(5)
+
+    # Resultados de utilidad
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "Resultados de Utilidad:", ln=True)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(0, 10, safe_text(f"Ingreso Total: ${ingreso_total:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Costo Total: ${costo_total:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Utilidad Bruta: ${resultados['utilidad_bruta']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"% Utilidad Bruta: {resultados['porcentaje_bruta']:.2f}%"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Costos Indirectos (35%): ${resultados['costos_indirectos']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Utilidad Neta: ${resultados['utilidad_neta']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"% Utilidad Neta: {resultados['porcentaje_neta']:.2f}%"), ln=True)
+    pdf.ln(5)
+
+    # Detalles completos de Costos e Ingresos
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "Detalles de Costos e Ingresos:", ln=True)
+    pdf.set_font("Arial", "", 12)
+
+    pdf.cell(0, 10, safe_text(f"Rendimiento Camión: {ruta['Rendimiento Camion']} km/L"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Moneda Flete: {ruta['Moneda']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Ingreso Flete Original: ${ruta['Ingreso_Original']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Tipo de cambio: {ruta['Tipo de cambio']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Ingreso Flete Convertido: ${ruta['Ingreso Flete']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Moneda Cruce: {ruta['Moneda_Cruce']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Ingreso Cruce Original: ${ruta['Ingreso Cruce']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Tipo cambio Cruce: {ruta['Tipo cambio Cruce']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Ingreso Cruce Convertido: ${ruta['Ingreso Cruce']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Moneda Costo Cruce: {ruta['Moneda Costo Cruce']}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Costo Cruce Original: ${ruta['Costo Cruce']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Costo Cruce Convertido: ${ruta['Costo Cruce Convertido']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Casetas: ${ruta['Casetas']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Diesel Camión: ${ruta['Costo_Diesel_Camion']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Sueldo Operador: ${ruta['Sueldo_Operador']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Bono: ${ruta['Bono']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Ingreso Total: ${ingreso_total:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Costo Total Ruta: ${costo_total:,.2f}"), ln=True)
+
+    pdf.ln(5)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "Extras:", ln=True)
+    pdf.set_font("Arial", "", 12)
+
+    pdf.cell(0, 10, safe_text(f"Movimiento Local: ${ruta['Movimiento_Local']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Puntualidad: ${ruta['Puntualidad']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Pensión: ${ruta['Pension']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Estancia: ${ruta['Estancia']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Fianza: ${ruta['Fianza']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Pistas Extra: ${ruta['Pistas_Extra']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Stop: ${ruta['Stop']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Falso: ${ruta['Falso']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Gatas: ${ruta['Gatas']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Accesorios: ${ruta['Accesorios']:,.2f}"), ln=True)
+    pdf.cell(0, 10, safe_text(f"Guías: ${ruta['Guias']:,.2f}"), ln=True)
+
+    # fpdf 1.7: dest="S" regresa el documento como str latin-1
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def resultados_reales(ruta: dict) -> dict:
+    # Mismos cálculos que Consulta muestra sin simulación
+    def num(x):
+        return 0 if x is None or x != x else x
+    ingreso_total = num(ruta.get("Ingreso Total"))
+    costo_total = num(ruta.get("Costo_Total_Ruta"))
+    utilidad_bruta = ingreso_total - costo_total
+    costos_indirectos = ingreso_total * 0.35
+    utilidad_neta = utilidad_bruta - costos_indirectos
+    return dict(zip(CAMPOS_RESULTADO, (
+        ingreso_total, costo_total, utilidad_bruta, costos_indirectos, utilidad_neta,
+        (utilidad_bruta / ingreso_total * 100) if ingreso_total > 0 else 0,
+        (utilidad_neta / ingreso_total * 100) if ingreso_total > 0 else 0,
+    )))
+
+
+def _hoja(ruta: dict) -> Tuple[str, bytes]:
+    # Trabajo de cada proceso: nombre único dentro del ZIP + bytes del PDF.
+    # Un importe nulo no debe tumbar todo el lote: se imprime como 0
+    ruta = importes_en_cero(ruta)
+    return f"{ruta['ID_Ruta']}_{nombre_pdf(ruta)}", generar_pdf_ruta(ruta, resultados_reales(ruta))
+
+
+@medido("pdf.zip_rutas")
+def exportar_zip(
+    rutas: List[dict],
+    progreso: Optional[Callable[[int, int], None]] = None,
+    procesos: Optional[int] = None,
+) -> bytes:
+    """
+    Renders a route sheet per row in a process pool, writes each PDF into a
+    ZIP as it arrives and returns the ZIP bytes. Small batches are rendered
+    in-process, where pool start-up would cost more than the PDFs themselves.
+    `progreso(hechos, total)` is called after every sheet.
+    """
+    buffer = io.BytesIO()
+    total = len(rutas)
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if total < MIN_PARALELO:
+            hojas = map(_hoja, rutas)
+            for hechos, (nombre, contenido) in enumerate(hojas, start=1):
+                zf.writestr(nombre, contenido)
+                if progreso:
+                    progreso(hechos, total)
+        else:
+            procesos = procesos or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                # Bloques por tarea: menos ida y vuelta entre procesos
+                hojas = pool.map(_hoja, rutas, chunksize=max(1, total // (procesos * 8)))
+                for hechos, (nombre, contenido) in enumerate(hojas, start=1):
+                    zf.writestr(nombre, contenido)
+                    if progreso:
+                        progreso(hechos, total)
+    return buffer.getvalue()
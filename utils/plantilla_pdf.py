@@ -0,0 +1,129 @@
+# utils/plantilla_pdf.py
+#
+# Activos de la cotización: la plantilla de fondo se prepara una sola vez por proceso
+# y se comparte entre PDFs. La llave de caché lleva el mtime del archivo: si alguien
+# reemplaza la plantilla, se vuelve a procesar. Las fuentes Montserrat se registran
+# con add_font en cada documento, solo si están los tres estilos.
+import os
+from pathlib import Path
+from typing import Optional
+
+import streamlit as st
+from fpdf import FPDF
+
+# --------- Opcional: optimización de plantilla con Pillow ---------
+try:
+    from PIL import Image
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
+
+PLANTILLA_CANDIDATAS = [
+    "ADT PGL GRAL NO TXT.png", "Cotización Picus.jpg", "Cotización Picus.png",
+    "/mnt/data/PICUS W.png", "/mnt/data/Picus BG.png",
+]
+
+# Estilo -> archivo; la familia solo se usa si están los tres
+FUENTES_MONTSERRAT = {
+    "": "Montserrat-Regular.ttf",
+    "B": "Montserrat-Bold.ttf",
+    "I": "Montserrat-Italic.ttf",
+}
+
+
+def _mtime(ruta: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(ruta)
+    except OSError:
+        return None
+
+
+def buscar_plantilla() -> Optional[str]:
+    for p in PLANTILLA_CANDIDATAS:
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def _optimize_to_jpg(path_png, max_kb=750, target_w=1275, target_h=1650, quality=85):
+    """Convierte PNG pesado a JPG optimizado (150–200 DPI aprox). Devuelve ruta final."""
+    if not HAS_PIL:
+        return path_png
+    out = f"{Path(path_png).with_suffix('')}-opt.jpg"
+    # El JPG de una corrida anterior sirve mientras sea más nuevo que el PNG
+    if (_mtime(out) or 0) >= (_mtime(path_png) or 0):
+        return out
+    try:
+        img = Image.open(path_png).convert("RGB")
+        img.thumbnail((target_w, target_h), Image.LANCZOS)
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        if os.path.getsize(out) > max_kb * 1024:
+            img.save(out, "JPEG", quality=75, optimize=True, progressive=True)
+        return out
+    except Exception:
+        return path_png
+
+
+@st.cache_resource(show_spinner=False)
+def _plantilla(ruta: str, mtime: float) -> str:
+    # Ruta final: JPG optimizado si se pudo convertir el PNG
+    if ruta.lower().endswith(".png"):
+        return _optimize_to_jpg(ruta)
+    return ruta
+
+
+def plantilla_cotizacion() -> Optional[str]:
+    """
+    Background template for quotes, or None. A PNG template is converted
+    once to an optimized JPG, which also keeps the embedded image (and the
+    PDF) small.
+    """
+    ruta = buscar_plantilla()
+    mtime = _mtime(ruta) if ruta else None
+    if mtime is None:
+        return None
+    return _plantilla(ruta, mtime)
+
+
+def fuentes_montserrat() -> Optional[dict]:
+    """
+    Style -> file of the Montserrat family, or None when any of its files
+    is missing (the quote then falls back to Helvetica).
+    """
+    if not all(os.path.exists(archivo) for archivo in FUENTES_MONTSERRAT.values()):
+        return None
+    return dict(FUENTES_MONTSERRAT)
+
+
+class PDFCotizacion(FPDF):
+    """
+    Letter-size quote on top of the template image. The template path comes
+    from the process-level cache; fonts go through fpdf's own add_font.
+    """
+
+    def __init__(self, orientation="P", unit="in", format="Letter"):
+        super().__init__(orientation=orientation, unit=unit, format=format)
+        self.set_compression(True)
+        self.plantilla = plantilla_cotizacion()
+
+        # Fuentes Montserrat con fallback a Helvetica
+        fuentes = fuentes_montserrat()
+        self.has_montserrat = False
+        if fuentes is not None:
+            try:
+                for estilo, archivo in fuentes.items():
+                    self.add_font("Montserrat", estilo, archivo, uni=True)
+                self.has_montserrat = True
+            except Exception:
+                self.has_montserrat = False
+
+    def header(self):
+        if self.plantilla:
+            self.image(self.plantilla, x=0, y=0, w=8.5, h=11)
+        else:
+            self.set_fill_color(245, 245, 245)
+            self.rect(0, 0, 8.5, 0.8, 'F')
+
+    def set_body_font(self, bold=False, italic=False, size=7):
+        style = ("B" if bold else "") + ("I" if italic else "")
+        self.set_font("Montserrat" if self.has_montserrat else "Helvetica", style, size)
@@ -5,7 +5,7 @@ from typing import Callable, TypeVar, Optional
 
 T = TypeVar("T")
 
-RETRIABLE_HTTP_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+RETRIABLE_HTTP_CODES = {408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
 
 def _get_status_code(exc: Exception) -> Optional[int]:
     # requests.HTTPError has response; some libs wrap it differently
@@ -14,6 +14,12 @@ def _get_status_code(exc: Exception) -> Optional[int]:
         return getattr(resp, "status_code", None)
     return getattr(exc, "status_code", None)
 
+def _is_integrity_error(exc: Exception) -> bool:
+    # postgrest APIError trae el SQLSTATE en `code`; la clase 23 (llave duplicada,
+    # llave foránea, not null...) no se arregla reintentando
+    code = getattr(exc, "code", None)
+    return isinstance(code, str) and code.startswith("23")
+
 def retry_with_backoff(
     fn: Callable[[], T],
     *,
@@ -38,6 +44,8 @@ def retry_with_backoff(
             # Si podemos inferir status y NO es transitorio, no reintentes
             if status is not None and status not in RETRIABLE_HTTP_CODES:
                 raise
+            if _is_integrity_error(exc):
+                raise
 
             if attempt == tries:
                 break
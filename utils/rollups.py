@@ -0,0 +1,191 @@
+# utils/rollups.py
+#
+# Acumulados de rentabilidad de tráficos cerrados, por día de cierre y dimensión.
+# Se actualizan al cerrar tráficos en Programación; `python -m utils.rollups`
+# (o el botón de admin en Viajes Concluidos) los reconstruye desde Traficos_Picus.
+#
+# Tabla requerida en Supabase:
+#   create table "Rollups_Traficos" (
+#       "Dimension" text not null,
+#       "Dia" date not null,
+#       "Clave" text not null,
+#       "Traficos" integer not null default 0,
+#       "Tramos" integer not null default 0,
+#       "Ingreso" double precision not null default 0,
+#       "Costo" double precision not null default 0,
+#       primary key ("Dimension", "Dia", "Clave")
+#   );
+from datetime import date
+from typing import Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from utils.medicion import medido
+from utils.retry import retry_with_backoff
+from utils.traficos import TABLA_TRAFICOS, TAMANO_LOTE, cerrados, filas_vuelta, leer_tabla
+
+TABLA_ROLLUPS = "Rollups_Traficos"
+INDIRECTOS = 0.35
+LLAVE = ["Dimension", "Dia", "Clave"]
+
+# Dimensión -> columna del tramo que da la clave ("Dia" usa el propio día)
+DIMENSIONES = {
+    "Dia": "Dia",
+    "Cliente": "Cliente",
+    "Ruta": "Ruta",
+    "Unidad": "Unidad",
+    "Operador": "Operador",
+}
+
+
+def agregar_tramos(tramos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates closed legs into rollup rows (Dimension, Dia, Clave) with
+    Traficos, Tramos, Ingreso and Costo. `tramos` needs a Dia column
+    (close date as YYYY-MM-DD) besides the Traficos_Picus columns.
+    """
+    columnas = LLAVE + ["Traficos", "Tramos", "Ingreso", "Costo"]
+    if tramos.empty:
+        return pd.DataFrame(columns=columnas)
+
+    df = pd.DataFrame({
+        "ID_Programacion": tramos["ID_Programacion"].astype(str),
+        "Dia": tramos["Dia"].astype(str),
+        "Cliente": tramos["Cliente"],
+        "Ruta": tramos["Origen"].astype(str) + " → " + tramos["Destino"].astype(str),
+        "Unidad": tramos["Unidad"],
+        "Operador": tramos["Operador"],
+        "Ingreso": pd.to_numeric(tramos["Ingreso Total"], errors="coerce").fillna(0.0),
+        "Costo": pd.to_numeric(tramos["Costo_Total_Ruta"], errors="coerce").fillna(0.0),
+    })
+
+    partes = []
+    for dimension, columna in DIMENSIONES.items():
+        clave = df[columna].where(df[columna].notna(), "SIN DATO").astype(str)
+        parte = df.assign(Clave=clave).groupby(["Dia", "Clave"]).agg(
+            Traficos=("ID_Programacion", "nunique"),
+            Tramos=("ID_Programacion", "size"),
+            Ingreso=("Ingreso", "sum"),
+            Costo=("Costo", "sum"),
+        ).reset_index()
+        parte.insert(0, "Dimension", dimension)
+        partes.append(parte)
+    return pd.concat(partes, ignore_index=True)[columnas]
+
+
+def tramos_cerrados(
+    cierres: Sequence[Tuple[pd.Series, Sequence[pd.Series]]],
+    resultado: Dict[str, Optional[str]],
+    fecha_cierre: date,
+) -> pd.DataFrame:
+    # IDA + VUELTA de cada tráfico cerrado con éxito en cerrar_en_lote
+    fecha = fecha_cierre.isoformat()
+    filas = []
+    for ida, tramos in cierres:
+        if resultado.get(str(ida["ID_Programacion"]), "") is not None:
+            continue
+        filas.append(ida.to_dict())
+        filas.extend(filas_vuelta(ida, tramos, fecha))
+    return pd.DataFrame(filas).assign(Dia=fecha) if filas else pd.DataFrame()
+
+
+def _upsert(supabase, df: pd.DataFrame, tamano: int = TAMANO_LOTE):
+    registros = df.astype(object).to_dict(orient="records")
+    for inicio in range(0, len(registros), tamano):
+        lote = registros[inicio:inicio + tamano]
+        retry_with_backoff(
+            lambda: supabase.table(TABLA_ROLLUPS).upsert(lote, on_conflict=",".join(LLAVE)).execute()
+        )
+
+
+@medido("supabase.acumular_rollups")
+def acumular_rollups(supabase, tramos: pd.DataFrame) -> int:
+    """
+    Adds the legs of newly closed tráficos to the rollups: one read of the
+    affected days plus batched upserts. Read-modify-write is not atomic across
+    sessions; `reconstruir_rollups` repairs any drift.
+    Returns the number of rollup rows written.
+    """
+    delta = agregar_tramos(tramos)
+    if delta.empty:
+        return 0
+
+    dias = sorted(delta["Dia"].unique())
+    actuales = pd.DataFrame(leer_tabla(supabase, TABLA_ROLLUPS, filtro=lambda q: q.in_("Dia", dias)))
+    if not actuales.empty:
+        actuales["Dia"] = actuales["Dia"].astype(str)
+        delta = (
+            pd.concat([actuales[delta.columns], delta], ignore_index=True)
+            .groupby(LLAVE, as_index=False)
+            .sum()
+        )
+    _upsert(supabase, delta)
+    return len(delta)
+
+
+def _con_fechas(df: pd.DataFrame) -> pd.DataFrame:
+    if not df.empty:
+        df["Fecha_Cierre"] = pd.to_datetime(df["Fecha_Cierre"], errors="coerce")
+    return df
+
+
+def reconstruir_rollups(supabase) -> int:
+    """
+    Full rebuild (backfill) from every closed leg in Traficos_Picus.
+    Returns the number of rollup rows written.
+    """
+    df = cerrados(pd.DataFrame(leer_tabla(supabase, TABLA_TRAFICOS)).pipe(_con_fechas))
+    if not df.empty:
+        # El día del tráfico es su último cierre (el de la VUELTA)
+        df["Dia"] = df.groupby("ID_Programacion")["Fecha_Cierre"].transform("max").dt.strftime("%Y-%m-%d")
+    rollups = agregar_tramos(df)
+
+    retry_with_backoff(lambda: supabase.table(TABLA_ROLLUPS).delete().neq("Dimension", "").execute())
+    _upsert(supabase, rollups)
+    return len(rollups)
+
+
+@medido("supabase.leer_rollups")
+def leer_rollups(supabase, dimension: str, desde: date, hasta: date) -> pd.DataFrame:
+    """
+    Rollup rows of one dimension between two close dates (inclusive).
+    """
+    df = pd.DataFrame(leer_tabla(
+        supabase, TABLA_ROLLUPS,
+        filtro=lambda q: q.eq("Dimension", dimension).gte("Dia", desde.isoformat()).lte("Dia", hasta.isoformat()),
+    ))
+    if df.empty:
+        return df
+    df["Dia"] = pd.to_datetime(df["Dia"])
+    return df
+
+
+def resumen_rollups(df: pd.DataFrame, periodo: str = "M") -> pd.DataFrame:
+    """
+    Groups rollup rows by period ("D", "M" or "Y") and Clave and derives the
+    profitability columns shown in the reports.
+    """
+    resumen = (
+        df.assign(Periodo=df["Dia"].dt.to_period(periodo).astype(str))
+        .groupby(["Periodo", "Clave"], as_index=False)[["Traficos", "Tramos", "Ingreso", "Costo"]]
+        .sum()
+    )
+    resumen["Utilidad Bruta"] = resumen["Ingreso"] - resumen["Costo"]
+    resumen["Costos Indirectos (35%)"] = (resumen["Ingreso"] * INDIRECTOS).round(2)
+    resumen["Utilidad Neta"] = resumen["Utilidad Bruta"] - resumen["Costos Indirectos (35%)"]
+    ingreso = resumen["Ingreso"].where(resumen["Ingreso"] != 0)
+    resumen["% Utilidad Bruta"] = (resumen["Utilidad Bruta"] / ingreso * 100).round(2).fillna(0)
+    resumen["% Utilidad Neta"] = (resumen["Utilidad Neta"] / ingreso * 100).round(2).fillna(0)
+    return resumen
+
+
+if __name__ == "__main__":
+    # Reconstrucción completa desde consola: SUPABASE_URL / SUPABASE_KEY en el entorno o en .env
+    import os
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    cliente = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    print(f"{reconstruir_rollups(cliente)} filas de rollup escritas en {TABLA_ROLLUPS}.")
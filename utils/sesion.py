@@ -0,0 +1,173 @@
+# utils/sesion.py
+#
+# Sesión firmada que sobrevive a un refresh del navegador o a un cambio de réplica.
+# Al iniciar sesión se emite un token HMAC con expiración (usuario, nombre y rol);
+# cada página lo valida localmente con restaurar_sesion(), sin consultar Supabase.
+# El token viaja en una cookie escrita desde el navegador; si el navegador no manda
+# cookies (p. ej. la app embebida en un iframe), se usa el parámetro ?sesion= de la URL.
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from utils.medicion import medido
+from utils.retry import retry_with_backoff
+
+NOMBRE_COOKIE = "picus_sesion"
+PARAMETRO_URL = "sesion"
+HORAS_SESION = 12
+SEGUNDOS_CACHE_USUARIO = 60
+CAMPOS_SESION = ("ID_Usuario", "Nombre", "Rol")
+
+
+def _secreto() -> bytes:
+    # Sin SESSION_SECRET propio se deriva uno de la llave de Supabase (nunca viaja al navegador)
+    secreto = st.secrets.get("SESSION_SECRET") or "picus-sesion:" + st.secrets["SUPABASE_KEY"]
+    return hashlib.sha256(secreto.encode("utf-8")).digest()
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _firma(contenido: str) -> str:
+    return _b64(hmac.new(_secreto(), contenido.encode("ascii"), hashlib.sha256).digest())
+
+
+def emitir_token(usuario: dict, horas: float = HORAS_SESION) -> str:
+    """
+    Signed, expiring token carrying the session fields of `usuario`.
+    """
+    datos = {c: usuario.get(c) for c in CAMPOS_SESION}
+    datos["exp"] = int(time.time() + horas * 3600)
+    contenido = _b64(json.dumps(datos, separators=(",", ":")).encode("utf-8"))
+    return f"{contenido}.{_firma(contenido)}"
+
+
+def validar_token(token: Optional[str]) -> Optional[dict]:
+    """
+    Session fields of a token with a valid signature that has not expired,
+    else None. Runs locally (no database call).
+    """
+    if not token or token.count(".") != 1:
+        return None
+    contenido, firma = token.split(".")
+    try:
+        if not hmac.compare_digest(firma.encode("ascii"), _firma(contenido).encode("ascii")):
+            return None
+        datos = json.loads(_de_b64(contenido))
+    except ValueError:  # incluye UnicodeError y base64 inválido
+        return None
+    if datos.get("exp", 0) < time.time():
+        return None
+    return {c: datos.get(c) for c in CAMPOS_SESION}
+
+
+def _escribir_cookie(valor: str, segundos: int):
+    # La cookie se escribe en el documento de la app (el componente vive en un iframe)
+    components.html(
+        "<script>"
+        f"window.parent.document.cookie = '{NOMBRE_COOKIE}={valor}; Max-Age={segundos}; Path=/; SameSite=Strict'"
+        " + (window.parent.location.protocol === 'https:' ? '; Secure' : '');"
+        "</script>",
+        height=0,
+    )
+
+
+def _token_recibido() -> Optional[str]:
+    try:
+        token = st.context.cookies.get(NOMBRE_COOKIE)
+    except Exception:
+        token = None
+    return token or st.query_params.get(PARAMETRO_URL)
+
+
+def _cookies_disponibles() -> bool:
+    try:
+        return len(st.context.cookies) > 0
+    except Exception:
+        return False
+
+
+def iniciar_sesion(usuario: dict):
+    """
+    Stores the user in the session and schedules the signed token to be
+    written on the next run (a st.rerun() right after would drop the script).
+    """
+    st.session_state.usuario = {c: usuario.get(c) for c in CAMPOS_SESION}
+    st.session_state.pop("_sesion_cerrada", None)
+    token = emitir_token(usuario)
+    st.session_state["_cookie_pendiente"] = (token, int(HORAS_SESION * 3600))
+    if not _cookies_disponibles():
+        st.query_params[PARAMETRO_URL] = token
+
+
+def restaurar_sesion():
+    """
+    Call at the top of every page: rebuilds st.session_state.usuario from a
+    valid token after a browser refresh, and writes a pending cookie.
+    """
+    pendiente = st.session_state.pop("_cookie_pendiente", None)
+    if pendiente:
+        _escribir_cookie(*pendiente)
+    # st.context.cookies es la foto de la carga de la página: tras cerrar sesión
+    # todavía trae el token viejo hasta el siguiente refresh
+    if "usuario" in st.session_state or st.session_state.get("_sesion_cerrada"):
+        return
+    usuario = validar_token(_token_recibido())
+    if usuario:
+        st.session_state.usuario = usuario
+
+
+def cerrar_sesion():
+    st.session_state.pop("usuario", None)
+    st.session_state["_sesion_cerrada"] = True
+    st.session_state["_cookie_pendiente"] = ("", 0)
+    if PARAMETRO_URL in st.query_params:
+        del st.query_params[PARAMETRO_URL]
+
+
+@st.cache_data(ttl=SEGUNDOS_CACHE_USUARIO, show_spinner=False)
+def _usuario(_supabase, id_usuario: str) -> Optional[dict]:
+    def _call():
+        res = _supabase.table("Usuarios_Pic").select("ID_Usuario,Nombre,Rol,Password_Hash").eq("ID_Usuario", id_usuario).execute()
+        # supabase-py a veces regresa error en res.error o en res.data vacío
+        if getattr(res, "error", None):
+            raise RuntimeError(res.error)
+        return res
+
+    # Reintenta si hay 52x/5xx/timeouts intermitentes; los errores no quedan en caché
+    res = retry_with_backoff(_call, tries=5, base_delay=0.6, max_delay=10.0)
+    if not res.data:
+        # Un ID desconocido tampoco se guarda: puede registrarse en cualquier momento
+        raise LookupError(id_usuario)
+    return res.data[0]
+
+
+def olvidar_usuario(supabase, id_usuario: str):
+    # Para quien escribe en Usuarios_Pic (alta, cambio de contraseña o de rol)
+    _usuario.clear(supabase, id_usuario)
+
+
+@medido("supabase.usuario_por_id")
+def usuario_por_id(supabase, id_usuario: str, fresco: bool = False) -> Optional[dict]:
+    """
+    User row (ID, name, role, password hash) cached for a short TTL, so
+    repeated logins do not query Usuarios_Pic each time. Unknown IDs are
+    not cached; `fresco=True` drops the cached row and reads it again.
+    """
+    if fresco:
+        olvidar_usuario(supabase, id_usuario)
+    try:
+        return _usuario(supabase, id_usuario)
+    except LookupError:
+        return None
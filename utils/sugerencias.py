@@ -0,0 +1,152 @@
+# utils/sugerencias.py
+import heapq
+import itertools
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.medicion import medido
+
+TOP_N = 300
+
+
+def _numerico(serie: pd.Series) -> np.ndarray:
+    return pd.to_numeric(serie, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _escalar(x) -> float:
+    return 0.0 if (x is None or (isinstance(x, float) and pd.isna(x))) else float(x)
+
+
+class _TopN:
+    # Min-heap acotado: la raíz es la peor sugerencia retenida
+    def __init__(self, limite: int):
+        self.limite = limite
+        self.heap = []
+        self.contador = itertools.count()
+
+    def agregar(self, porcentajes: np.ndarray, utilidades: np.ndarray, indices: List[tuple]):
+        for pct, util, idx in zip(porcentajes, utilidades, indices):
+            # -contador: en empate gana la primera en aparecer (igual que sorted estable)
+            item = (pct, -next(self.contador), util, idx)
+            if len(self.heap) < self.limite:
+                heapq.heappush(self.heap, item)
+            elif item > self.heap[0]:
+                heapq.heapreplace(self.heap, item)
+
+    def ordenados(self):
+        return sorted(self.heap, reverse=True)
+
+
+def _porcentaje(ingreso: np.ndarray, utilidad: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ingreso != 0, utilidad / ingreso * 100, 0.0)
+
+
+def _finales(ruta_1: pd.Series, df: pd.DataFrame) -> np.ndarray:
+    # Posiciones que pueden cerrar una vuelta (directas, tras un VACÍO o, si la
+    # principal es VACÍO, cualquier carga desde su destino)
+    tipo_principal = ruta_1["Tipo"]
+    tipo_regreso = "EXPORTACION" if tipo_principal == "IMPORTACION" else "IMPORTACION"
+    desde_destino = (df["Origen"] == ruta_1["Destino"]).to_numpy()
+    es_regreso = (df["Tipo"] == tipo_regreso).to_numpy()
+    destinos_vacio = df.loc[(df["Tipo"] == "VACIO").to_numpy() & desde_destino, "Destino"].dropna().unique()
+    finales = es_regreso & (desde_destino | df["Origen"].isin(destinos_vacio).to_numpy())
+    if tipo_principal == "VACIO":
+        finales |= df["Tipo"].isin(["IMPORTACION", "EXPORTACION"]).to_numpy() & desde_destino
+    return finales
+
+
+def clientes_regreso(ruta_1: pd.Series, df: pd.DataFrame) -> List[str]:
+    """
+    Clients that appear in at least one return suggestion for ruta_1, for
+    the client filter (computed without building the combinations).
+    """
+    clientes = df.loc[_finales(ruta_1, df), "Cliente"].dropna()
+    return sorted({str(c) for c in clientes})
+
+
+@medido("pandas.sugerencias_regreso")
+def sugerencias_regreso(
+    ruta_1: pd.Series,
+    df: pd.DataFrame,
+    limite: int = TOP_N,
+    clientes: Optional[Sequence[str]] = None,
+    margen_minimo: Optional[float] = None,
+) -> list:
+    """
+    Return-trip suggestions for ruta_1, best % utilidad first, at most `limite`.
+
+    Margins are computed once per combination with array math; the client
+    filter (client of the last leg) and the minimum % utilidad are applied to
+    every combination before only the top-N are kept in a bounded heap. Row
+    objects and descriptions are built for the retained suggestions only.
+    """
+    ingreso_1 = _escalar(ruta_1["Ingreso Total"])
+    costo_1 = _escalar(ruta_1["Costo_Total_Ruta"])
+    tipo_principal = ruta_1["Tipo"]
+    tipo_regreso = "EXPORTACION" if tipo_principal == "IMPORTACION" else "IMPORTACION"
+    destino = ruta_1["Destino"]
+
+    ingreso = _numerico(df["Ingreso Total"])
+    costo = _numerico(df["Costo_Total_Ruta"])
+    es_regreso = (df["Tipo"] == tipo_regreso).to_numpy()
+    desde_destino = (df["Origen"] == destino).to_numpy()
+    cliente_valido = (
+        df["Cliente"].astype(str).isin([str(c) for c in clientes]).to_numpy() & df["Cliente"].notna().to_numpy()
+        if clientes else None
+    )
+    top = _TopN(limite)
+
+    def agregar(ingreso_total, utilidad, finales, posiciones):
+        # Filtros antes del recorte: una opción fuera del top global sigue disponible
+        porcentaje = _porcentaje(ingreso_total, utilidad)
+        validas = np.ones(len(finales), dtype=bool)
+        if margen_minimo is not None:
+            validas &= porcentaje >= margen_minimo
+        if cliente_valido is not None:
+            validas &= cliente_valido[finales]
+        columnas = [p[validas] for p in posiciones]
+        top.agregar(porcentaje[validas], utilidad[validas], list(zip(*columnas)))
+
+    # ➤ Rutas directas desde el destino actual
+    pos = np.flatnonzero(es_regreso & desde_destino)
+    ingreso_total = ingreso_1 + ingreso[pos]
+    agregar(ingreso_total, ingreso_total - (costo_1 + costo[pos]), pos, [pos])
+
+    # ➤ Rutas con VACÍO + cliente (join por posición: destino del vacío = origen del regreso)
+    pos_vacio = np.flatnonzero((df["Tipo"] == "VACIO").to_numpy() & desde_destino)
+    pos_final = np.flatnonzero(es_regreso)
+    if len(pos_vacio) and len(pos_final):
+        vacios = pd.DataFrame({"v": pos_vacio, "llave": df["Destino"].to_numpy()[pos_vacio]})
+        finales = pd.DataFrame({"f": pos_final, "llave": df["Origen"].to_numpy()[pos_final]})
+        pares = vacios.dropna(subset=["llave"]).merge(finales, on="llave")
+        v = pares["v"].to_numpy()
+        f = pares["f"].to_numpy()
+        ingreso_total = ingreso_1 + ingreso[f]
+        agregar(ingreso_total, ingreso_total - (costo_1 + costo[v] + costo[f]), f, [v, f])
+
+    # Si la ruta principal es VACÍO, solo buscar desde su destino
+    if tipo_principal == "VACIO":
+        pos = np.flatnonzero(df["Tipo"].isin(["IMPORTACION", "EXPORTACION"]).to_numpy() & desde_destino)
+        ingreso_total = ingreso_1 + ingreso[pos]
+        agregar(ingreso_total, ingreso_total - (costo_1 + costo[pos]), pos, [pos])
+
+    sugerencias = []
+    for porcentaje, _, utilidad, posiciones in top.ordenados():
+        tramos = [df.iloc[p] for p in posiciones]
+        final = tramos[-1]
+        if len(tramos) == 2:
+            vacio = tramos[0]
+            descripcion = f"{final['Fecha']} — {final['Cliente']} (Vacío → {vacio['Origen']} → {vacio['Destino']}) → {final['Destino']} ({porcentaje:.2f}%)"
+        else:
+            descripcion = f"{final['Fecha']} — {final['Cliente']} → {final['Origen']} → {final['Destino']} ({porcentaje:.2f}%)"
+        sugerencias.append({
+            "descripcion": descripcion,
+            "tramos": tramos,
+            "utilidad": utilidad,
+            "porcentaje": porcentaje,
+            "cliente": final["Cliente"],
+        })
+    return sugerencias
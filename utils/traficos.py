@@ -0,0 +1,245 @@
+# utils/traficos.py
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.medicion import medido, medir
+from utils.retry import retry_with_backoff
+
+TABLA_TRAFICOS = "Traficos_Picus"
+# Llave natural de cada tramo, para que los upserts en lote sean idempotentes.
+# Columna requerida en Supabase:
+#   alter table "Traficos_Picus" add column "ID_Tramo" text unique;
+LLAVE_TRAMO = "ID_Tramo"
+TAMANO_LOTE = 500
+TAMANO_PAGINA = 1000  # límite de filas por respuesta de PostgREST en Supabase
+
+_MEMO_RERUN = "_traficos_rerun"
+
+
+def leer_tabla(supabase, tabla: str, columnas: str = "*", filtro=None) -> List[dict]:
+    """
+    Reads a whole table paging with range(), since PostgREST caps each response.
+    `filtro` optionally receives the select query and returns it filtered.
+    """
+    filas = []
+    inicio = 0
+    with medir(f"supabase.leer.{tabla}") as registro:
+        while True:
+            consulta = supabase.table(tabla).select(columnas)
+            if filtro is not None:
+                consulta = filtro(consulta)
+            pagina = consulta.range(inicio, inicio + TAMANO_PAGINA - 1).execute().data
+            filas.extend(pagina)
+            if len(pagina) < TAMANO_PAGINA:
+                break
+            inicio += TAMANO_PAGINA
+        registro["filas"] = len(filas)
+    return filas
+
+
+def invalidar_traficos():
+    # Al inicio de cada rerun y después de escribir en Traficos_Picus
+    st.session_state.pop(_MEMO_RERUN, None)
+
+
+@medido("pandas.traficos_del_rerun")
+def traficos_del_rerun(supabase) -> pd.DataFrame:
+    """
+    Fetches Traficos_Picus once per rerun; every section derives its own view
+    (open, pending, closed) from a copy of this frame.
+    """
+    if _MEMO_RERUN not in st.session_state:
+        df = pd.DataFrame(leer_tabla(supabase, TABLA_TRAFICOS))
+        if not df.empty:
+            df["Fecha"] = pd.to_datetime(df.get("Fecha"), errors="coerce")
+            df["Fecha_Cierre"] = pd.to_datetime(df.get("Fecha_Cierre"), errors="coerce")
+        st.session_state[_MEMO_RERUN] = df
+    return st.session_state[_MEMO_RERUN].copy()
+
+
+def abiertos(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    return df[df["Fecha_Cierre"].isna()].reset_index(drop=True)
+
+
+def cerrados(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    return df[df["Fecha_Cierre"].notna()].reset_index(drop=True)
+
+
+def a_registros(df: pd.DataFrame) -> List[dict]:
+    # NaN/NaT no son JSON válido para PostgREST: se envían como null
+    df = df.copy()
+    for col in df.columns[df.dtypes.map(pd.api.types.is_datetime64_any_dtype)]:
+        df[col] = df[col].dt.strftime("%Y-%m-%d")
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def id_tramo(id_programacion, tramo: str, orden: int = 0) -> str:
+    # IDA -> "<ID_Programacion>_IDA_0"; tramos de regreso -> "..._VUELTA_0", "..._VUELTA_1"
+    return f"{id_programacion}_{tramo}_{orden}"
+
+
+def upsert_en_lotes(
+    supabase,
+    registros: List[dict],
+    tabla: str = TABLA_TRAFICOS,
+    tamano: int = TAMANO_LOTE,
+    llave: str = LLAVE_TRAMO,
+) -> int:
+    """
+    Upserts rows on `llave` in batches of `tamano` (one request per batch,
+    with retries). A retried batch that the server already committed
+    overwrites the same rows instead of duplicating them.
+    Returns the number of rows written.
+    """
+    escritos = 0
+    with medir(f"supabase.upsert.{tabla}", filas=len(registros)):
+        for inicio in range(0, len(registros), tamano):
+            lote = registros[inicio:inicio + tamano]
+            retry_with_backoff(lambda: supabase.table(tabla).upsert(lote, on_conflict=llave).execute())
+            escritos += len(lote)
+    return escritos
+
+
+def filas_vuelta(ida: pd.Series, tramos_regreso: Sequence[pd.Series], fecha_cierre: str) -> List[dict]:
+    # Los tramos de regreso heredan tráfico, unidad y operador de la IDA
+    filas = []
+    for orden, tramo in enumerate(tramos_regreso):
+        datos = tramo.to_dict()
+        datos.update({
+            "Fecha": fecha_cierre,
+            "Fecha_Cierre": fecha_cierre,
+            "Número_Trafico": ida["Número_Trafico"],
+            "Unidad": ida["Unidad"],
+            "Operador": ida["Operador"],
+            "ID_Programacion": ida["ID_Programacion"],
+            "Tramo": "VUELTA",
+            LLAVE_TRAMO: id_tramo(ida["ID_Programacion"], "VUELTA", orden),
+        })
+        filas.append(datos)
+    return filas
+
+
+@medido("supabase.cerrar_en_lote")
+def cerrar_en_lote(
+    supabase,
+    cierres: Sequence[Tuple[pd.Series, Sequence[pd.Series]]],
+    columnas: Optional[Sequence[str]] = None,
+    fecha_cierre: Optional[date] = None,
+    tamano: int = TAMANO_LOTE,
+) -> Dict[str, Optional[str]]:
+    """
+    Closes many tráficos at once: (ida, tramos_regreso) pairs.
+
+    Tráficos are processed in chunks of up to `tamano` VUELTA rows. Each chunk
+    costs one upsert for all its VUELTA legs (keyed by ID_Tramo) plus one
+    Fecha_Cierre update filtered with in_(); a failing chunk does not stop
+    the others. Closing again after a failure rewrites the same VUELTA rows
+    instead of duplicating them.
+    Returns {ID_Programacion: None if closed, else the error message}; the
+    message says so when the VUELTA legs were saved but the IDA is still open.
+    """
+    fecha = (fecha_cierre or date.today()).isoformat()
+    resultado = {}
+
+    grupos, grupo, filas_grupo = [], [], 0
+    for ida, tramos in cierres:
+        if grupo and filas_grupo + len(tramos) > tamano:
+            grupos.append(grupo)
+            grupo, filas_grupo = [], 0
+        grupo.append((ida, tramos))
+        filas_grupo += len(tramos)
+    if grupo:
+        grupos.append(grupo)
+
+    for grupo in grupos:
+        ids = [str(ida["ID_Programacion"]) for ida, _ in grupo]
+        filas = [f for ida, tramos in grupo for f in filas_vuelta(ida, tramos, fecha)]
+        try:
+            if filas:
+                df = pd.DataFrame(filas)
+                if columnas is not None:
+                    df = df.reindex(columns=list(dict.fromkeys([*columnas, LLAVE_TRAMO])))
+                registros = a_registros(df)
+                retry_with_backoff(
+                    lambda: supabase.table(TABLA_TRAFICOS).upsert(registros, on_conflict=LLAVE_TRAMO).execute()
+                )
+        except Exception as e:
+            resultado.update({i: str(e) for i in ids})
+            continue
+        try:
+            retry_with_backoff(
+                lambda: supabase.table(TABLA_TRAFICOS).update({"Fecha_Cierre": fecha})
+                .in_("ID_Programacion", ids).eq("Tramo", "IDA").execute()
+            )
+            resultado.update({i: None for i in ids})
+        except Exception as e:
+            # Los tramos VUELTA ya quedaron guardados: volver a cerrar solo los reescribe
+            resultado.update({i: f"VUELTA guardada, pero la IDA sigue abierta ({e}); vuelve a cerrarlo" for i in ids})
+    return resultado
+
+
+def _unir_por_grupo(claves: pd.Series, textos: pd.Series, indice: pd.Index) -> pd.Series:
+    # " | ".join por grupo con un solo ordenamiento estable (sin crear un objeto por grupo)
+    resultado = pd.Series("", index=indice, dtype=object)
+    if claves.empty:
+        return resultado
+    codigos = indice.get_indexer(claves)
+    orden = np.argsort(codigos, kind="stable")
+    codigos = codigos[orden]
+    cortes = np.flatnonzero(np.diff(codigos)) + 1
+    partes = np.split(textos.to_numpy(dtype=object)[orden], cortes)
+    resultado.iloc[codigos[np.r_[0, cortes]]] = [" | ".join(p) for p in partes]
+    return resultado
+
+
+@medido("pandas.resumen_viajes_redondos")
+def resumen_viajes_redondos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per Número_Trafico with IDA client/route, joined VUELTA clients and
+    routes, and round-trip totals. Built with groupby/agg over the whole frame
+    (no per-tráfico masks), preserving the order in which tráficos appear.
+    """
+    df = df.copy()
+    df["Ingreso Total"] = pd.to_numeric(df["Ingreso Total"], errors="coerce").fillna(0.0)
+    df["Costo_Total_Ruta"] = pd.to_numeric(df["Costo_Total_Ruta"], errors="coerce").fillna(0.0)
+    df["Ruta"] = df["Origen"].astype(str) + " → " + df["Destino"].astype(str)
+
+    # Tramo marca la IDA; los registros antiguos la marcaban en el ID
+    es_ida = df["ID_Programacion"].astype(str).str.contains("_IDA", regex=False)
+    if "Tramo" in df.columns:
+        es_ida |= df["Tramo"].eq("IDA")
+
+    totales = df.groupby("Número_Trafico", sort=False).agg(
+        ingreso=("Ingreso Total", "sum"),
+        costo=("Costo_Total_Ruta", "sum"),
+    )
+    ida = df[es_ida].drop_duplicates("Número_Trafico").set_index("Número_Trafico")
+    vuelta = df[~es_ida]
+    fecha = vuelta.groupby("Número_Trafico", sort=False)["Fecha_Cierre"].max().reindex(totales.index)
+    rutas_vuelta = _unir_por_grupo(vuelta["Número_Trafico"], vuelta["Ruta"], totales.index)
+    con_cliente = vuelta[vuelta["Cliente"].notna()]
+    clientes_vuelta = _unir_por_grupo(con_cliente["Número_Trafico"], con_cliente["Cliente"].astype(str), totales.index)
+
+    utilidad = totales["ingreso"] - totales["costo"]
+    porcentaje = (utilidad / totales["ingreso"].where(totales["ingreso"] != 0) * 100).round(2).fillna(0)
+
+    return pd.DataFrame({
+        "Número_Trafico": totales.index,
+        "Fecha": fecha.dt.date.astype(object).where(fecha.notna(), "").values,
+        "Cliente IDA": ida["Cliente"].reindex(totales.index).fillna("").values,
+        "Ruta IDA": ida["Ruta"].reindex(totales.index).fillna("").values,
+        "Clientes VUELTA": clientes_vuelta.values,
+        "Rutas VUELTA": rutas_vuelta.values,
+        "Ingreso Total VR": totales["ingreso"].values,
+        "Costo Total VR": totales["costo"].values,
+        "Utilidad Total VR": utilidad.values,
+        "% Utilidad Total VR": porcentaje.values,
+    })
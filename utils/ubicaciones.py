@@ -0,0 +1,179 @@
+# utils/ubicaciones.py
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_UBICACION = ("Origen", "Destino")
+COLUMNAS_CLIENTE = ("Cliente",)
+
+# Alias conocidos -> nombre canónico (ambos ya normalizados)
+ALIAS_UBICACIONES = {
+    "NVO LAREDO": "NUEVO LAREDO",
+    "NVO. LAREDO": "NUEVO LAREDO",
+    "N. LAREDO": "NUEVO LAREDO",
+    "NLD": "NUEVO LAREDO",
+    "MTY": "MONTERREY",
+    "QRO": "QUERETARO",
+    "SLP": "SAN LUIS POTOSI",
+    "GDL": "GUADALAJARA",
+    "CDMX": "CIUDAD DE MEXICO",
+    "CD. DE MEXICO": "CIUDAD DE MEXICO",
+    "CD DE MEXICO": "CIUDAD DE MEXICO",
+    "CD. JUAREZ": "CIUDAD JUAREZ",
+    "CD JUAREZ": "CIUDAD JUAREZ",
+}
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8192)
+def normalizar_texto(valor: str) -> str:
+    """
+    Uppercases, strips accents and collapses whitespace.
+    The result is interned so repeated names share one string object.
+    """
+    texto = unicodedata.normalize("NFKD", str(valor))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = _ESPACIOS.sub(" ", texto).strip().upper()
+    return sys.intern(texto)
+
+
+def normalizar_ubicacion(valor) -> Optional[str]:
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    texto = normalizar_texto(valor)
+    return ALIAS_UBICACIONES.get(texto, texto) or None
+
+
+def normalizar_cliente(valor) -> Optional[str]:
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    return normalizar_texto(valor) or None
+
+
+def normalizar_serie(serie: pd.Series, es_ubicacion: bool = True) -> pd.Series:
+    """
+    Normalizes a column mapping only its distinct values (cheap on large frames).
+    """
+    normalizar = normalizar_ubicacion if es_ubicacion else normalizar_cliente
+    serie = serie.astype(object)
+    mapa = {v: normalizar(v) for v in serie.dropna().unique()}
+    return serie.map(mapa).astype(object)
+
+
+def normalizar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applies the location dictionary to Origen/Destino/Cliente (in place, returns df).
+    """
+    for col in COLUMNAS_UBICACION:
+        if col in df.columns:
+            df[col] = normalizar_serie(df[col], es_ubicacion=True)
+    for col in COLUMNAS_CLIENTE:
+        if col in df.columns:
+            df[col] = normalizar_serie(df[col], es_ubicacion=False)
+    return df
+
+
+def _categorias(dfs: Iterable[pd.DataFrame], columnas: Iterable[str]) -> list:
+    valores = set()
+    for df in dfs:
+        for col in columnas:
+            if col in df.columns:
+                valores.update(df[col].dropna().unique())
+    return sorted(valores)
+
+
+def internar_ubicaciones(*dfs: pd.DataFrame):
+    """
+    Normalizes and stores Origen/Destino/Cliente as categoricals.
+
+    Origen and Destino of every frame passed share one category set, so
+    comparing a Destino against an Origen (even across frames) is a
+    comparison of integer codes. Cliente gets its own shared set.
+    Returns the frames in the same order (a single frame if only one is given).
+    """
+    dfs = [normalizar_columnas(df) for df in dfs]
+    cat_ubicacion = pd.CategoricalDtype(_categorias(dfs, COLUMNAS_UBICACION))
+    cat_cliente = pd.CategoricalDtype(_categorias(dfs, COLUMNAS_CLIENTE))
+
+    for df in dfs:
+        for col in COLUMNAS_UBICACION:
+            if col in df.columns:
+                df[col] = df[col].astype(cat_ubicacion)
+        for col in COLUMNAS_CLIENTE:
+            if col in df.columns:
+                df[col] = df[col].astype(cat_cliente)
+
+    return dfs[0] if len(dfs) == 1 else tuple(dfs)
+
+
+def trigramas(texto: str) -> set:
+    # Relleno con espacios para que inicio/fin de palabra cuenten
+    t = f"  {texto} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+class EmparejadorTrigramas:
+    """
+    Fuzzy matcher over a fixed catalog of names (locations or clients).
+
+    Builds an inverted trigram index once; a lookup only touches the postings
+    of the query's trigrams (no pairwise comparisons against the catalog).
+    Resolutions are cached per normalized text, so repeated despacho values
+    cost a dict lookup.
+    """
+
+    def __init__(self, nombres: Iterable[str], es_ubicacion: bool = True, umbral: float = 0.55):
+        self.es_ubicacion = es_ubicacion
+        self.umbral = umbral
+        normalizar = normalizar_ubicacion if es_ubicacion else normalizar_cliente
+        self.nombres = sorted({n for n in (normalizar(x) for x in nombres) if n})
+        self._exactos = set(self.nombres)
+
+        postings = {}
+        self._tamanos = np.empty(len(self.nombres), dtype=np.int32)
+        for i, nombre in enumerate(self.nombres):
+            grams = trigramas(nombre)
+            self._tamanos[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._alias = {}
+
+    def resolver(self, valor) -> Optional[str]:
+        """
+        Returns the canonical catalog name for valor, or the normalized value
+        itself when nothing scores above the threshold.
+        """
+        normalizar = normalizar_ubicacion if self.es_ubicacion else normalizar_cliente
+        texto = normalizar(valor)
+        if not texto or texto in self._exactos:
+            return texto
+        if texto in self._alias:
+            return self._alias[texto]
+
+        grams = trigramas(texto)
+        listas = [self._postings[g] for g in grams if g in self._postings]
+        resultado = texto
+        if listas:
+            ids, compartidos = np.unique(np.concatenate(listas), return_counts=True)
+            # Coeficiente de Dice sobre trigramas
+            puntaje = 2.0 * compartidos / (len(grams) + self._tamanos[ids])
+            mejor = int(np.argmax(puntaje))
+            if puntaje[mejor] >= self.umbral:
+                resultado = self.nombres[ids[mejor]]
+        self._alias[texto] = resultado
+        return resultado
+
+    def resolver_serie(self, serie: pd.Series) -> pd.Series:
+        """
+        Batch pass: resolves each distinct value once and maps the column.
+        """
+        serie = serie.astype(object)
+        mapa = {v: self.resolver(v) for v in serie.dropna().unique()}
+        return serie.map(mapa).astype(object)
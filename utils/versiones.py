@@ -0,0 +1,68 @@
+# utils/versiones.py
+#
+# Sello de versión por tabla compartido entre réplicas de Streamlit.
+# Cada escritura actualiza el sello y los cachés lo usan como parte de su llave,
+# así todas las réplicas refrescan en segundos sin releer tablas completas.
+#
+# Tabla requerida en Supabase:
+#   create table "Versiones_Datos" (
+#       "Tabla" text primary key,
+#       "Version" bigint not null default 0,
+#       "Actualizado" timestamptz not null default now()
+#   );
+import time
+from typing import Optional
+
+import streamlit as st
+
+from utils.medicion import medido
+
+TABLA_VERSIONES = "Versiones_Datos"
+SEGUNDOS_VERSION = 5    # cada réplica consulta el sello como máximo cada 5 s
+SEGUNDOS_RESPALDO = 60  # si no hay sello disponible, los cachés expiran por tiempo
+
+
+@st.cache_data(ttl=SEGUNDOS_VERSION, show_spinner=False)
+def _leer_version(_supabase, tabla: str) -> Optional[int]:
+    try:
+        res = _supabase.table(TABLA_VERSIONES).select("Version").eq("Tabla", tabla).limit(1).execute()
+        return int(res.data[0]["Version"]) if res.data else 0
+    except Exception:
+        return None
+
+
+def version_tabla(supabase, tabla: str) -> Optional[int]:
+    """
+    Current version stamp of `tabla` (None if the stamp table is unavailable).
+    """
+    return _leer_version(supabase, tabla)
+
+
+def llave_cache(supabase, tabla: str):
+    """
+    Value to pass to a @st.cache_data loader so it refreshes when `tabla` changes.
+    Falls back to a time bucket when no stamp can be read.
+    """
+    version = version_tabla(supabase, tabla)
+    if version is None:
+        return f"t{int(time.time() // SEGUNDOS_RESPALDO)}"
+    return version
+
+
+@medido("supabase.registrar_cambio")
+def registrar_cambio(supabase, tabla: str):
+    """
+    Bumps the stamp of `tabla` after a write. The stamp is the write time in
+    ms, so concurrent writers never need to read it first.
+    """
+    try:
+        supabase.table(TABLA_VERSIONES).upsert({
+            "Tabla": tabla,
+            "Version": time.time_ns() // 1_000_000,
+            "Actualizado": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }).execute()
+    except Exception:
+        # Sin tabla de versiones: los cachés siguen expirando por tiempo
+        pass
+    # Esta réplica ve su propio cambio de inmediato
+    _leer_version.clear()
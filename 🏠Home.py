@@ -3,7 +3,8 @@ import hashlib
 import base64
 from supabase import create_client
 from PIL import Image
-from utils.retry import retry_with_backoff
+from utils.medicion import panel_rendimiento
+from utils.sesion import cerrar_sesion, iniciar_sesion, restaurar_sesion, usuario_por_id
 
 # =========================
 # 🔐 LOGIN Y AUTENTICACIÓN
@@ -18,6 +19,9 @@ url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
 supabase = create_client(url, key)
 
+# Un token válido (cookie o URL) restaura la sesión sin volver a consultar Supabase
+restaurar_sesion()
+
 # Formulario de login (si no hay sesión activa)
 if "usuario" not in st.session_state:
     st.title("🔐 Iniciar Sesión")
@@ -25,24 +29,14 @@ if "usuario" not in st.session_state:
     password = st.text_input("Contraseña", type="password")
 
     def verificar_credenciales(correo, password):
-        def _call():
-            # OJO: asegúrate que el nombre de la tabla sea exacto ("Usuarios")
-            res = supabase.table("Usuarios_Pic").select("*").eq("ID_Usuario", correo).execute()
-
-            # supabase-py a veces regresa error en res.error o en res.data vacío
-            if getattr(res, "error", None):
-                raise RuntimeError(res.error)
-
-            return res
-
         try:
-            # Reintenta si hay 52x/5xx/timeouts intermitentes
-            res = retry_with_backoff(_call, tries=5, base_delay=0.6, max_delay=10.0)
-
-            if res.data:
-                user = res.data[0]
-                if user.get("Password_Hash") == hash_password(password):
-                    return user
+            # Lectura con reintentos y caché corta (utils.sesion)
+            user = usuario_por_id(supabase, correo)
+            if user and user.get("Password_Hash") != hash_password(password):
+                # La contraseña pudo cambiar después de guardarse en caché: se relee una vez
+                user = usuario_por_id(supabase, correo, fresco=True)
+            if user and user.get("Password_Hash") == hash_password(password):
+                return user
 
             # Si llega aquí, sí fue credencial inválida (no error de red)
             return None
@@ -61,7 +55,7 @@ if "usuario" not in st.session_state:
     if st.button("Ingresar"):
         usuario = verificar_credenciales(correo, password)
         if usuario:
-            st.session_state.usuario = usuario
+            iniciar_sesion(usuario)
             st.success(f"✅ Bienvenido, {usuario['Nombre']}")
             st.rerun()
         else:
@@ -72,9 +66,11 @@ if "usuario" not in st.session_state:
 with st.sidebar:
     st.markdown(f"👤 **{st.session_state.usuario['Nombre']}** ({st.session_state.usuario['Rol']})")
     if st.button("Cerrar sesión"):
-        del st.session_state["usuario"]
+        cerrar_sesion()
         st.rerun()
 
+panel_rendimiento()
+
 # =========================
 # ✅ ENCABEZADO Y MENÚ
 # =========================